@@ -0,0 +1,68 @@
+"""Benchmark per-note against batched note writes over stdio.
+
+Starts the server over stdio with a log-backed store in a temporary directory
+and imports ``--notes`` notes, once with one ``add-note`` call per note and
+once with ``add-notes`` calls of ``--batch-size`` notes, then reads them back
+with ``get-note`` and ``get-notes`` the same way.
+
+    python benchmarks/bench_batch_notes.py --notes 10000 --batch-size 1000 --fsync always
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+async def bench(notes: int, batch_size: int, fsync: str, batched: bool) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        parameters = StdioServerParameters(
+            command=sys.executable,
+            args=["-m", "src.mcp_client_and_server"],
+            env={**os.environ, "MCP_NOTES_PATH": directory, "MCP_NOTES_FSYNC": fsync, "PYTHONPATH": PROJECT_ROOT},
+        )
+        async with stdio_client(parameters) as (read, write), ClientSession(read, write) as session:
+            await session.initialize()
+            items = [{"name": f"note-{i}", "content": f"content of note {i}"} for i in range(notes)]
+
+            started = time.perf_counter()
+            if batched:
+                for start in range(0, notes, batch_size):
+                    await session.call_tool("add-notes", {"notes": items[start:start + batch_size]})
+            else:
+                for item in items:
+                    await session.call_tool("add-note", item)
+            written = time.perf_counter() - started
+
+            started = time.perf_counter()
+            if batched:
+                for start in range(0, notes, batch_size):
+                    await session.call_tool("get-notes", {"names": [item["name"] for item in items[start:start + batch_size]]})
+            else:
+                for item in items:
+                    await session.call_tool("get-note", {"name": item["name"]})
+            read_time = time.perf_counter() - started
+    return {"write": notes / written, "read": notes / read_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=10_000, help="notes to write and read")
+    parser.add_argument("--batch-size", type=int, default=1000, help="notes per batch call")
+    parser.add_argument("--fsync", default="batch", help="durability policy of the store")
+    args = parser.parse_args()
+
+    for mode, batched in (("per-note", False), ("batched", True)):
+        rates = asyncio.run(bench(args.notes, args.batch_size, args.fsync, batched))
+        print(f"{mode}: {rates['write']:,.0f} writes/s, {rates['read']:,.0f} reads/s")
+
+
+if __name__ == "__main__":
+    main()
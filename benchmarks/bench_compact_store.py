@@ -0,0 +1,140 @@
+"""Benchmark the compact in-memory notes store against the plain dict store.
+
+Each backend is loaded with ``--notes`` notes in a fresh process, so resident
+memory is measured without the other backend's leftovers. Most notes are a
+short sentence; every ``--large-every``-th one is a few KB of text, which the
+compact store compresses. Reports RSS growth, the store's own memory report
+and ``get-note`` latency through the tool handler, for short notes and for
+large ones read cold (decompressed) and hot (from the LRU). Then one
+``list-notes`` and one ``search-notes`` call build the name and search
+indexes, whose RSS growth and reported size are measured as well.
+
+    python benchmarks/bench_compact_store.py --notes 1000000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server import server
+from src.mcp_client_and_server.notes import NoteService
+from src.mcp_client_and_server.store import open_store
+
+BACKENDS = ("dict", "compact")
+
+WORDS = ("note meeting project deadline review draft budget team client release plan update "
+         "design issue fix test deploy server cache latency memory report summary").split()
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current, where /proc is missing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def note_content(rng: random.Random, i: int, large: bool) -> str:
+    words = rng.choices(WORDS, k=rng.randint(400, 800) if large else rng.randint(8, 20))
+    return f"Note {i}: " + " ".join(words)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {"p50_us": round(1e6 * samples[len(samples) // 2], 1),
+            "p95_us": round(1e6 * samples[int(len(samples) * 0.95)], 1)}
+
+
+async def time_reads(names):
+    samples = []
+    for name in names:
+        started = time.perf_counter()
+        await server.handle_call_tool("get-note", {"name": name})
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def run_backend(backend: str, count: int, large_every: int, reads: int, seed: int):
+    rng = random.Random(seed)
+    gc.collect()
+    before = rss_bytes()
+    store = open_store(None, compact=backend == "compact")
+    started = time.perf_counter()
+    for i in range(count):
+        store[f"note-{i:08d}"] = note_content(rng, i, large=i % large_every == 0)
+    load_seconds = time.perf_counter() - started
+    gc.collect()
+    rss = rss_bytes() - before
+
+    server._note_service = NoteService(store)
+    small = [f"note-{i:08d}" for i in rng.sample(range(count), min(reads, count)) if i % large_every]
+    large = [f"note-{i:08d}" for i in rng.sample(range(0, count, large_every), min(reads, count // large_every))]
+    result = {
+        "backend": backend,
+        "notes": count,
+        "load_s": round(load_seconds, 2),
+        "rss_mb": round(rss / (1 << 20), 1),
+        "rss_bytes_per_note": round(rss / count, 1),
+        "report": store.memory_report(),
+        "get_small": asyncio.run(time_reads(small)),
+        "get_large_cold": asyncio.run(time_reads(large)),
+        # Read again at once, so the ones still in the LRU are hot
+        "get_large_hot": asyncio.run(time_reads(large[-200:])),
+    }
+
+    gc.collect()
+    before = rss_bytes()
+    started = time.perf_counter()
+    asyncio.run(server.handle_call_tool("list-notes", {"limit": 1}))
+    asyncio.run(server.handle_call_tool("search-notes", {"query": WORDS[0]}))
+    result["index_s"] = round(time.perf_counter() - started, 2)
+    gc.collect()
+    result["index_rss_mb"] = round((rss_bytes() - before) / (1 << 20), 1)
+    result["report_with_indexes"] = server._note_service.memory_report()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    parser.add_argument("--large-every", type=int, default=20, help="every n-th note is a few KB long")
+    parser.add_argument("--reads", type=int, default=20_000, help="get-note calls timed per kind of note")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=BACKENDS, help="run one backend in this process and print JSON")
+    args = parser.parse_args()
+
+    if args.backend:
+        run_backend(args.backend, args.notes, args.large_every, args.reads, args.seed)
+        return
+
+    for backend in BACKENDS:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--backend", backend, "--notes", str(args.notes),
+             "--large-every", str(args.large_every), "--reads", str(args.reads), "--seed", str(args.seed)],
+            capture_output=True, text=True, check=True)
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        report, count = result["report"], result["notes"]
+        print(f"{backend}: {result['notes']} notes loaded in {result['load_s']} s, "
+              f"RSS +{result['rss_mb']} MB ({result['rss_bytes_per_note']} bytes/note), "
+              f"store reports {report['bytes_per_note']} bytes/note")
+        indexed = result["report_with_indexes"]
+        print(f"  indexes built in {result['index_s']} s, RSS +{result['index_rss_mb']} MB; "
+              f"names {indexed['names_index_bytes'] / count:.1f}, search {indexed['search_index_bytes'] / count:.1f}, "
+              f"total {indexed['bytes_per_note']} bytes/note")
+        for kind in ("get_small", "get_large_cold", "get_large_hot"):
+            timing = result[kind]
+            print(f"  {kind}: p50 {timing['p50_us']} us, p95 {timing['p95_us']} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the log-backed notes store.
+
+Reports how long a store holding ``--notes`` notes takes to open (snapshot plus
+a log tail), what the name and search indexes then cost per note once built,
+and ``add-note`` throughput through the tool handler for each fsync policy,
+i.e. with and without group commit. ``add-note`` only returns once its write
+is durable under the policy, so writes are made by ``--concurrency`` callers
+at once for group commit to batch them.
+
+    python benchmarks/bench_store.py --notes 1000000 --writes 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server import server
+from src.mcp_client_and_server.notes import NoteService
+from src.mcp_client_and_server.store import FSYNC_POLICIES, LogNoteStore
+
+
+def bench_startup(directory: str, count: int, tail: int) -> float:
+    store = LogNoteStore(directory, fsync="os", compact_after=count + tail + 1)
+    for i in range(count):
+        store[f"note-{i}"] = f"content of note {i}"
+    store.compact()
+    for i in range(tail):
+        store[f"tail-{i}"] = f"content of tail note {i}"
+    store.close()
+
+    started = time.perf_counter()
+    store = LogNoteStore(directory, fsync="os")
+    elapsed = time.perf_counter() - started
+    assert len(store) == count + tail
+    store.close()
+    return elapsed
+
+
+def bench_indexes(directory: str):
+    """Build the name and search indexes over the store left by bench_startup"""
+    store = LogNoteStore(directory, fsync="os")
+    service = NoteService(store)
+    try:
+        started = time.perf_counter()
+        service.page(limit=1)
+        service.search("content")
+        elapsed = time.perf_counter() - started
+        return elapsed, service.memory_report()
+    finally:
+        store.close()
+
+
+async def bench_add_note(directory: str, fsync: str, writes: int, concurrency: int) -> float:
+    store = LogNoteStore(directory, fsync=fsync)
+    server._note_service = NoteService(store)
+
+    async def writer(first: int):
+        for i in range(first, writes, concurrency):
+            await server.handle_call_tool("add-note", {"name": f"note-{i}", "content": "x" * 100})
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(first) for first in range(concurrency)))
+        store.flush()
+        return writes / (time.perf_counter() - started)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=1_000_000, help="notes in the snapshot")
+    parser.add_argument("--tail", type=int, default=10_000, help="log records written after the snapshot")
+    parser.add_argument("--writes", type=int, default=5_000, help="add-note calls per fsync policy")
+    parser.add_argument("--concurrency", type=int, default=64, help="add-note calls in flight at once")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        elapsed = bench_startup(directory, args.notes, args.tail)
+        print(f"startup: {args.notes} notes + {args.tail} log records opened in {elapsed * 1000:.0f} ms")
+        elapsed, report = bench_indexes(directory)
+        count = report["notes"]
+        print(f"indexes: built in {elapsed:.1f} s; names {report['names_index_bytes'] / count:.1f}, "
+              f"search {report['search_index_bytes'] / count:.1f} bytes/note")
+
+    for fsync in FSYNC_POLICIES:
+        with tempfile.TemporaryDirectory() as directory:
+            rate = asyncio.run(bench_add_note(directory, fsync, args.writes, args.concurrency))
+            print(f"add-note fsync={fsync}, {args.concurrency} in flight: {rate:,.0f} notes/s")
+
+
+if __name__ == "__main__":
+    main()
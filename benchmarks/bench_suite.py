@@ -0,0 +1,323 @@
+"""Benchmark suite: scenarios driven over stdio against local fake downstream servers.
+
+Each of ``--clients`` concurrent clients starts its own gateway over stdio
+(as an MCP host would) and connects ``--servers`` fake downstream servers to
+it (see ``fake_downstream.py``, with injectable ``--latency``,
+``--payload-bytes``, ``--payload-items`` and ``--failure-rate``). Every
+scenario then runs for ``--duration`` seconds and reports throughput,
+p50/p95/p99 latency, errors, the CPU time the gateways spent per MB of
+results, and the RSS and number of child processes of the gateways and their
+downstream servers. Scenarios:
+
+- ``list-tools``: list the merged tool catalog of every downstream server
+- ``routing``: call an unprefixed tool offered only by the last server
+- ``prefixed-call``: call ``s0:echo``
+- ``notes``: alternate ``add-note`` and ``get-note``
+- ``startup``: launch a gateway and wait for its ``initialize`` response, over
+  and over; the results also include an import-time report (``python -X
+  importtime``) of the modules that dominate startup
+
+Results are saved as JSON (with the git commit) so runs can be compared::
+
+    python benchmarks/bench_suite.py --clients 4 --servers 3 --output before.json
+    python benchmarks/bench_suite.py --clients 4 --servers 3 --compare before.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FAKE_DOWNSTREAM = os.path.join(PROJECT_ROOT, "benchmarks", "fake_downstream.py")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def process_tree(root: int) -> List[int]:
+    """Descendants of a process, read from /proc (empty where there is none)"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [root]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            tree.append(child)
+            pending.append(child)
+    return tree
+
+
+def rss_bytes(pids: List[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def cpu_seconds(pids: List[int]) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                user, system = f.read().rsplit(")", 1)[1].split()[11:13]
+            total += int(user) + int(system)
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def gateway_pids() -> List[int]:
+    pids = []
+    for pid in process_tree(os.getpid()):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"src.mcp_client_and_server" in f.read():
+                    pids.append(pid)
+        except OSError:
+            continue
+    return pids
+
+
+def result_bytes(result: Any) -> int:
+    return sum(len(getattr(item, "text", None) or getattr(item, "data", None) or "")
+               for item in getattr(result, "content", []))
+
+
+def downstream_command(index: int, args) -> List[str]:
+    return [sys.executable, FAKE_DOWNSTREAM, "--tools", "echo", f"tool-{index}",
+            "--latency", str(args.latency), "--payload-bytes", str(args.payload_bytes),
+            "--payload-items", str(args.payload_items), "--failure-rate", str(args.failure_rate),
+            "--seed", str(index)]
+
+
+def scenario_call(scenario: str, servers: int, counter: int) -> Callable[[ClientSession], Any]:
+    if scenario == "list-tools":
+        return lambda session: session.list_tools()
+    if scenario == "routing":
+        return lambda session: session.call_tool(f"tool-{servers - 1}", {"n": counter})
+    if scenario == "prefixed-call":
+        return lambda session: session.call_tool("s0:echo", {"n": counter})
+    if scenario == "notes":
+        if counter % 2:
+            return lambda session: session.call_tool("get-note", {"name": f"note-{counter - 1}"})
+        return lambda session: session.call_tool("add-note", {"name": f"note-{counter}", "content": "x" * 100})
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def gateway_parameters() -> StdioServerParameters:
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "src.mcp_client_and_server"],
+        env={**os.environ, "PYTHONPATH": PROJECT_ROOT},
+    )
+
+
+async def run_client(scenario: str, args, deadline_at: Callable[[], float], ready: asyncio.Barrier,
+                     samples: Dict[str, Any]):
+    async with stdio_client(gateway_parameters()) as (read, write), ClientSession(read, write) as session:
+        await session.initialize()
+        if scenario != "notes":
+            for index in range(args.servers):
+                await session.call_tool("connect-server", {"name": f"s{index}", "command": downstream_command(index, args)})
+        # Warm the catalog and routes before timing
+        await session.list_tools()
+
+        if await ready.wait() == 0:
+            samples["cpu_start"] = cpu_seconds(gateway_pids())
+        await ready.wait()
+        deadline = deadline_at()
+        counter = 0
+        while time.perf_counter() < deadline:
+            call = scenario_call(scenario, args.servers, counter)
+            started = time.perf_counter()
+            try:
+                result = await call(session)
+            except Exception:
+                samples["errors"] += 1
+            else:
+                samples["latencies"].append(time.perf_counter() - started)
+                samples["bytes"] += result_bytes(result)
+                # Only tool results carry isError; list-tools results never fail this way
+                if getattr(result, "isError", False):
+                    samples["errors"] += 1
+            counter += 1
+
+        if await ready.wait() == 0:
+            samples["cpu"] = cpu_seconds(gateway_pids()) - samples["cpu_start"]
+            tree = process_tree(os.getpid())
+            samples["processes"] = len(tree)
+            samples["rss_bytes"] = rss_bytes(tree)
+        await ready.wait()
+
+
+async def run_startup_client(args, deadline_at: Callable[[], float], ready: asyncio.Barrier,
+                             samples: Dict[str, Any]):
+    await ready.wait()
+    deadline = deadline_at()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with stdio_client(gateway_parameters()) as (read, write), ClientSession(read, write) as session:
+                await session.initialize()
+                samples["latencies"].append(time.perf_counter() - started)
+        except Exception:
+            samples["errors"] += 1
+
+
+def import_report(top: int = 10) -> Dict[str, Any]:
+    """Import time of the gateway's server module, and the modules costing the most"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.mcp_client_and_server.server"],
+                               cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            modules.append({"module": match.group(4), "self_ms": int(match.group(1)) / 1000,
+                            "cumulative_ms": int(match.group(2)) / 1000, "depth": len(match.group(3)) // 2})
+    top_level = [module for module in modules if module["depth"] == 0]
+    return {
+        "total_ms": round(sum(module["cumulative_ms"] for module in top_level), 1),
+        "slowest": [{key: module[key] for key in ("module", "self_ms", "cumulative_ms")}
+                    for module in sorted(modules, key=lambda module: module["self_ms"], reverse=True)[:top]],
+    }
+
+
+async def run_scenario(scenario: str, args) -> Dict[str, Any]:
+    samples: Dict[str, Any] = {"latencies": [], "errors": 0, "bytes": 0}
+    ready = asyncio.Barrier(args.clients)
+    timing: Dict[str, float] = {}
+
+    def deadline_at() -> float:
+        if "started" not in timing:
+            timing["started"] = time.perf_counter()
+        return timing["started"] + args.duration
+
+    if scenario == "startup":
+        clients = (run_startup_client(args, deadline_at, ready, samples) for _ in range(args.clients))
+    else:
+        clients = (run_client(scenario, args, deadline_at, ready, samples) for _ in range(args.clients))
+    await asyncio.gather(*clients)
+    latencies = samples["latencies"]
+    return {
+        "calls": len(latencies),
+        "errors": samples["errors"],
+        "throughput": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 3) if latencies else None,
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 3) if latencies else None,
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 3) if latencies else None,
+        "cpu_ms_per_mb": round(1000 * samples["cpu"] / (samples["bytes"] / (1 << 20)), 2)
+        if samples.get("cpu") is not None and samples["bytes"] else None,
+        "rss_mb": round(samples.get("rss_bytes", 0) / (1 << 20), 1),
+        "child_processes": samples.get("processes", 0),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for scenario, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        changes = []
+        for key in ("throughput", "p95_ms", "cpu_ms_per_mb", "rss_mb"):
+            if before.get(key) and current.get(key) is not None:
+                changes.append(f"{key} {100 * (current[key] - before[key]) / before[key]:+.1f}%")
+        print(f"  {scenario}: {', '.join(changes)}")
+    if results.get("imports") and baseline.get("imports"):
+        before, current = baseline["imports"]["total_ms"], results["imports"]["total_ms"]
+        print(f"  imports: total_ms {100 * (current - before) / before:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=["list-tools", "routing", "prefixed-call", "notes", "startup"])
+    parser.add_argument("--clients", type=int, default=4, help="concurrent clients, each with its own gateway")
+    parser.add_argument("--servers", type=int, default=3, help="fake downstream servers per gateway")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run each scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="downstream seconds per call")
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="size of each downstream result")
+    parser.add_argument("--payload-items", type=int, default=1, help="content items each result is split into")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of downstream calls that fail")
+    parser.add_argument("--output", help="where to save the JSON results (default benchmarks/results/)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {},
+    }
+    for scenario in args.scenarios:
+        result = asyncio.run(run_scenario(scenario, args))
+        results["scenarios"][scenario] = result
+        print(f"{scenario}: {result['throughput']:,.1f} calls/s, p50 {result['p50_ms']} ms, "
+              f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, {result['errors']} errors, "
+              f"{result['cpu_ms_per_mb']} CPU ms/MB, "
+              f"{result['rss_mb']} MB RSS in {result['child_processes']} processes")
+    if "startup" in args.scenarios:
+        results["imports"] = import_report()
+        print(f"Imports at startup take {results['imports']['total_ms']} ms; slowest modules (self time):")
+        for module in results["imports"]["slowest"]:
+            print(f"  {module['module']}: {module['self_ms']:.1f} ms ({module['cumulative_ms']:.1f} ms with imports)")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(commit or 'unknown')[:8]}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark cold against warm connects to a downstream server.
+
+Connects and disconnects the test echo server ``--connects`` times, once
+starting a new process for every connect and once taking a process from a
+warm pool of ``--pool-size``, which is refilled between connects. Each
+connect is timed up to the answer to its first tool call.
+
+    python benchmarks/bench_warm_pool.py --connects 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.client import MCPChainedClient
+
+FAKE_SERVER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', "tests", "fake_server.py"))
+
+
+async def bench(command, connects: int, pool_size: int) -> list:
+    client = MCPChainedClient()
+    latencies = []
+    try:
+        if pool_size:
+            await client.warm(command, size=pool_size)
+        for _ in range(connects):
+            started = time.perf_counter()
+            await client.connect_server("bench", command)
+            await client.call_tool("bench:echo", {})
+            latencies.append(time.perf_counter() - started)
+            await client.disconnect_server("bench")
+            if pool_size:
+                await client.warm(command, size=pool_size)
+    finally:
+        await client.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connects", type=int, default=20, help="connects to time for each mode")
+    parser.add_argument("--pool-size", type=int, default=1, help="processes kept warm")
+    args = parser.parse_args()
+
+    command = [sys.executable, FAKE_SERVER]
+
+    for mode, pool_size in (("cold", 0), ("warm", args.pool_size)):
+        latencies = asyncio.run(bench(command, args.connects, pool_size))
+        print(f"{mode}: connect + first call median {1000 * statistics.median(latencies):.1f} ms, "
+              f"max {1000 * max(latencies):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
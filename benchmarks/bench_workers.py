@@ -0,0 +1,110 @@
+"""Benchmark sse throughput against the number of worker processes.
+
+Starts the server with each ``--workers`` count, connects a downstream echo
+server, and has ``--clients`` client processes with ``--sessions`` sessions
+each call ``fake:echo`` with a ``--payload-bytes`` argument for
+``--duration`` seconds. Every call is decoded, validated and re-encoded by a
+worker on the way down and again on the way back, so the work is CPU-bound in
+the workers.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --payload-bytes 65536
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FAKE_SERVER = os.path.join(PROJECT_ROOT, "tests", "fake_server.py")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "src.mcp_client_and_server", "--transport", "sse",
+               "--port", str(port), "--workers", str(workers), "--max-message-bytes", str(64 << 20)]
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT)
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/missing")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def connect_downstream(url: str):
+    async with sse_client(url) as (read, write), ClientSession(read, write) as session:
+        await session.initialize()
+        await session.call_tool("connect-server", {"name": "fake", "command": [sys.executable, FAKE_SERVER]})
+
+
+async def run_sessions(url: str, sessions: int, payload_bytes: int, duration: float) -> int:
+    payload = "x" * payload_bytes
+    deadline = time.monotonic() + duration
+
+    async def run_session() -> int:
+        calls = 0
+        async with sse_client(url, timeout=30) as (read, write), ClientSession(read, write) as session:
+            await session.initialize()
+            while time.monotonic() < deadline:
+                await session.call_tool("fake:echo", {"payload": payload})
+                calls += 1
+        return calls
+
+    return sum(await asyncio.gather(*(run_session() for _ in range(sessions))))
+
+
+def client_process(args) -> int:
+    return asyncio.run(run_sessions(*args))
+
+
+def bench(workers: int, clients: int, sessions: int, payload_bytes: int, duration: float) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/sse"
+    process = start_server(workers, port)
+    try:
+        asyncio.run(connect_downstream(url))
+        # Warm every worker's downstream connection before timing
+        with multiprocessing.Pool(clients) as pool:
+            pool.map(client_process, [(url, sessions, payload_bytes, 0.5)] * clients)
+            started = time.perf_counter()
+            calls = sum(pool.map(client_process, [(url, sessions, payload_bytes, duration)] * clients))
+            elapsed = time.perf_counter() - started
+        return calls / elapsed
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to compare")
+    parser.add_argument("--clients", type=int, default=4, help="client processes")
+    parser.add_argument("--sessions", type=int, default=4, help="sse sessions per client process")
+    parser.add_argument("--payload-bytes", type=int, default=64 * 1024, help="size of each tool call argument")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run each worker count")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients * args.sessions} sessions, {args.payload_bytes} byte payloads")
+    for workers in args.workers:
+        rate = bench(workers, args.clients, args.sessions, args.payload_bytes, args.duration)
+        print(f"workers={workers}: {rate:,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Configurable downstream MCP server for benchmarks.
+
+    python benchmarks/fake_downstream.py --tools echo --latency 0.005 --payload-bytes 1024 --failure-rate 0.01
+
+Every tool sleeps ``--latency`` seconds (plus up to ``--jitter`` more), fails
+with probability ``--failure-rate`` and otherwise returns ``--payload-bytes``
+of text, split into ``--payload-items`` content items.
+"""
+
+import argparse
+import asyncio
+import random
+from typing import Dict, List
+
+import mcp.types as types
+import mcp.server as server
+from mcp.server.stdio import stdio_server
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--tools", nargs="+", default=["echo"], help="tool names to offer")
+parser.add_argument("--latency", type=float, default=0.0, help="seconds each call takes")
+parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per call, at most")
+parser.add_argument("--payload-bytes", type=int, default=64, help="size of each result")
+parser.add_argument("--payload-items", type=int, default=1, help="content items the result is split into")
+parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of calls that fail")
+parser.add_argument("--seed", type=int, default=None, help="seed for reproducible jitter and failures")
+options = parser.parse_args()
+random_source = random.Random(options.seed)
+payload = [types.TextContent(type="text", text="x" * (options.payload_bytes // options.payload_items))
+           for _ in range(options.payload_items)]
+
+server_instance = server.Server("fake-downstream")
+
+
+@server_instance.list_tools()
+async def handle_list_tools() -> List[types.Tool]:
+    return [types.Tool(name=name, description=f"Benchmark tool {name}", inputSchema={"type": "object"})
+            for name in options.tools]
+
+
+@server_instance.call_tool()
+async def handle_call_tool(name: str, arguments: Dict) -> List[types.TextContent]:
+    delay = options.latency + random_source.random() * options.jitter
+    if delay:
+        await asyncio.sleep(delay)
+    if random_source.random() < options.failure_rate:
+        raise ValueError(f"{name}: injected failure")
+    return payload
+
+
+async def main():
+    async with stdio_server() as (read_stream, write_stream):
+        await server_instance.run(read_stream, write_stream, server_instance.create_initialization_options())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
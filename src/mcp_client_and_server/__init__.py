@@ -1,5 +1,5 @@
 """Main entry point for the package."""
 
-from .server import main
+from .server import main, run_server
 
-__all__ = ['main']
\ No newline at end of file
+__all__ = ['main', 'run_server']
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""Cache of downstream tool results, for tools whose results only depend on their arguments."""
+
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# (server name, tool name, canonical JSON of the arguments)
+CacheKey = Tuple[str, str, str]
+
+
+@dataclass
+class _Entry:
+    content: List[Any]
+    size: int
+    expires_at: float
+
+
+def cache_key(server_name: str, tool_name: str, arguments: Optional[Dict[str, Any]]) -> CacheKey:
+    """Key a call so that argument order and whitespace do not matter"""
+    canonical = json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return server_name, tool_name, canonical
+
+
+def annotation_hints(tool: Any) -> Dict[str, Any]:
+    """Return the behaviour hints a downstream server declared for ``tool``"""
+    annotations = getattr(tool, "annotations", None)
+    if annotations is None:
+        return {}
+    if isinstance(annotations, dict):
+        return annotations
+    return annotations.model_dump(exclude_none=True)
+
+
+def is_side_effect_free(tool: Any) -> bool:
+    """Whether repeating a call to ``tool`` is declared to make no difference"""
+    hints = annotation_hints(tool)
+    return bool(hints.get("readOnlyHint") or hints.get("idempotentHint"))
+
+
+class ResultCache:
+    """Size-bounded LRU cache of tool call results.
+
+    Caching is opt-in per tool. ``tool_ttls`` maps ``"server:tool"`` or a bare
+    tool name to the number of seconds its results stay fresh. When
+    ``annotated_ttl`` is set, tools the downstream server marks read-only or
+    idempotent are cached for that long as well; a TTL of 0 in ``tool_ttls``
+    keeps a tool out of the cache either way. Once the cached contents
+    exceed ``max_bytes``, least recently used results are evicted.
+    """
+
+    def __init__(self,
+                 max_bytes: int = 64 << 20,
+                 tool_ttls: Optional[Dict[str, float]] = None,
+                 annotated_ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.tool_ttls = dict(tool_ttls or {})
+        self.annotated_ttl = annotated_ttl
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, server_name: str, tool_name: str, tool: Any = None) -> Optional[float]:
+        """Seconds to keep results of this tool, or None if it is not cached"""
+        ttl = self.tool_ttls.get(f"{server_name}:{tool_name}", self.tool_ttls.get(tool_name))
+        if ttl is not None:
+            return ttl or None
+        if self.annotated_ttl and is_side_effect_free(tool):
+            return self.annotated_ttl
+        return None
+
+    def get(self, key: CacheKey) -> Optional[List[Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._discard(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry.content)
+
+    def put(self, key: CacheKey, content: List[Any], ttl: float) -> None:
+        size = sum(len(json.dumps(item) if isinstance(item, dict) else item.model_dump_json()) for item in content)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = _Entry(list(content), size, time.monotonic() + ttl)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def invalidate(self, server_name: Optional[str] = None, tool_name: Optional[str] = None) -> int:
+        """Drop cached results, optionally only those of one server and/or tool; returns how many"""
+        keys = [key for key in self._entries
+                if (server_name is None or key[0] == server_name)
+                and (tool_name is None or key[1] == tool_name)]
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def parse_tool_ttls(spec: str) -> Dict[str, float]:
+    """Parse ``"server:tool=30,tool=5"`` into a TTL map"""
+    ttls = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, seconds = item.rpartition("=")
+        if not name:
+            raise ValueError(f"Invalid cache TTL {item!r}; expected tool=seconds")
+        ttls[name.strip()] = float(seconds)
+    return ttls
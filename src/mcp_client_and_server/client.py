@@ -1,78 +1,1379 @@
 import asyncio
-from typing import Dict, Any, List, Optional
+import logging
+import shlex
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple, Union
 
-from mcp.server import Server
-from mcp.server.stdio import stdio_server
+import anyio
+import anyio.abc
+import anyio.lowlevel
+from mcp import ClientSession
+from mcp.client.stdio import get_default_environment
+from mcp.shared.session import RequestResponder
 import mcp.types as types
 
+from .codec import PassthroughResult, ResultContent, content_models, decode_message, request_params
+from .cache import CacheKey, ResultCache, cache_key, is_side_effect_free
+from .metrics import metrics, tracer
+from .health import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitOpenError, ServerHealth
+
+logger = logging.getLogger(__name__)
+
+ToolContent = Union[types.TextContent, types.ImageContent, types.EmbeddedResource]
+# A downstream tool result; PassthroughResult keeps its content as plain JSON objects
+CallResult = Union[types.CallToolResult, PassthroughResult]
+
+# Seconds a downstream process gets to exit after its stdin is closed
+SHUTDOWN_GRACE_PERIOD = 2.0
+# Seconds a downstream process gets to complete the MCP handshake
+STARTUP_TIMEOUT = 30.0
+
+# How an unprefixed tool name offered by several servers is routed
+ROUTING_POLICIES = ("first-wins", "priority", "reject")
+
+# Which concurrent identical tool calls share one downstream call
+COALESCE_POLICIES = ("off", "safe", "all")
+
+# How a replica group picks the replica for a call, and which calls it may hedge
+BALANCE_POLICIES = ("least-outstanding", "p2c")
+HEDGE_POLICIES = ("off", "safe", "all")
+# Calls of a tool to observe before its latency percentile is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Seconds before a server whose tools could not be listed is listed again, doubling up to the maximum
+LIST_RETRY_DELAY = 1.0
+MAX_LIST_RETRY_DELAY = 30.0
+
+
+class ServerOverloadedError(RuntimeError):
+    """A downstream server has no free call slot and its wait queue is full"""
+
+
+@dataclass(frozen=True)
+class CallLimits:
+    """Backpressure settings for calls to one downstream server.
+
+    At most ``max_in_flight`` calls are sent at once and up to ``max_queued``
+    more wait for a slot; further calls fail with ``ServerOverloadedError``.
+    ``timeout`` is the deadline in seconds for a call, waiting included.
+    None means unbounded.
+    """
+    max_in_flight: Optional[int] = None
+    max_queued: Optional[int] = None
+    timeout: Optional[float] = None
+
+
+# Receives (progress, total) of a downstream call, for passing on to the caller
+ProgressCallback = Callable[[float, Optional[float]], Awaitable[None]]
+
+# Identifies the processes a warm pool can hand out for a connect
+WarmKey = Tuple[Tuple[str, ...], Optional[str], Optional[Tuple[Tuple[str, str], ...]]]
+
+
+def warm_key(command: List[str], cwd: Optional[str], env: Optional[Dict[str, str]]) -> WarmKey:
+    return tuple(command), cwd, tuple(sorted(env.items())) if env else None
+
+
+@dataclass
+class ToolCatalog:
+    """Merged tool listing across servers, with tool names prefixed by server.
+
+    ``errors`` maps each server that could not be listed (e.g. it timed out)
+    to the reason; their tools are missing from ``tools`` until a retry,
+    after the server's backoff, lists them. ``routes`` maps each
+    unprefixed tool name to the server that serves it, and ``ambiguous`` holds
+    names that the "reject" routing policy refuses to route.
+    """
+    tools: List[types.Tool]
+    errors: Dict[str, str] = field(default_factory=dict)
+    routes: Dict[str, str] = field(default_factory=dict)
+    ambiguous: Dict[str, List[str]] = field(default_factory=dict)
+
+
+class ServerRegistry:
+    """The servers a gateway should be connected to, by name.
+
+    Every change bumps ``version``, so a pool sharing the registry with other
+    worker processes only re-reads it after something changed.
+    """
+
+    def __init__(self):
+        # server name -> connect_server keyword arguments
+        self._servers: Dict[str, Dict[str, Any]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def register(self, name: str, options: Dict[str, Any]):
+        with self._lock:
+            self._servers[name] = dict(options)
+            self._version += 1
+
+    def unregister(self, name: str):
+        with self._lock:
+            if self._servers.pop(name, None) is not None:
+                self._version += 1
+
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return self._version, dict(self._servers)
+
+
+@asynccontextmanager
+async def stdio_transport(command: List[str],
+                          cwd: Optional[str] = None,
+                          env: Optional[Dict[str, str]] = None):
+    """Spawn a server process and expose its stdio as MCP message streams.
+
+    Mirrors mcp.client.stdio.stdio_client, but accepts a working directory,
+    always reaps the child process on exit instead of leaving it orphaned and
+    decodes messages with the faster codec.
+    """
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    process = await anyio.open_process(
+        command,
+        cwd=cwd,
+        env=env if env is not None else get_default_environment(),
+        stderr=sys.stderr,
+    )
+
+    async def stdout_reader():
+        try:
+            async with read_stream_writer:
+                # Pieces of a line still waiting for its newline; joined once, so
+                # a large message arriving in many chunks is not copied over and over
+                pending: List[bytes] = []
+                async for chunk in process.stdout:
+                    if b"\n" not in chunk:
+                        pending.append(chunk)
+                        continue
+                    lines = chunk.split(b"\n")
+                    pending.append(lines[0])
+                    lines[0] = b"".join(pending)
+                    pending = [lines.pop()]
+                    for line in lines:
+                        try:
+                            message = decode_message(line)
+                        except Exception as exc:
+                            await read_stream_writer.send(exc)
+                            continue
+                        await read_stream_writer.send(message)
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def stdin_writer():
+        try:
+            async with write_stream_reader:
+                async for message in write_stream_reader:
+                    json = message.model_dump_json(by_alias=True, exclude_none=True)
+                    await process.stdin.send((json + "\n").encode())
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(stdout_reader)
+            tg.start_soon(stdin_writer)
+            try:
+                yield read_stream, write_stream
+            finally:
+                tg.cancel_scope.cancel()
+    finally:
+        with anyio.CancelScope(shield=True):
+            await _reap_process(process)
+
+
+async def _reap_process(process: anyio.abc.Process) -> None:
+    """Close a child's stdin and wait for it to exit, killing it if it lingers"""
+    try:
+        await process.stdin.aclose()
+    except Exception:
+        pass
+    with anyio.move_on_after(SHUTDOWN_GRACE_PERIOD):
+        await process.wait()
+        return
+    logger.warning(f"Server process {process.pid} did not exit, killing it")
+    process.kill()
+    await process.wait()
+
+
+class ServerConnection:
+    """A live MCP session with one downstream server process.
+
+    The session is owned by a dedicated task, so it can be opened while serving
+    one request and closed while serving another without crossing anyio
+    cancel scopes.
+    """
+
+    def __init__(self,
+                 name: str,
+                 command: List[str],
+                 cwd: Optional[str] = None,
+                 env: Optional[Dict[str, str]] = None,
+                 notification_handler: Optional[Callable[[str, Any], None]] = None,
+                 limits: CallLimits = CallLimits(),
+                 send_cancellations: bool = False,
+                 health: Optional[ServerHealth] = None,
+                 passthrough: bool = True,
+                 start_timeout: Optional[float] = STARTUP_TIMEOUT):
+        self.name = name
+        self.command = list(command)
+        self.cwd = cwd
+        self.env = env
+        self.notification_handler = notification_handler
+        self.limits = limits
+        self.send_cancellations = send_cancellations
+        self.passthrough = passthrough
+        self.start_timeout = start_timeout
+        self.health = health or ServerHealth()
+        self.session: Optional[ClientSession] = None
+        # Calls waiting for a slot or sent and awaiting their result
+        self.in_flight = 0
+        self.queued = 0
+        self._abandoned_requests = 0
+        # progress token -> callback of the call that asked for progress
+        self._progress: Dict[Any, ProgressCallback] = {}
+        self._slots = asyncio.Semaphore(limits.max_in_flight) if limits.max_in_flight else None
+        self.connected_at = time.monotonic()
+        self.last_used = self.connected_at
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    def same_target(self,
+                    command: List[str],
+                    cwd: Optional[str],
+                    env: Optional[Dict[str, str]],
+                    limits: CallLimits,
+                    replicas: int = 1,
+                    **group_options) -> bool:
+        return (replicas == 1 and self.command == list(command) and self.cwd == cwd and self.env == env
+                and self.limits == limits)
+
+    def summary(self) -> Dict[str, Any]:
+        return dict(self.health.summary(), alive=self.alive)
+
+    def assign(self, name: str, limits: CallLimits, health: ServerHealth):
+        """Give a connection started ahead of time (by a warm pool) its place in the pool"""
+        self.name = name
+        self.limits = limits
+        self._slots = asyncio.Semaphore(limits.max_in_flight) if limits.max_in_flight else None
+        self.health = health
+        self.connected_at = time.monotonic()
+        self.last_used = self.connected_at
+
+    async def start(self):
+        """Spawn the process and complete the MCP handshake; a running connection is left as is
+
+        A process that does not complete the handshake within ``start_timeout``
+        seconds is stopped and TimeoutError raised.
+        """
+        if self.alive:
+            return
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run(ready), name=f"mcp-server:{self.name}")
+        try:
+            async with asyncio.timeout(self.start_timeout):
+                await ready
+        except TimeoutError:
+            await self.close()
+            raise TimeoutError(f"Server '{self.name}' did not complete the handshake "
+                               f"within {self.start_timeout} seconds") from None
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _run(self, ready: asyncio.Future):
+        try:
+            async with stdio_transport(self.command, self.cwd, self.env) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    async with anyio.create_task_group() as tg:
+                        async def wait_for_close():
+                            await self._closing.wait()
+                            tg.cancel_scope.cancel()
+
+                        async def drain():
+                            # Returns once the process goes away
+                            await self._drain(session)
+                            tg.cancel_scope.cancel()
+
+                        # Started before the handshake, which would otherwise wait forever on a process
+                        # that exits or a connection closed during startup
+                        tg.start_soon(wait_for_close)
+                        tg.start_soon(drain)
+                        await session.initialize()
+                        if ready.done():
+                            # start gave up waiting, and is closing the connection
+                            return
+                        self.session = session
+                        ready.set_result(None)
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"Connection to server '{self.name}' failed: {e}")
+        finally:
+            if self.session is not None:
+                # Calls still waiting for a response would otherwise wait forever
+                for stream in list(self.session._response_streams.values()):
+                    stream.close()
+                self.session._response_streams.clear()
+            self.session = None
+            if not ready.done():
+                ready.set_exception(ConnectionError(f"Server '{self.name}' exited during startup"))
+
+    async def _drain(self, session: ClientSession):
+        """Consume messages the server sends on its own initiative.
+
+        The session hands these to an unbuffered stream, so leaving them unread
+        would stall every pending response behind them.
+        """
+        async for message in session.incoming_messages:
+            if isinstance(message, RequestResponder):
+                if isinstance(message.request.root, types.PingRequest):
+                    await message.respond(types.ClientResult(types.EmptyResult()))
+                else:
+                    await message.respond(types.ErrorData(code=types.METHOD_NOT_FOUND, message="Method not found"))
+            elif isinstance(message, Exception) and self._abandoned_requests:
+                self._abandoned_requests -= 1
+                logger.debug(f"Dropped a late response from server '{self.name}': {message}")
+            elif isinstance(message, Exception):
+                logger.warning(f"Server '{self.name}' sent an invalid message: {message}")
+            elif isinstance(message.root, types.ProgressNotification):
+                await self._forward_progress(message.root.params)
+            else:
+                self.on_notification(message.root)
+
+    async def _forward_progress(self, params: types.ProgressNotificationParams):
+        callback = self._progress.get(params.progressToken)
+        if callback is None:
+            return
+        try:
+            await callback(params.progress, params.total)
+        except Exception as e:
+            logger.debug(f"Could not pass on progress from server '{self.name}': {e}")
+
+    def on_notification(self, notification: Any):
+        """Pass a server notification on to the owner of this connection"""
+        logger.debug(f"Notification from server '{self.name}': {notification.method}")
+        if self.notification_handler is not None:
+            self.notification_handler(self.name, notification)
+
+    def _require_session(self) -> ClientSession:
+        if not self.alive:
+            raise ConnectionError(f"Server {self.name} is not running")
+        return self.session
+
+    async def list_tools(self) -> List[types.Tool]:
+        session = self._require_session()
+        self.in_flight += 1
+        try:
+            return (await session.list_tools()).tools
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    async def call_tool(self,
+                        tool_name: str,
+                        arguments: Dict[str, Any],
+                        timeout: Optional[float] = None,
+                        hedge: bool = False,
+                        progress: Optional[ProgressCallback] = None,
+                        cancel_downstream: bool = True) -> CallResult:
+        """Call a tool within this connection's limits.
+
+        ``timeout`` overrides the deadline from the limits. A call that misses
+        its deadline or is cancelled is also cancelled on the server when the
+        connection sends cancellations and ``cancel_downstream`` allows it.
+        ``hedge`` only matters for replica groups. With ``progress``, the
+        server is asked for progress notifications, which are handed to the
+        callback.
+        """
+        self.health.check(self.name)
+        session = self._require_session()
+        limits = self.limits
+        if timeout is None:
+            timeout = limits.timeout
+        if (self._slots is not None and self._slots.locked()
+                and limits.max_queued is not None and self.queued >= limits.max_queued):
+            raise ServerOverloadedError(
+                f"Server {self.name} is overloaded: {limits.max_in_flight} calls in flight "
+                f"and {self.queued} waiting"
+            )
+
+        self.in_flight += 1
+        try:
+            async with asyncio.timeout(timeout):
+                if self._slots is None:
+                    return await self._send_call(session, tool_name, arguments, progress, cancel_downstream)
+                self.queued += 1
+                try:
+                    await self._slots.acquire()
+                finally:
+                    self.queued -= 1
+                try:
+                    return await self._send_call(session, tool_name, arguments, progress, cancel_downstream)
+                finally:
+                    self._slots.release()
+        except TimeoutError:
+            self.health.record_failure(f"call timed out after {timeout} seconds")
+            raise TimeoutError(f"Call to {self.name}:{tool_name} timed out after {timeout} seconds") from None
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+    async def _send_call(self,
+                         session: ClientSession,
+                         tool_name: str,
+                         arguments: Dict[str, Any],
+                         progress: Optional[ProgressCallback] = None,
+                         cancel_downstream: bool = True) -> CallResult:
+        # call_tool takes this id for its request before it first yields
+        request_id = session._request_id
+        started = time.monotonic()
+        with tracer.span("downstream tools/call", server=self.name, tool=tool_name):
+            meta = {}
+            if progress is not None:
+                # The request id doubles as the progress token, being unique within the session
+                meta["progressToken"] = request_id
+                self._progress[request_id] = progress
+            traceparent = tracer.traceparent()
+            if traceparent is not None:
+                meta["traceparent"] = traceparent
+            try:
+                result = await session.send_request(
+                    types.ClientRequest(types.CallToolRequest(
+                        method="tools/call", params=request_params(tool_name, arguments, meta))),
+                    PassthroughResult if self.passthrough else types.CallToolResult,
+                )
+            except anyio.EndOfStream:
+                self.health.record_failure("connection closed")
+                metrics.inc("mcp_downstream_errors_total", server=self.name)
+                raise ConnectionError(f"Server {self.name} closed the connection") from None
+            except asyncio.CancelledError:
+                metrics.inc("mcp_downstream_cancelled_total", server=self.name)
+                if self.send_cancellations and cancel_downstream:
+                    # Shielded so a second cancellation cannot skip telling the server
+                    await asyncio.shield(self._cancel_request(session, request_id))
+                raise
+            finally:
+                self._progress.pop(request_id, None)
+        latency = time.monotonic() - started
+        self.health.record_success(latency)
+        metrics.observe("mcp_downstream_call_seconds", latency, server=self.name)
+        if result.isError:
+            metrics.inc("mcp_downstream_errors_total", server=self.name)
+        return result
+
+    async def ping(self):
+        await self._require_session().send_ping()
+
+    async def _cancel_request(self, session: ClientSession, request_id: int):
+        """Send notifications/cancelled for a request and stop waiting for its response"""
+        stream = session._response_streams.pop(request_id, None)
+        if stream is not None:
+            stream.close()
+            # The response may still arrive, and will then be dropped by _drain
+            self._abandoned_requests += 1
+        notification = types.JSONRPCNotification(
+            jsonrpc="2.0",
+            method="notifications/cancelled",
+            params={"requestId": request_id, "reason": "Request cancelled by the gateway"},
+        )
+        try:
+            await session._write_stream.send(types.JSONRPCMessage(notification))
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            pass
+
+    async def close(self):
+        """Shut the session down and reap the process"""
+        self._closing.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.session = None
+
+
+class ReplicaGroup:
+    """Several processes of one server, serving calls under a single name.
+
+    Each call goes to a running replica whose circuit is not open, picked by
+    ``balance``: the one with the fewest calls outstanding
+    ("least-outstanding"), or the less busy of two picked at random ("p2c"),
+    which spreads load without every caller converging on the same replica.
+
+    With ``hedge`` allowed for a call, a second copy is sent to another
+    replica once the call has taken longer than the 95th percentile of recent
+    latencies of that tool; the first result wins and the other copy is
+    abandoned. Hedged copies are never cancelled downstream, so losing a race
+    cannot cost a replica whose server does not accept cancellations its
+    connection.
+    """
+
+    def __init__(self, name: str, replicas: List[ServerConnection], balance: str = "least-outstanding",
+                 hedge: str = "off"):
+        if balance not in BALANCE_POLICIES:
+            raise ValueError(f"Unknown balancing policy: {balance}")
+        if hedge not in HEDGE_POLICIES:
+            raise ValueError(f"Unknown hedging policy: {hedge}")
+        self.name = name
+        self.replicas = replicas
+        self.balance = balance
+        self.hedge = hedge
+        self.connected_at = time.monotonic()
+        # tool name -> recent call latencies
+        self._latencies: Dict[str, deque] = {}
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+
+    @property
+    def alive(self) -> bool:
+        return any(replica.alive for replica in self.replicas)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(replica.in_flight for replica in self.replicas)
+
+    @property
+    def last_used(self) -> float:
+        return max(replica.last_used for replica in self.replicas)
+
+    @property
+    def command(self) -> List[str]:
+        return self.replicas[0].command
+
+    def same_target(self,
+                    command: List[str],
+                    cwd: Optional[str],
+                    env: Optional[Dict[str, str]],
+                    limits: CallLimits,
+                    replicas: int = 1,
+                    balance: str = "least-outstanding",
+                    hedge: str = "off") -> bool:
+        first = self.replicas[0]
+        return (replicas == len(self.replicas) and balance == self.balance and hedge == self.hedge
+                and first.same_target(command, cwd, env, limits))
+
+    async def start(self):
+        results = await asyncio.gather(*(replica.start() for replica in self.replicas), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self.close()
+            raise errors[0]
+
+    def _pick(self, exclude: Optional[ServerConnection] = None) -> Optional[ServerConnection]:
+        candidates = [replica for replica in self.replicas
+                      if replica is not exclude and replica.alive and replica.health.state != CIRCUIT_OPEN]
+        if not candidates:
+            return None
+        if self.balance == "p2c" and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        return min(candidates, key=lambda replica: (replica.in_flight, random.random()))
+
+    def hedge_delay(self, tool_name: str) -> Optional[float]:
+        """Seconds after which a call is hedged, once enough latencies are known"""
+        latencies = self._latencies.get(tool_name)
+        if latencies is None or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+
+    def _record_latency(self, tool_name: str, latency: float):
+        latencies = self._latencies.get(tool_name)
+        if latencies is None:
+            latencies = self._latencies[tool_name] = deque(maxlen=LATENCY_WINDOW)
+        latencies.append(latency)
+
+    async def call_tool(self,
+                        tool_name: str,
+                        arguments: Dict[str, Any],
+                        timeout: Optional[float] = None,
+                        hedge: bool = False,
+                        progress: Optional[ProgressCallback] = None) -> CallResult:
+        primary = self._pick()
+        if primary is None:
+            if any(replica.alive for replica in self.replicas):
+                raise CircuitOpenError(f"Every replica of server {self.name} is unhealthy; not calling it")
+            raise ConnectionError(f"No replica of server {self.name} is running")
+
+        started = time.monotonic()
+        delay = self.hedge_delay(tool_name) if hedge else None
+        if delay is None:
+            result = await primary.call_tool(tool_name, arguments, timeout, progress=progress)
+            self._record_latency(tool_name, time.monotonic() - started)
+            return result
+
+        # Only the first copy reports progress, so the caller sees one steadily increasing sequence
+        first = asyncio.ensure_future(primary.call_tool(tool_name, arguments, timeout, progress=progress,
+                                                        cancel_downstream=False))
+        calls = [first]
+        try:
+            done, _ = await asyncio.wait(calls, timeout=delay)
+            backup = None if done else self._pick(exclude=primary)
+            if backup is not None:
+                self.hedged_calls += 1
+                calls.append(asyncio.ensure_future(backup.call_tool(tool_name, arguments, timeout,
+                                                                    cancel_downstream=False)))
+
+            pending = set(calls)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for call in done:
+                    if call.exception() is None:
+                        if call is not first:
+                            self.hedge_wins += 1
+                        self._record_latency(tool_name, time.monotonic() - started)
+                        return call.result()
+                    error = error or call.exception()
+            raise error
+        finally:
+            for call in calls:
+                if not call.done():
+                    call.cancel()
+
+    async def list_tools(self) -> List[types.Tool]:
+        replica = self._pick() or self.replicas[0]
+        return await replica.list_tools()
+
+    def summary(self) -> Dict[str, Any]:
+        """Health of the group as a whole; latencies and errors are pooled across replicas"""
+        healths = [replica.health for replica in self.replicas]
+        pooled = ServerHealth(window=sum(len(health.outcomes) for health in healths) or 1)
+        for health in healths:
+            pooled.latencies.extend(health.latencies)
+            pooled.outcomes.extend(health.outcomes)
+        summary = pooled.summary()
+        states = {health.state for health in healths}
+        summary.update(
+            circuit=CIRCUIT_CLOSED if CIRCUIT_CLOSED in states else CIRCUIT_HALF_OPEN if CIRCUIT_HALF_OPEN in states else CIRCUIT_OPEN,
+            restarts=sum(health.restarts for health in healths),
+            last_error=next((health.last_error for health in healths if health.last_error), None),
+            alive=self.alive,
+            replicas=f"{sum(replica.alive for replica in self.replicas)}/{len(self.replicas)} up",
+            hedged_calls=self.hedged_calls,
+        )
+        return summary
+
+    async def close(self):
+        await asyncio.gather(*(replica.close() for replica in self.replicas))
+
+
+def _members(connection) -> List[ServerConnection]:
+    """The processes behind a pool entry"""
+    return connection.replicas if isinstance(connection, ReplicaGroup) else [connection]
+
 
 class MCPChainedClient:
-    def __init__(self, server_name: str = "mcp-chained-client"):
+    """Process-lifetime pool of downstream server connections.
+
+    Connections stay open across tool calls and are kept in least-recently-used
+    order. When ``max_servers`` is reached, the least recently used idle
+    connection is evicted to make room; connections idle for longer than
+    ``idle_timeout`` seconds are closed on the next connect.
+
+    Tool listings are cached per server for ``catalog_ttl`` seconds, or until
+    the server sends ``notifications/tools/list_changed``. Servers are listed
+    concurrently and each gets ``list_timeout`` seconds to answer.
+
+    Unprefixed tool names are routed through an index built with the catalog.
+    When several servers offer the same name, ``routing_policy`` picks the
+    earliest connected server ("first-wins"), the first server in
+    ``server_priority`` ("priority", falling back to connection order) or
+    refuses to guess ("reject").
+
+    With a ``registry`` (usually a proxy shared by worker processes) connects
+    and disconnects are recorded there, and ``sync_registry`` brings this pool
+    in line with changes made by other workers.
+
+    ``call_limits`` bounds the calls in flight to, and the wait for, each
+    server; ``connect_server`` can override it per server. Calls that miss
+    their deadline or are abandoned stop being waited for. With
+    ``send_cancellations`` on they are also cancelled downstream with
+    ``notifications/cancelled``; it is off by default because servers built
+    on SDKs that do not know the notification (mcp 1.1.0 among them) drop the
+    connection when they receive it, and the initialize handshake does not say
+    whether a server accepts it.
+
+    With a ``result_cache``, results of tools it is configured to cache are
+    served from it instead of calling the downstream server again.
+
+    Identical calls (same server, tool and arguments) made while one is
+    already in flight wait for its result instead of being sent again. With
+    ``coalesce_calls="safe"`` this only applies to cached tools and tools
+    annotated read-only or idempotent; "all" applies it to every tool and
+    "off" disables it. ``collapsed_calls`` counts the calls saved.
+
+    With ``health_interval`` set, every server is pinged that often and its
+    latency and errors are tracked along with those of calls. A server failing
+    ``failure_threshold`` times in a row has its circuit opened, so calls to it
+    fail fast for ``reset_timeout`` seconds, and a server whose process died
+    is restarted with exponential backoff.
+
+    ``warm`` keeps processes of a command started and initialized ahead of
+    time, so connecting to it (or restarting it) takes one from the pool
+    instead of waiting for the process to start; the pool is refilled in the
+    background.
+
+    ``connect_server`` with ``replicas`` above 1 starts that many processes of
+    the server as a ReplicaGroup and spreads calls across them. Calls are
+    hedged following the group's ``hedge`` policy: "safe" only hedges the
+    tools that could be coalesced under "safe", "all" hedges every tool.
+
+    With ``passthrough`` on, tool results made of plain text and image content
+    are forwarded without validating them into content models first.
+    """
+
+    def __init__(self,
+                 server_name: str = "mcp-chained-client",
+                 max_servers: Optional[int] = None,
+                 idle_timeout: Optional[float] = None,
+                 catalog_ttl: Optional[float] = 60.0,
+                 list_timeout: Optional[float] = 5.0,
+                 routing_policy: str = "first-wins",
+                 server_priority: Optional[List[str]] = None,
+                 registry: Optional[ServerRegistry] = None,
+                 result_cache: Optional[ResultCache] = None,
+                 coalesce_calls: str = "safe",
+                 call_limits: CallLimits = CallLimits(),
+                 send_cancellations: bool = False,
+                 health_interval: Optional[float] = None,
+                 ping_timeout: float = 5.0,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 10.0,
+                 passthrough: bool = True,
+                 start_timeout: Optional[float] = STARTUP_TIMEOUT):
+        if routing_policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy: {routing_policy}")
+        if coalesce_calls not in COALESCE_POLICIES:
+            raise ValueError(f"Unknown coalescing policy: {coalesce_calls}")
         self.server_name = server_name
-        self.connected_servers: Dict[str, Server] = {}
-        
-    async def connect_server(self, 
-                              name: str, 
-                              command: List[str], 
-                              cwd: Optional[str] = None) -> Server:
-        """Connect to a server using stdio"""
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            cwd=cwd
-        )
-        
-        server = await stdio_server(process.stdin, process.stdout)
-        self.connected_servers[name] = server
-        return server
-        
+        self.max_servers = max_servers
+        self.idle_timeout = idle_timeout
+        self.catalog_ttl = catalog_ttl
+        self.list_timeout = list_timeout
+        self.routing_policy = routing_policy
+        self.server_priority = list(server_priority or [])
+        self.connected_servers: "OrderedDict[str, Union[ServerConnection, ReplicaGroup]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._starting = 0
+        # server name -> (fetched at, unprefixed tools)
+        self._server_tools: Dict[str, Tuple[float, List[types.Tool]]] = {}
+        self._catalog: Optional[ToolCatalog] = None
+        self._catalog_generation = 0
+        # server name -> (monotonic time of the next listing attempt, reason, failures in a row)
+        self._list_failures: Dict[str, Tuple[float, str, int]] = {}
+        # server name -> why its tools are missing from the last catalog built
+        self.list_errors: Dict[str, str] = {}
+        self.registry = registry
+        self._registry_version: Optional[int] = None
+        self._version_check: Optional[asyncio.Future] = None
+        self.result_cache = result_cache
+        self.coalesce_calls = coalesce_calls
+        self._calls_in_flight: Dict[CacheKey, asyncio.Future] = {}
+        self.collapsed_calls = 0
+        self.call_limits = call_limits
+        self.send_cancellations = send_cancellations
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.passthrough = passthrough
+        self.start_timeout = start_timeout
+        self._monitor_task: Optional[asyncio.Task] = None
+        # Declared pool sizes, idle warm connections and their refill tasks
+        self._warm_sizes: Dict[WarmKey, int] = {}
+        self._warm: Dict[WarmKey, List[ServerConnection]] = {}
+        self._warm_fills: Dict[WarmKey, asyncio.Task] = {}
+        self.warm_hits = 0
+        self.warm_misses = 0
+
+    async def connect_server(self,
+                              name: str,
+                              command: Union[str, List[str]],
+                              cwd: Optional[str] = None,
+                              env: Optional[Dict[str, str]] = None,
+                              limits: Optional[CallLimits] = None,
+                              replicas: int = 1,
+                              balance: str = "least-outstanding",
+                              hedge: str = "off") -> Union[ServerConnection, ReplicaGroup]:
+        """Connect to a server using stdio, reusing a live connection to the same command
+
+        With ``replicas`` above 1, starts that many processes behind one name.
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if not command:
+            raise ValueError("command must not be empty")
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1")
+        if balance not in BALANCE_POLICIES:
+            raise ValueError(f"Unknown balancing policy: {balance}")
+        if hedge not in HEDGE_POLICIES:
+            raise ValueError(f"Unknown hedging policy: {hedge}")
+
+        options = dict(command=command, cwd=cwd, env=env, limits=limits,
+                       replicas=replicas, balance=balance, hedge=hedge)
+        connection = await self._connect(name, **options)
+        if self.registry is not None:
+            await self._registry_call(self.registry.register, name, options)
+        return connection
+
+    async def _connect(self,
+                       name: str,
+                       command: List[str],
+                       cwd: Optional[str],
+                       env: Optional[Dict[str, str]],
+                       limits: Optional[CallLimits] = None,
+                       replicas: int = 1,
+                       balance: str = "least-outstanding",
+                       hedge: str = "off") -> Union[ServerConnection, ReplicaGroup]:
+        limits = limits or self.call_limits
+        # Connects to one name take turns; processes of different names start concurrently
+        async with self._connect_locks.setdefault(name, asyncio.Lock()):
+            async with self._lock:
+                existing = self.connected_servers.get(name)
+                health = None
+                if existing is not None:
+                    if existing.same_target(command, cwd, env, limits, replicas, balance=balance, hedge=hedge):
+                        if existing.alive:
+                            self.connected_servers.move_to_end(name)
+                            return existing
+                        if isinstance(existing, ServerConnection):
+                            health = existing.health
+                    await self._remove(name)
+
+                await self._make_room()
+                if replicas == 1:
+                    connection = self._new_connection(name, command, cwd, env, limits, health)
+                else:
+                    connection = ReplicaGroup(name, [self._new_connection(name, command, cwd, env, limits)
+                                                     for _ in range(replicas)], balance=balance, hedge=hedge)
+                self._starting += 1
+            try:
+                await connection.start()
+            finally:
+                self._starting -= 1
+            async with self._lock:
+                self.connected_servers[name] = connection
+                self._catalog = None
+            copies = f" ({replicas} replicas)" if replicas > 1 else ""
+            logger.info(f"Connected server '{name}'{copies}: {' '.join(command)}")
+            self._start_monitor()
+            return connection
+
+    def _new_connection(self,
+                        name: str,
+                        command: List[str],
+                        cwd: Optional[str],
+                        env: Optional[Dict[str, str]],
+                        limits: CallLimits,
+                        health: Optional[ServerHealth] = None) -> ServerConnection:
+        if health is None:
+            health = ServerHealth(failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
+        connection = self._take_warm(command, cwd, env)
+        if connection is not None:
+            connection.assign(name, limits, health)
+            return connection
+        return ServerConnection(name, command, cwd=cwd, env=env,
+                                notification_handler=self._handle_notification,
+                                limits=limits,
+                                send_cancellations=self.send_cancellations,
+                                health=health,
+                                passthrough=self.passthrough,
+                                start_timeout=self.start_timeout)
+
+    def warm(self,
+             command: Union[str, List[str]],
+             cwd: Optional[str] = None,
+             env: Optional[Dict[str, str]] = None,
+             size: int = 1) -> asyncio.Task:
+        """Keep ``size`` processes of a command started ahead of time.
+
+        Returns the task filling the pool, which callers may await.
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        if not command:
+            raise ValueError("command must not be empty")
+        key = warm_key(command, cwd, env)
+        self._warm_sizes[key] = size
+        return self._fill_warm(key)
+
+    def _take_warm(self,
+                   command: List[str],
+                   cwd: Optional[str],
+                   env: Optional[Dict[str, str]]) -> Optional[ServerConnection]:
+        key = warm_key(command, cwd, env)
+        if key not in self._warm_sizes:
+            return None
+        idle = self._warm.get(key, [])
+        connection = None
+        while idle and connection is None:
+            candidate = idle.pop(0)
+            if candidate.alive:
+                connection = candidate
+        if connection is None:
+            self.warm_misses += 1
+        else:
+            self.warm_hits += 1
+        self._fill_warm(key)
+        return connection
+
+    def _fill_warm(self, key: WarmKey) -> asyncio.Task:
+        task = self._warm_fills.get(key)
+        if task is None or task.done():
+            task = self._warm_fills[key] = asyncio.create_task(self._refill(key), name="mcp-warm-pool")
+        return task
+
+    async def _refill(self, key: WarmKey):
+        command, cwd, env = key
+        env = dict(env) if env is not None else None
+        idle = self._warm.setdefault(key, [])
+        idle[:] = [connection for connection in idle if connection.alive]
+        missing = self._warm_sizes.get(key, 0) - len(idle)
+        if missing <= 0:
+            return
+        connections = [ServerConnection("(warm)", list(command), cwd=cwd, env=env,
+                                        notification_handler=self._handle_notification,
+                                        send_cancellations=self.send_cancellations,
+                                        passthrough=self.passthrough,
+                                        start_timeout=self.start_timeout)
+                       for _ in range(missing)]
+        results = await asyncio.gather(*(connection.start() for connection in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, BaseException):
+                # Not retried until the next connect, so a broken command does not respawn in a loop
+                logger.error(f"Could not warm up {' '.join(command)}: {result}")
+            else:
+                idle.append(connection)
+
+    def warm_stats(self) -> Dict[str, int]:
+        return {
+            "warm_idle": sum(len(idle) for idle in self._warm.values()),
+            "warm_hits": self.warm_hits,
+            "warm_misses": self.warm_misses,
+        }
+
+    def _start_monitor(self):
+        if self.health_interval and (self._monitor_task is None or self._monitor_task.done()):
+            self._monitor_task = asyncio.create_task(self._monitor(), name="mcp-health-monitor")
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.exception(f"Health check failed: {e}")
+
+    async def check_health(self):
+        """Ping every live server and restart crashed ones whose backoff has passed"""
+        await asyncio.gather(*(self._check_server(name, member)
+                               for name, connection in list(self.connected_servers.items())
+                               for member in _members(connection)))
+
+    async def _check_server(self, name: str, connection: ServerConnection):
+        health = connection.health
+        if connection.alive:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(connection.ping(), self.ping_timeout)
+            except Exception as e:
+                health.record_failure("ping timed out" if isinstance(e, asyncio.TimeoutError) else f"ping failed: {e}")
+            else:
+                health.record_success(time.monotonic() - started)
+        elif health.restart_due():
+            await self._restart(name, connection)
+
+    async def _restart(self, name: str, connection: ServerConnection):
+        """Replace a dead connection with a new process, keeping its place and health
+
+        The process is started outside the pool lock, as in ``_connect``, so a
+        slow restart only holds up connects to the same name.
+        """
+        async with self._connect_locks.setdefault(name, asyncio.Lock()):
+            async with self._lock:
+                entry = self.connected_servers.get(name)
+                if entry is None or connection not in _members(entry):
+                    return
+                replacement = self._new_connection(name, connection.command, connection.cwd, connection.env,
+                                                   connection.limits, health=connection.health)
+            try:
+                await replacement.start()
+            except Exception as e:
+                logger.error(f"Restarting server '{name}' failed: {e}")
+                connection.health.restart_failed(str(e))
+                return
+            async with self._lock:
+                entry = self.connected_servers.get(name)
+                if entry is None or connection not in _members(entry):
+                    # Removed while the replacement was starting
+                    await replacement.close()
+                    return
+                await connection.close()
+                replacement.connected_at = connection.connected_at
+                if isinstance(entry, ReplicaGroup):
+                    entry.replicas[entry.replicas.index(connection)] = replacement
+                else:
+                    self.connected_servers[name] = replacement
+                self.invalidate_tools(name)
+                if self.result_cache is not None:
+                    self.result_cache.invalidate(name)
+            connection.health.restarted()
+            logger.info(f"Restarted server '{name}' (restart {connection.health.restarts})")
+
+    async def _make_room(self):
+        """Close expired idle connections, then evict LRU idle ones down to the limit"""
+        now = time.monotonic()
+        for name, connection in list(self.connected_servers.items()):
+            expired = (self.idle_timeout is not None
+                       and connection.in_flight == 0
+                       and now - connection.last_used > self.idle_timeout)
+            # Dead servers are kept for the health monitor to restart
+            dead = not connection.alive and not self.health_interval
+            if expired or dead:
+                await self._remove(name)
+
+        if self.max_servers is None:
+            return
+        # Servers still starting count against the limit, but cannot be evicted yet
+        while len(self.connected_servers) + self._starting >= self.max_servers:
+            victim = next((name for name, connection in self.connected_servers.items()
+                           if connection.in_flight == 0), None)
+            if victim is None:
+                raise RuntimeError(f"Server limit of {self.max_servers} reached and all servers are busy")
+            logger.info(f"Evicting least recently used server '{victim}'")
+            await self._remove(victim)
+
+    async def _remove(self, name: str):
+        connection = self.connected_servers.pop(name, None)
+        self.invalidate_tools(name)
+        if self.result_cache is not None:
+            self.result_cache.invalidate(name)
+        if connection is not None:
+            await connection.close()
+
+    def _handle_notification(self, server_name: str, notification: Any):
+        if isinstance(notification, types.ToolListChangedNotification):
+            self.invalidate_tools(server_name)
+
+    def invalidate_tools(self, server_name: Optional[str] = None):
+        """Drop cached tool listings for one server, or for all of them"""
+        if server_name is None:
+            self._server_tools.clear()
+            self._list_failures.clear()
+        else:
+            self._server_tools.pop(server_name, None)
+            self._list_failures.pop(server_name, None)
+        self._catalog = None
+        self._catalog_generation += 1
+
+    def _cached_tools(self, server_name: str) -> Optional[List[types.Tool]]:
+        entry = self._server_tools.get(server_name)
+        if entry is None:
+            return None
+        fetched_at, tools = entry
+        if self.catalog_ttl is not None and time.monotonic() - fetched_at > self.catalog_ttl:
+            return None
+        return tools
+
+    def _listing_backed_off(self, server_name: str) -> bool:
+        """Whether a server's tools failed to list and may not be listed again yet"""
+        failure = self._list_failures.get(server_name)
+        return failure is not None and time.monotonic() < failure[0]
+
+    async def _fetch_tools(self, server_name: str) -> List[types.Tool]:
+        """A server's tools, listed unless cached; a server that failed to list fails fast until its backoff passes"""
+        tools = self._cached_tools(server_name)
+        if tools is not None:
+            return tools
+        if self._listing_backed_off(server_name):
+            raise ConnectionError(self._list_failures[server_name][1])
+        generation = self._catalog_generation
+        connection = self._get(server_name)
+        try:
+            tools = await asyncio.wait_for(connection.list_tools(), self.list_timeout)
+        except Exception as e:
+            if generation == self._catalog_generation:
+                failures = self._list_failures.get(server_name, (0.0, "", 0))[2] + 1
+                delay = min(MAX_LIST_RETRY_DELAY, LIST_RETRY_DELAY * 2 ** (failures - 1))
+                reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                self._list_failures[server_name] = (time.monotonic() + delay, reason, failures)
+            raise
+        if generation == self._catalog_generation:
+            self._server_tools[server_name] = (time.monotonic(), tools)
+            self._list_failures.pop(server_name, None)
+        return tools
+
+    def _get(self, name: str) -> Union[ServerConnection, ReplicaGroup]:
+        connection = self.connected_servers.get(name)
+        if connection is None:
+            raise ValueError(f"Server {name} not connected")
+        self.connected_servers.move_to_end(name)
+        return connection
+
     async def disconnect_server(self, name: str):
         """Disconnect a specific server"""
-        if name in self.connected_servers:
-            await self.connected_servers[name].close()
-            del self.connected_servers[name]
-        
+        async with self._lock:
+            await self._remove(name)
+        if self.registry is not None:
+            await self._registry_call(self.registry.unregister, name)
+
+    async def _registry_call(self, method: Callable, *args) -> Any:
+        """Call a registry method, in a thread when the registry is a proxy to another process"""
+        if isinstance(self.registry, ServerRegistry):
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def _current_registry_version(self) -> int:
+        # Concurrent callers share one check instead of each making a round trip
+        if self._version_check is None or self._version_check.done():
+            self._version_check = asyncio.ensure_future(self._registry_call(self.registry.version))
+        return await asyncio.shield(self._version_check)
+
+    async def sync_registry(self):
+        """Connect and disconnect servers to match the shared registry
+
+        A registry shared between worker processes is a manager proxy, whose
+        calls are round trips to the manager; they are made off the event loop.
+        """
+        if self.registry is None or await self._current_registry_version() == self._registry_version:
+            return
+        version, servers = await self._registry_call(self.registry.snapshot)
+        for name in list(self.connected_servers):
+            if name not in servers:
+                async with self._lock:
+                    await self._remove(name)
+        results = await asyncio.gather(*(self._connect(name, **options) for name, options in servers.items()),
+                                       return_exceptions=True)
+        for name, result in zip(servers, results):
+            if isinstance(result, Exception):
+                logger.error(f"Could not connect registered server '{name}': {result}")
+        self._registry_version = version
+
     async def list_servers(self) -> List[str]:
         """List all connected servers"""
         return list(self.connected_servers.keys())
-        
+
     async def list_tools(self, server_name: Optional[str] = None) -> List[types.Tool]:
-        """List tools from a specific server or all servers"""
+        """List tools from a specific server or all servers
+
+        Servers that cannot be listed are left out of the merged listing; see
+        ``list_errors`` or ``get_catalog`` for which ones and why.
+        """
         if server_name:
-            if server_name not in self.connected_servers:
-                raise ValueError(f"Server {server_name} not connected")
-            return await self.connected_servers[server_name].list_tools()
-        
-        all_tools = []
-        for name, server in self.connected_servers.items():
-            server_tools = await server.list_tools()
-            # Prefix tools with server name
-            for tool in server_tools:
-                tool.name = f"{name}:{tool.name}"
-            all_tools.extend(server_tools)
-        return all_tools
-        
-    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> List[types.Content]:
-        """Call a tool, potentially across servers"""
+            return await self._fetch_tools(server_name)
+        return (await self.get_catalog()).tools
+
+    async def get_catalog(self) -> ToolCatalog:
+        """Return the merged tool catalog, listing stale servers concurrently
+
+        A catalog missing servers that could not be listed is kept too; it is
+        rebuilt once one of them is due for another attempt, so callers do not
+        wait on a broken server every time.
+        """
+        catalog = self._catalog
+        if catalog is not None and all(self._cached_tools(name) is not None
+                                       or (name in catalog.errors and self._listing_backed_off(name))
+                                       for name in self.connected_servers):
+            return catalog
+
+        generation = self._catalog_generation
+        names = self._routing_order()
+        results = await asyncio.gather(*(self._fetch_tools(name) for name in names), return_exceptions=True)
+
+        catalog = ToolCatalog(tools=[])
+        providers: Dict[str, List[str]] = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                failure = self._list_failures.get(name)
+                reason = failure[1] if failure is not None else str(result)
+                logger.warning(f"Could not list tools of server '{name}': {reason}")
+                catalog.errors[name] = reason
+                continue
+            # Prefix copies so the cached per-server listings stay untouched
+            catalog.tools.extend(tool.model_copy(update={"name": f"{name}:{tool.name}"}) for tool in result)
+            for tool in result:
+                providers.setdefault(tool.name, []).append(name)
+
+        for tool_name, servers in providers.items():
+            if len(servers) > 1 and self.routing_policy == "reject":
+                catalog.ambiguous[tool_name] = servers
+            else:
+                catalog.routes[tool_name] = servers[0]
+
+        self.list_errors = dict(catalog.errors)
+        if generation == self._catalog_generation:
+            self._catalog = catalog
+        return catalog
+
+    def _routing_order(self) -> List[str]:
+        """Connected servers in the order that wins routing conflicts"""
+        names = sorted(self.connected_servers, key=lambda name: self.connected_servers[name].connected_at)
+        if self.routing_policy == "priority":
+            rank = {name: index for index, name in enumerate(self.server_priority)}
+            names.sort(key=lambda name: rank.get(name, len(rank)))
+        return names
+
+    async def resolve_tool(self, tool_name: str) -> Tuple[str, str]:
+        """Map a possibly unprefixed tool name to (server name, tool name)"""
         # Check if tool is server-prefixed
         if ":" in tool_name:
             server_name, actual_tool_name = tool_name.split(":", 1)
-            if server_name not in self.connected_servers:
-                raise ValueError(f"Server {server_name} not connected")
-            return await self.connected_servers[server_name].call_tool(actual_tool_name, arguments)
-        
-        # If no prefix, try all servers
-        for server in self.connected_servers.values():
-            try:
-                return await server.call_tool(tool_name, arguments)
-            except Exception:
-                continue
-        
+            return server_name, actual_tool_name
+
+        catalog = await self.get_catalog()
+        server_name = catalog.routes.get(tool_name)
+        if server_name is not None:
+            return server_name, tool_name
+        if tool_name in catalog.ambiguous:
+            servers = ", ".join(catalog.ambiguous[tool_name])
+            raise ValueError(f"Tool {tool_name} is offered by several servers ({servers}); use a server prefix")
         raise ValueError(f"Tool {tool_name} not found in any connected server")
-        
+
+    async def call_tool(self,
+                        tool_name: str,
+                        arguments: Dict[str, Any],
+                        timeout: Optional[float] = None,
+                        progress: Optional[ProgressCallback] = None,
+                        raw: bool = False) -> List[Union[ToolContent, Dict[str, Any]]]:
+        """Call a tool, potentially across servers
+
+        ``timeout`` overrides the server's call deadline. ``progress`` receives
+        the server's progress notifications for the call; callers sharing a
+        coalesced call only get progress if they started it. With ``raw``,
+        content received in passthrough mode is returned as the plain JSON
+        objects the server sent, for callers that only forward it. The content
+        is a ``ResultContent``, flagged with ``isError`` when the server
+        reported the call as failed.
+        """
+        content = await self._call_content(tool_name, arguments, timeout, progress)
+        return content if raw else content_models(content)
+
+    async def _call_content(self,
+                            tool_name: str,
+                            arguments: Dict[str, Any],
+                            timeout: Optional[float],
+                            progress: Optional[ProgressCallback]) -> List[Any]:
+        server_name, actual_tool_name = await self.resolve_tool(tool_name)
+        hedge_policy = getattr(self._get(server_name), "hedge", "off")
+        tool = None
+        if (self.coalesce_calls == "safe" or hedge_policy == "safe"
+                or (self.result_cache is not None and self.result_cache.annotated_ttl)):
+            tool = await self._find_tool(server_name, actual_tool_name)
+        cache = self.result_cache
+        ttl = cache.ttl_for(server_name, actual_tool_name, tool) if cache is not None else None
+        repeatable = ttl is not None or is_side_effect_free(tool)
+        coalesce = self.coalesce_calls == "all" or (self.coalesce_calls == "safe" and repeatable)
+        hedge = hedge_policy == "all" or (hedge_policy == "safe" and repeatable)
+        if ttl is None and not coalesce:
+            result = await self._get(server_name).call_tool(actual_tool_name, arguments, timeout, hedge, progress)
+            return ResultContent(result.content, result.isError)
+
+        key = cache_key(server_name, actual_tool_name, arguments)
+        if ttl is not None:
+            content = cache.get(key)
+            if content is not None:
+                return content
+        if not coalesce:
+            return await self._call_and_cache(server_name, actual_tool_name, arguments, key, ttl, timeout, hedge,
+                                              progress)
+
+        call = self._calls_in_flight.get(key)
+        if call is None or call.done():
+            call = asyncio.ensure_future(
+                self._call_and_cache(server_name, actual_tool_name, arguments, key, ttl, timeout, hedge, progress))
+            self._calls_in_flight[key] = call
+            call.add_done_callback(lambda done: self._call_finished(key, done))
+        else:
+            self.collapsed_calls += 1
+        # Shielded so that one caller giving up does not cancel the call for the others
+        content = await asyncio.shield(call)
+        return ResultContent(content, content.isError)
+
+    async def _call_and_cache(self, server_name: str, tool_name: str, arguments: Dict[str, Any],
+                              key: CacheKey, ttl: Optional[float], timeout: Optional[float],
+                              hedge: bool = False,
+                              progress: Optional[ProgressCallback] = None) -> ResultContent:
+        result = await self._get(server_name).call_tool(tool_name, arguments, timeout, hedge, progress)
+        if ttl is not None and not result.isError:
+            self.result_cache.put(key, result.content, ttl)
+        return ResultContent(result.content, result.isError)
+
+    def _call_finished(self, key: CacheKey, call: asyncio.Future):
+        if self._calls_in_flight.get(key) is call:
+            del self._calls_in_flight[key]
+        if not call.cancelled():
+            # Mark the error as retrieved in case every caller was cancelled
+            call.exception()
+
+    def knows_tool(self, tool_name: str) -> bool:
+        """Whether a possibly unprefixed tool name is in a listing the pool has, without listing anything"""
+        if ":" in tool_name:
+            server_name, actual_tool_name = tool_name.split(":", 1)
+            entry = self._server_tools.get(server_name)
+            return entry is not None and any(tool.name == actual_tool_name for tool in entry[1])
+        return self._catalog is not None and tool_name in self._catalog.routes
+
+    async def _find_tool(self, server_name: str, tool_name: str) -> Optional[types.Tool]:
+        """The tool's listing, for its annotations; None if it is not known
+
+        Only a listing the pool already has is used, stale or not: a call never
+        waits on tools/list, which a server serving one request at a time, or
+        one that lists slowly or not at all, would put in front of the call.
+        Until the server's tools are listed (by get_catalog or list_tools),
+        they count as not known to be side-effect free.
+        """
+        entry = self._server_tools.get(server_name)
+        if entry is None:
+            return None
+        return next((tool for tool in entry[1] if tool.name == tool_name), None)
+
+    def collect_metrics(self) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Gauges of the pool for a metrics snapshot"""
+        gauges = [("mcp_downstream_servers", {}, len(self.connected_servers)),
+                  ("mcp_collapsed_calls", {}, self.collapsed_calls)]
+        for name, connection in self.connected_servers.items():
+            gauges.append(("mcp_downstream_in_flight", {"server": name}, connection.in_flight))
+            gauges.append(("mcp_downstream_up", {"server": name}, int(connection.alive)))
+        if self.result_cache is not None:
+            stats = self.result_cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            gauges.extend((f"mcp_cache_{key}", {}, value) for key, value in stats.items())
+            gauges.append(("mcp_cache_hit_ratio", {}, stats["hits"] / lookups if lookups else 0.0))
+        gauges.extend((f"mcp_{key}", {}, value) for key, value in self.warm_stats().items())
+        return gauges
+
+    def server_health(self) -> Dict[str, Dict[str, Any]]:
+        """Health summary of every connected server, with why its tools could not be listed if they could not"""
+        return {name: dict(connection.summary(), list_error=self.list_errors.get(name))
+                for name, connection in self.connected_servers.items()}
+
     async def close(self):
         """Close all server connections"""
-        for server in self.connected_servers.values():
-            await server.close()
-        self.connected_servers.clear()
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        for task in self._warm_fills.values():
+            task.cancel()
+        await asyncio.gather(*self._warm_fills.values(), return_exceptions=True)
+        self._warm_fills.clear()
+        await asyncio.gather(*(connection.close() for idle in self._warm.values() for connection in idle))
+        self._warm.clear()
+        async with self._lock:
+            await asyncio.gather(*(connection.close() for connection in self.connected_servers.values()))
+            self.connected_servers.clear()
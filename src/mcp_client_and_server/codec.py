@@ -0,0 +1,134 @@
+"""JSON decoding of stdio messages, and passthrough of downstream tool results.
+
+mcp validates every line it reads against the union of JSON-RPC message
+types, and every tool result against the content models, which costs more
+CPU than parsing the JSON itself. ``decode_message`` parses a line once
+(with orjson when installed, ``pip install 'mcp-client-and-server[fast]'``)
+and builds the message envelope without validating it again; the session
+validates requests and results by their own types afterwards anyway.
+
+``stdio_server`` serves the gateway's own client with the same decoding.
+
+``PassthroughResult`` is the result type the gateway asks downstream sessions
+for: its content items are kept as plain JSON objects instead of being
+validated into content models, which costs ten times as much for results of
+many items. Results the gateway only forwards are sent upstream as they
+are; ``content_models`` validates them for callers that need the models.
+Encoding is left to pydantic, whose serializer is already native code.
+
+``ResultContent`` is the content list the client hands back for a tool
+call; it keeps the result's ``isError`` flag, so the gateway can forward it.
+"""
+
+import json
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import anyio
+import anyio.lowlevel
+import mcp.types as types
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Content of tool results, as validated by mcp
+_content_list = TypeAdapter(List[Union[types.TextContent, types.ImageContent, types.EmbeddedResource]])
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def decode_message(line: Union[str, bytes]) -> types.JSONRPCMessage:
+    """Parse one line of the stdio framing into a JSON-RPC message"""
+    data = loads(line)
+    if isinstance(data, dict) and data.get("jsonrpc") == "2.0" and "error" not in data:
+        if isinstance(data.get("method"), str) and isinstance(data.get("params", {}), dict):
+            kind = types.JSONRPCRequest if "id" in data else types.JSONRPCNotification
+            return types.JSONRPCMessage.model_construct(root=kind.model_construct(**data))
+        if "method" not in data and "id" in data and isinstance(data.get("result"), dict):
+            return types.JSONRPCMessage.model_construct(root=types.JSONRPCResponse.model_construct(**data))
+    # Errors and anything malformed get the full validation (and its error messages)
+    return types.JSONRPCMessage.model_validate(data)
+
+
+class PassthroughResult(types.Result):
+    """A tools/call result whose content items stay the JSON objects the server sent"""
+
+    content: List[Dict[str, Any]]
+    isError: bool = False
+
+
+class ResultContent(list):
+    """The content items of a tool result, with the result's isError flag and _meta"""
+
+    def __init__(self, items: Iterable[Any] = (), isError: bool = False, meta: Optional[Dict[str, Any]] = None):
+        super().__init__(items)
+        self.isError = isError
+        self.meta = meta
+
+
+def is_error(content: List[Any]) -> bool:
+    """Whether tool result content came from a result flagged as an error"""
+    return getattr(content, "isError", False)
+
+
+def result_meta(content: List[Any]) -> Dict[str, Any]:
+    """The ``_meta`` field of the result tool result content came from, as keyword arguments for the result"""
+    meta = getattr(content, "meta", None)
+    return {"_meta": meta} if meta else {}
+
+
+def content_models(content: List[Any]) -> List[Any]:
+    """Tool result content as mcp models; items that already are models are kept as they are"""
+    if not any(isinstance(item, dict) for item in content):
+        return content
+    return ResultContent(_content_list.validate_python(content), is_error(content), getattr(content, "meta", None))
+
+
+def request_params(tool_name: str, arguments: Dict[str, Any], meta: Dict[str, Any]) -> types.CallToolRequestParams:
+    """Parameters of a tools/call request, with ``_meta`` when there is any"""
+    params = {"name": tool_name, "arguments": arguments}
+    if meta:
+        params["_meta"] = meta
+    return types.CallToolRequestParams.model_validate(params)
+
+
+@asynccontextmanager
+async def stdio_server():
+    """Mirrors mcp.server.stdio.stdio_server, but decodes messages with ``decode_message``"""
+    stdin = anyio.wrap_file(sys.stdin)
+    stdout = anyio.wrap_file(sys.stdout)
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def stdin_reader():
+        try:
+            async with read_stream_writer:
+                async for line in stdin:
+                    try:
+                        message = decode_message(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(message)
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def stdout_writer():
+        try:
+            async with write_stream_reader:
+                async for message in write_stream_reader:
+                    await stdout.write(message.model_dump_json(by_alias=True, exclude_none=True) + "\n")
+                    await stdout.flush()
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(stdin_reader)
+        tg.start_soon(stdout_writer)
+        yield read_stream, write_stream
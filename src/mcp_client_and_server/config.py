@@ -0,0 +1,170 @@
+"""Declarative gateway config: the downstream servers to connect at startup.
+
+The config is a JSON file::
+
+    {
+      "max_parallel_connects": 4,
+      "servers": {
+        "web": {"command": "uvx mcp-server-fetch"},
+        "db": {"command": ["python", "db_server.py"], "cwd": "/srv/db", "env": {"DB_URL": "..."},
+               "replicas": 2, "balance": "p2c", "hedge": "safe",
+               "limits": {"max_in_flight": 8, "max_queued": 32, "timeout": 30}}
+      }
+    }
+
+``command`` is a list or a shell-style string; an ``args`` list, as in other
+MCP host configs, is appended to it. ``apply_config`` connects the servers
+concurrently, at most ``max_parallel_connects`` at a time. Given the config
+applied before, it only disconnects the servers that were dropped and
+(re)connects the ones that were added or changed, leaving the rest running.
+"""
+
+import asyncio
+import json
+import logging
+import shlex
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Connections started at once when the config does not say
+DEFAULT_PARALLEL_CONNECTS = 4
+
+_SERVER_KEYS = {"command", "args", "cwd", "env", "replicas", "balance", "hedge", "limits"}
+_LIMIT_KEYS = {"max_in_flight", "max_queued", "timeout"}
+
+
+class ConfigError(ValueError):
+    """The gateway config is malformed"""
+
+
+@dataclass(frozen=True)
+class ServerSpec:
+    name: str
+    command: tuple
+    cwd: Optional[str] = None
+    env: Optional[tuple] = None
+    replicas: int = 1
+    balance: str = "least-outstanding"
+    hedge: str = "off"
+    limits: Optional[tuple] = None
+
+    def connect_options(self) -> Dict[str, Any]:
+        """Keyword arguments for MCPChainedClient.connect_server, limits still as a dict"""
+        return {
+            "name": self.name,
+            "command": list(self.command),
+            "cwd": self.cwd,
+            "env": dict(self.env) if self.env is not None else None,
+            "replicas": self.replicas,
+            "balance": self.balance,
+            "hedge": self.hedge,
+            "limits": dict(self.limits) if self.limits is not None else None,
+        }
+
+
+@dataclass
+class GatewayConfig:
+    servers: Dict[str, ServerSpec] = field(default_factory=dict)
+    max_parallel_connects: int = DEFAULT_PARALLEL_CONNECTS
+
+
+def _server_spec(name: str, spec: Any) -> ServerSpec:
+    if not isinstance(spec, dict):
+        raise ConfigError(f"Server {name!r} must be an object")
+    unknown = spec.keys() - _SERVER_KEYS
+    if unknown:
+        raise ConfigError(f"Server {name!r} has unknown keys: {', '.join(sorted(unknown))}")
+    command = spec.get("command")
+    if isinstance(command, str):
+        command = shlex.split(command)
+    if not isinstance(command, list) or not command:
+        raise ConfigError(f"Server {name!r} needs a command")
+    command = command + list(spec.get("args", []))
+    env = spec.get("env")
+    if env is not None and not isinstance(env, dict):
+        raise ConfigError(f"The env of server {name!r} must be an object")
+    limits = spec.get("limits")
+    if limits is not None:
+        if not isinstance(limits, dict) or limits.keys() - _LIMIT_KEYS:
+            raise ConfigError(f"The limits of server {name!r} may only set {', '.join(sorted(_LIMIT_KEYS))}")
+        limits = tuple(sorted(limits.items()))
+    return ServerSpec(
+        name=name,
+        command=tuple(str(part) for part in command),
+        cwd=spec.get("cwd"),
+        env=tuple(sorted((str(key), str(value)) for key, value in env.items())) if env is not None else None,
+        replicas=int(spec.get("replicas", 1)),
+        balance=spec.get("balance", "least-outstanding"),
+        hedge=spec.get("hedge", "off"),
+        limits=limits,
+    )
+
+
+def parse_config(data: Any) -> GatewayConfig:
+    if not isinstance(data, dict):
+        raise ConfigError("The config must be an object")
+    servers = data.get("servers", {})
+    if not isinstance(servers, dict):
+        raise ConfigError("servers must be an object mapping names to servers")
+    parallel = int(data.get("max_parallel_connects", DEFAULT_PARALLEL_CONNECTS))
+    if parallel < 1:
+        raise ConfigError("max_parallel_connects must be at least 1")
+    return GatewayConfig({name: _server_spec(name, spec) for name, spec in servers.items()}, parallel)
+
+
+def load_config(path: str) -> GatewayConfig:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except ValueError as e:
+        raise ConfigError(f"{path} is not valid JSON: {e}") from e
+    return parse_config(data)
+
+
+def diff_configs(old: Optional[GatewayConfig], new: GatewayConfig) -> Dict[str, List[str]]:
+    """Names of the servers to connect, disconnect and leave alone to go from ``old`` to ``new``"""
+    old_servers = old.servers if old is not None else {}
+    return {
+        "connect": [name for name, spec in new.servers.items() if old_servers.get(name) != spec],
+        "disconnect": [name for name in old_servers if name not in new.servers],
+        "unchanged": [name for name, spec in new.servers.items() if old_servers.get(name) == spec],
+    }
+
+
+async def apply_config(chained_client, config: GatewayConfig,
+                       previous: Optional[GatewayConfig] = None) -> Dict[str, List[str]]:
+    """Bring the client's servers in line with ``config``; returns the diff, with "failed" servers.
+
+    A server that fails to connect is logged and reported; the others are connected regardless.
+    """
+    from .client import CallLimits
+
+    changes = diff_configs(previous, config)
+    # Servers that failed to connect before, or went away since, are tried again
+    missing = [name for name in changes["unchanged"] if name not in chained_client.connected_servers]
+    changes["connect"] += missing
+    changes["unchanged"] = [name for name in changes["unchanged"] if name not in missing]
+    for name in changes["disconnect"]:
+        await chained_client.disconnect_server(name)
+
+    slots = asyncio.Semaphore(config.max_parallel_connects)
+    defaults = chained_client.call_limits
+
+    async def connect(name: str):
+        options = config.servers[name].connect_options()
+        if options["limits"] is not None:
+            options["limits"] = CallLimits(**{key: options["limits"].get(key, getattr(defaults, key))
+                                              for key in _LIMIT_KEYS})
+        async with slots:
+            await chained_client.connect_server(**options)
+
+    results = await asyncio.gather(*(connect(name) for name in changes["connect"]), return_exceptions=True)
+    changes["failed"] = []
+    for name, result in zip(changes["connect"], results):
+        if isinstance(result, BaseException):
+            logger.error(f"Could not connect configured server '{name}': {result}")
+            changes["failed"].append(name)
+    changes["connect"] = [name for name in changes["connect"] if name not in changes["failed"]]
+    return changes
@@ -0,0 +1,112 @@
+"""Health tracking and circuit breaking for downstream servers."""
+
+import time
+from collections import deque
+from typing import Dict, Optional
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Calls to a server are refused while its circuit breaker is open"""
+
+
+def _percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ServerHealth:
+    """Recent latency and errors of one downstream server, and its circuit breaker.
+
+    Pings and calls both count. After ``failure_threshold`` consecutive
+    failures the circuit opens and calls fail fast. ``reset_timeout`` seconds
+    later it is half-open: calls are let through again and the next result
+    either closes it or opens it for another ``reset_timeout``.
+
+    A crashed process is restarted after ``restart_delay`` seconds, doubling
+    up to ``max_restart_delay`` while restarts keep failing, and back to the
+    start once the server answers again.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 3,
+                 reset_timeout: float = 10.0,
+                 window: int = 100,
+                 min_restart_delay: float = 0.5,
+                 max_restart_delay: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.min_restart_delay = min_restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.restarts = 0
+        self.restart_delay = 0.0
+        self.next_restart_at: Optional[float] = None
+        self._state = CIRCUIT_CLOSED
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = CIRCUIT_HALF_OPEN
+        return self._state
+
+    def check(self, server_name: str) -> None:
+        """Raise CircuitOpenError if calls to the server should fail fast"""
+        if self.state == CIRCUIT_OPEN:
+            raise CircuitOpenError(f"Server {server_name} is unhealthy ({self.last_error}); not calling it")
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.restart_delay = 0.0
+        if self.state == CIRCUIT_HALF_OPEN:
+            self._state = CIRCUIT_CLOSED
+
+    def record_failure(self, error: str) -> None:
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self.last_error = error
+        state = self.state
+        if state == CIRCUIT_HALF_OPEN or (state == CIRCUIT_CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+    def restart_due(self) -> bool:
+        """Whether a dead server should be restarted now; schedules the first attempt"""
+        now = time.monotonic()
+        if self.next_restart_at is None:
+            self.restart_delay = min(max(2 * self.restart_delay, self.min_restart_delay), self.max_restart_delay)
+            self.next_restart_at = now + self.restart_delay
+        return now >= self.next_restart_at
+
+    def restarted(self) -> None:
+        self.restarts += 1
+        self.next_restart_at = None
+
+    def restart_failed(self, error: str) -> None:
+        self.last_error = error
+        self.next_restart_at = None
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "circuit": self.state,
+            "p50_ms": None if not self.latencies else round(1000 * _percentile(self.latencies, 0.5), 1),
+            "p95_ms": None if not self.latencies else round(1000 * _percentile(self.latencies, 0.95), 1),
+            "error_rate": round(self.error_rate, 3),
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,438 @@
+"""Incrementally maintained indexes over notes.
+
+The indexes hold note numbers from a ``NameTable`` rather than name strings,
+so a million notes cost a few typed arrays instead of a million string
+objects per index.
+"""
+
+import heapq
+import math
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+# Hash table slots of a name table that hold no name
+_EMPTY = -1
+_DELETED = -2
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def encode_name(name: str) -> bytes:
+    return name.encode("utf-8", "surrogatepass")
+
+
+class NameTable:
+    """Note names numbered in the order they were added, kept in one flat byte arena.
+
+    Names are appended as UTF-8 to the arena, with their offsets and lengths
+    in typed arrays, and found through an open-addressing hash table of
+    numbers. UTF-8 preserves code point order, so names compare as bytes in
+    the arena the way they do as strings.
+
+    A name keeps its number until it is removed. Once removed names outnumber
+    the live ones, the live names are renumbered from 0 in the same order and
+    every callback given to ``listen`` is called with the mapping from old
+    numbers to new ones (-1 for removed names).
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._listeners: List[Callable[[array], None]] = []
+        self.clear()
+        for name in names:
+            self.add(name)
+
+    def clear(self) -> None:
+        self._arena = bytearray()
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        # number -> 1 while it holds a name
+        self._live = bytearray()
+        # slot -> number, _EMPTY or _DELETED; the size is a power of two
+        self._table = array("q", [_EMPTY]) * 8
+        self._used_slots = 0
+        self._count = 0
+        self._dead = 0
+        # Arena bytes of removed names
+        self._garbage = 0
+
+    def listen(self, callback: Callable[[array], None]) -> None:
+        """Have ``callback`` called with the old-to-new mapping whenever names are renumbered"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: object) -> bool:
+        return self.number(name) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for number in self.numbers():
+            yield self.name(number)
+
+    def numbers(self) -> Iterator[int]:
+        """Numbers of the names held, in the order the names were added"""
+        live = self._live
+        return (number for number in range(len(live)) if live[number])
+
+    def _find(self, key: bytes) -> Tuple[int, int]:
+        """The slot holding ``key`` and its number, or the slot to insert it at and -1"""
+        table = self._table
+        mask = len(table) - 1
+        slot = hash(key) & mask
+        free = -1
+        while True:
+            number = table[slot]
+            if number == _EMPTY:
+                return (free if free >= 0 else slot), -1
+            if number == _DELETED:
+                if free < 0:
+                    free = slot
+            elif self._lengths[number] == len(key):
+                offset = self._offsets[number]
+                if self._arena[offset:offset + len(key)] == key:
+                    return slot, number
+            slot = (slot + 1) & mask
+
+    def number(self, name: object) -> int:
+        """The number of ``name``, or -1 if it is not held"""
+        if not isinstance(name, str):
+            return -1
+        return self._find(encode_name(name))[1]
+
+    def key(self, number: int) -> bytes:
+        """The UTF-8 name of a held number, which orders like the name itself"""
+        offset = self._offsets[number]
+        return bytes(self._arena[offset:offset + self._lengths[number]])
+
+    def name(self, number: int) -> str:
+        offset = self._offsets[number]
+        return self._arena[offset:offset + self._lengths[number]].decode("utf-8", "surrogatepass")
+
+    def add(self, name: str) -> Tuple[int, bool]:
+        """The number of ``name``, and whether the name was added by this call"""
+        key = encode_name(name)
+        slot, number = self._find(key)
+        if number >= 0:
+            return number, False
+        number = len(self._live)
+        self._offsets.append(len(self._arena))
+        self._lengths.append(len(key))
+        self._live.append(1)
+        self._arena += key
+        if self._table[slot] == _EMPTY:
+            self._used_slots += 1
+        self._table[slot] = number
+        self._count += 1
+        if 3 * self._used_slots >= 2 * len(self._table):
+            self._repack(2 * len(self._table))
+        return number, True
+
+    def remove(self, name: object) -> int:
+        """Drop ``name``; returns the number it had, or -1 if it was not held"""
+        if not isinstance(name, str):
+            return -1
+        slot, number = self._find(encode_name(name))
+        if number < 0:
+            return -1
+        self._table[slot] = _DELETED
+        self._live[number] = 0
+        self._garbage += self._lengths[number]
+        self._count -= 1
+        self._dead += 1
+        if self._dead > max(1024, self._count):
+            self._renumber()
+        elif self._garbage > max(1 << 16, len(self._arena) - self._garbage):
+            self._repack(len(self._table))
+        return number
+
+    def _repack(self, capacity: int):
+        """Copy the held names into a fresh arena and a hash table of ``capacity`` slots, keeping their numbers"""
+        while 3 * self._count >= 2 * capacity:
+            capacity *= 2
+        arena, offsets, lengths = self._arena, self._offsets, self._lengths
+        packed = bytearray()
+        table = array("q", [_EMPTY]) * capacity
+        mask = capacity - 1
+        for number in self.numbers():
+            offset = offsets[number]
+            key = bytes(arena[offset:offset + lengths[number]])
+            slot = hash(key) & mask
+            while table[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = number
+            offsets[number] = len(packed)
+            packed += key
+        self._arena = packed
+        self._table = table
+        self._used_slots = self._count
+        self._garbage = 0
+
+    def _renumber(self):
+        """Number the held names from 0 in their current order, and tell the listeners"""
+        mapping = array("q", [-1]) * len(self._live)
+        offsets, lengths = array("Q"), array("I")
+        for new, old in enumerate(self.numbers()):
+            mapping[old] = new
+            offsets.append(self._offsets[old])
+            lengths.append(self._lengths[old])
+        self._offsets, self._lengths = offsets, lengths
+        self._live = bytearray(b"\x01") * self._count
+        self._dead = 0
+        self._repack(len(self._table))
+        for callback in self._listeners:
+            callback(mapping)
+
+    def memory_bytes(self) -> int:
+        return sum(sys.getsizeof(values) for values in (
+            self._arena, self._offsets, self._lengths, self._live, self._table))
+
+
+class SortedNames:
+    """Note numbers in name order, for prefix lookups and ordered paging.
+
+    Numbers are kept in blocks of at most ``block_size`` sorted entries, so an
+    insert or removal shifts one block instead of the whole list. Names are
+    compared in the ``NameTable`` arena, so a number must be discarded before
+    its name is removed from the table.
+    """
+
+    def __init__(self, names: NameTable, numbers: Iterable[int] = (), block_size: int = 1000):
+        self.names = names
+        self.block_size = block_size
+        ordered = sorted(set(numbers), key=names.key)
+        self._blocks: List[array] = [array("I", ordered[i:i + block_size])
+                                     for i in range(0, len(ordered), block_size)]
+        # The last number of each block
+        self._maxes: List[int] = [block[-1] for block in self._blocks]
+        self._count = len(ordered)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _position(self, number: int) -> Tuple[int, int]:
+        """The block and position holding ``number``, or (-1, -1)"""
+        key = self.names.key(number)
+        index = bisect_left(self._maxes, key, key=self.names.key)
+        if index < len(self._blocks):
+            block = self._blocks[index]
+            position = bisect_left(block, key, key=self.names.key)
+            if position < len(block) and block[position] == number:
+                return index, position
+        return -1, -1
+
+    def __contains__(self, number: int) -> bool:
+        return self._position(number)[0] >= 0
+
+    def add(self, number: int) -> None:
+        if not self._blocks:
+            self._blocks.append(array("I", [number]))
+            self._maxes.append(number)
+            self._count = 1
+            return
+        if self._position(number)[0] >= 0:
+            return
+        key = self.names.key
+        index = min(bisect_left(self._maxes, key(number), key=key), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, number, key=key)
+        self._maxes[index] = block[-1]
+        self._count += 1
+        if len(block) > 2 * self.block_size:
+            self._blocks[index:index + 1] = [block[:self.block_size], block[self.block_size:]]
+            self._maxes[index:index + 1] = [block[self.block_size - 1], block[-1]]
+
+    def discard(self, number: int) -> None:
+        index, position = self._position(number)
+        if index < 0:
+            return
+        block = self._blocks[index]
+        del block[position]
+        self._count -= 1
+        if block:
+            self._maxes[index] = block[-1]
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+
+    def _numbers_from(self, start: bytes, inclusive: bool) -> Iterator[int]:
+        key = self.names.key
+        index = bisect_left(self._maxes, start, key=key)
+        for block_index in range(index, len(self._blocks)):
+            block = self._blocks[block_index]
+            if block_index == index:
+                first = bisect_left(block, start, key=key) if inclusive else bisect_right(block, start, key=key)
+                yield from block[first:]
+            else:
+                yield from block
+
+    def iter_from(self, start: str = "", inclusive: bool = True) -> Iterator[str]:
+        """Yield names in order, starting at ``start``"""
+        for number in self._numbers_from(encode_name(start), inclusive):
+            yield self.names.name(number)
+
+    def renumber(self, mapping: array) -> None:
+        """Follow a renumbering of the name table; see NameTable"""
+        self._blocks = [array("I", (mapping[number] for number in block)) for block in self._blocks]
+        self._maxes = [mapping[number] for number in self._maxes]
+
+    def memory_bytes(self) -> int:
+        """Heap bytes of the blocks; the names themselves are in the name table"""
+        return (sys.getsizeof(self._blocks) + sys.getsizeof(self._maxes)
+                + sum(sys.getsizeof(block) for block in self._blocks))
+
+    def with_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        start = encode_name(prefix)
+        matches = []
+        for number in self._numbers_from(start, inclusive=True):
+            if limit is not None and len(matches) >= limit:
+                break
+            key = self.names.key(number)
+            if not key.startswith(start):
+                break
+            matches.append(key.decode("utf-8", "surrogatepass"))
+        return matches
+
+
+class NoteSearchIndex:
+    """Inverted index over note contents.
+
+    Queries are ranked with BM25 and only touch the postings of the query
+    terms, never the full set of notes. The postings of a term are one typed
+    array of ``number << 32 | frequency`` entries, sorted by the note number
+    from a ``NameTable``. The terms of each note are not kept, so a note is
+    removed by passing the content it was indexed with.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, names: NameTable):
+        self.names = names
+        # term -> note number << 32 | term frequency, in ascending order
+        self._postings: Dict[str, array] = {}
+        # note number -> 1 while it is indexed
+        self._indexed = bytearray()
+        # note number -> number of terms
+        self._lengths = array("I")
+        self._count = 0
+        self._total_length = 0
+
+    @classmethod
+    def build(cls, names: NameTable, notes: Iterable[Tuple[int, str]]) -> "NoteSearchIndex":
+        index = cls(names)
+        for number, content in notes:
+            index.add(number, content)
+        return index
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, number: int) -> bool:
+        return number < len(self._indexed) and self._indexed[number] == 1
+
+    @staticmethod
+    def _frequencies(content: str) -> Tuple[Dict[str, int], int]:
+        terms = tokenize(content)
+        return Counter(terms), len(terms)
+
+    def add(self, number: int, content: str) -> None:
+        """Index a note that is not indexed yet; remove it first to re-index it"""
+        if number in self:
+            raise ValueError(f"Note {number} is already indexed")
+        frequencies, length = self._frequencies(content)
+        for term, frequency in frequencies.items():
+            entry = number << 32 | frequency
+            postings = self._postings.get(term)
+            if postings is None:
+                self._postings[term] = array("Q", (entry,))
+            elif postings[-1] < entry:
+                # Notes are mostly indexed in number order
+                postings.append(entry)
+            else:
+                insort(postings, entry)
+        if number >= len(self._indexed):
+            grow = max(number + 1, 2 * len(self._indexed)) - len(self._indexed)
+            self._indexed.extend(bytes(grow))
+            self._lengths.extend(array("I", bytes(4 * grow)))
+        self._indexed[number] = 1
+        self._lengths[number] = length
+        self._count += 1
+        self._total_length += length
+
+    def remove(self, number: int, content: str) -> None:
+        """Unindex a note, given the content it was indexed with"""
+        if number not in self:
+            return
+        frequencies, length = self._frequencies(content)
+        for term in frequencies:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            position = bisect_left(postings, number << 32)
+            if position < len(postings) and postings[position] >> 32 == number:
+                del postings[position]
+                if not postings:
+                    del self._postings[term]
+        self._indexed[number] = 0
+        self._count -= 1
+        self._total_length -= self._lengths[number]
+
+    def renumber(self, mapping: array) -> None:
+        """Follow a renumbering of the name table; see NameTable
+
+        Renumbering keeps the order of the notes, so postings stay sorted.
+        """
+        for postings in self._postings.values():
+            postings[:] = array("Q", (mapping[entry >> 32] << 32 | entry & 0xFFFFFFFF for entry in postings))
+        indexed, lengths = self._indexed, self._lengths
+        size = max((mapping[number] for number in range(len(indexed)) if indexed[number]), default=-1) + 1
+        self._indexed = bytearray(size)
+        self._lengths = array("I", bytes(4 * size))
+        for number in range(len(indexed)):
+            if indexed[number]:
+                self._indexed[mapping[number]] = 1
+                self._lengths[mapping[number]] = lengths[number]
+
+    def memory_bytes(self) -> int:
+        """Heap bytes of the postings and per-note arrays, counting each term string once"""
+        total = sys.getsizeof(self._postings) + sys.getsizeof(self._indexed) + sys.getsizeof(self._lengths)
+        for term, postings in self._postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(postings)
+        return total
+
+    def search(self, query: str = "", prefix: str = "", limit: int = 10) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (name, score) pairs, best first.
+
+        Only notes whose names start with ``prefix`` are considered.
+        """
+        terms = set(tokenize(query))
+        start = encode_name(prefix)
+        key = self.names.key
+
+        count = self._count
+        average_length = self._total_length / count if count else 0.0
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for entry in postings:
+                number, frequency = entry >> 32, entry & 0xFFFFFFFF
+                if start and not key(number).startswith(start):
+                    continue
+                length = self._lengths[number]
+                norm = 1 - self.b + self.b * length / average_length if average_length else 1.0
+                score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                scores[number] = scores.get(number, 0.0) + score
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], key(item[0])))
+        return [(self.names.name(number), score) for number, score in best]
@@ -0,0 +1,271 @@
+"""Metrics and tracing for the server and its downstream calls.
+
+``metrics`` holds counters, gauges and latency histograms keyed by name and
+labels. Values that already live elsewhere (calls in flight per server, cache
+counters) are read by collectors when a snapshot is taken rather than kept
+twice. Snapshots are served by the ``get-metrics`` tool and can be exported
+in the Prometheus text format to a file or a local port.
+
+``tracer`` records spans when enabled: each upstream request is a span, and
+every downstream call made while serving it is a child span whose trace
+context is also passed to the downstream server as ``_meta.traceparent``
+(W3C trace context format).
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import secrets
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# Returns (name, labels, value) gauges at snapshot time
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Histogram:
+    """Counts of observations per latency bucket, plus their count and sum"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the quantile; the largest bucket bound if it overflows"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(1000 * self.sum / self.count, 3) if self.count else None,
+            "p50_ms": None if not self.count else 1000 * self.quantile(0.5),
+            "p95_ms": None if not self.count else 1000 * self.quantile(0.95),
+        }
+
+
+class Metrics:
+    """Counters, gauges and histograms of one process"""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Collector] = []
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, _labels(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def _collected(self) -> Dict[Tuple[str, Labels], float]:
+        gauges = dict(self.gauges)
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[(name, _labels(labels))] = value
+            except Exception as e:
+                logger.debug(f"Metrics collector failed: {e}")
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric as plain JSON-friendly values, histograms summarized"""
+        def entries(values, render):
+            return [dict(labels, name=name, **render(value)) for (name, labels), value in sorted(values.items())]
+
+        return {
+            "counters": entries(self.counters, lambda value: {"value": value}),
+            "gauges": entries(self._collected(), lambda value: {"value": value}),
+            "histograms": entries(self.histograms, Histogram.summary),
+        }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(self._collected().items()):
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "duration_ms": None if self.end is None else round(1000 * (self.end - self.start), 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Keeps the last ``keep`` finished spans when enabled; does nothing otherwise"""
+
+    def __init__(self, enabled: bool = False, keep: int = 1000):
+        self.enabled = enabled
+        self.finished: deque = deque(maxlen=keep)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        span = Span(name,
+                    trace_id=parent.trace_id if parent else secrets.token_hex(16),
+                    span_id=secrets.token_hex(8),
+                    parent_id=parent.span_id if parent else None,
+                    start=time.time(),
+                    attributes=attributes)
+        reset = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(reset)
+            span.end = time.time()
+            self.finished.append(span)
+
+    def traceparent(self) -> Optional[str]:
+        """The current span as a W3C traceparent header value"""
+        span = _current_span.get() if self.enabled else None
+        if span is None:
+            return None
+        return f"00-{span.trace_id}-{span.span_id}-01"
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in list(self.finished)[-limit:]]
+
+
+metrics = Metrics()
+tracer = Tracer(enabled=os.environ.get("MCP_GATEWAY_TRACING", "0") not in ("", "0"))
+
+
+async def export_metrics(path: Optional[str] = None, port: Optional[int] = None, interval: float = 10.0,
+                         host: str = "127.0.0.1"):
+    """Write the Prometheus text dump to ``path`` every ``interval`` seconds and/or serve it on ``port``"""
+    server = None
+    if port is not None:
+        async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+                body = metrics.prometheus_text().encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+                await writer.drain()
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(serve, host, port)
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    try:
+        while True:
+            if path:
+                temporary = f"{path}.tmp"
+                with open(temporary, "w") as f:
+                    f.write(metrics.prometheus_text())
+                os.replace(temporary, path)
+            await asyncio.sleep(interval)
+    finally:
+        if server is not None:
+            server.close()
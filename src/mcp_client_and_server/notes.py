@@ -0,0 +1,252 @@
+"""Notes and the indexes kept over them.
+
+``NoteService`` is the only way the server reads or writes notes, so the same
+object can run in-process or be shared between worker processes behind a
+``multiprocessing`` manager proxy. Every method takes and returns plain,
+picklable values.
+"""
+
+import base64
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .index import NameTable, NoteSearchIndex, SortedNames
+from .store import NoteStore
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _existed(store: NoteStore, names: List[str], deleting: bool) -> List[bool]:
+    """Whether each name exists when its turn in a batch comes, counting earlier items of the batch"""
+    present = {}
+    existed = []
+    for name in names:
+        existed.append(present[name] if name in present else name in store)
+        present[name] = not deleting
+    return existed
+
+
+class NoteService:
+    """A note store plus its search and name indexes.
+
+    The indexes are built from the store on first use and then kept up to
+    date by writes. They hold note numbers from the store's name table, or
+    from one the service keeps in step with the store if it has none. Calls
+    are serialized by a lock, since a manager process serves each worker from
+    its own thread.
+
+    With ``durable_writes``, writes return only once the store has made them
+    durable, waiting outside the lock so that writes from other threads join
+    the same group commit. Callers on an event loop leave it off and wait
+    with ``when_durable`` instead.
+    """
+
+    def __init__(self, store: NoteStore, durable_writes: bool = False):
+        self.store = store
+        self.durable_writes = durable_writes
+        self._lock = threading.RLock()
+        self._table: Optional[NameTable] = None
+        self._owns_table = False
+        self._index: Optional[NoteSearchIndex] = None
+        self._names: Optional[SortedNames] = None
+
+    def _name_table(self) -> NameTable:
+        if self._table is None:
+            self._table = self.store.name_table()
+            self._owns_table = self._table is None
+            if self._table is None:
+                self._table = NameTable(self.store.keys())
+            self._table.listen(self._renumber)
+        return self._table
+
+    def _renumber(self, mapping):
+        """Follow a renumbering of the name table"""
+        if self._names is not None:
+            self._names.renumber(mapping)
+        if self._index is not None:
+            self._index.renumber(mapping)
+
+    def _search_index(self) -> NoteSearchIndex:
+        if self._index is None:
+            table = self._name_table()
+            self._index = NoteSearchIndex.build(table, ((table.number(name), content)
+                                                        for name, content in self.store.items()))
+        return self._index
+
+    def _sorted_names(self) -> SortedNames:
+        if self._names is None:
+            self._names = SortedNames(self._name_table(), self._name_table().numbers())
+        return self._names
+
+    def _unindex(self, changes: Dict[str, Optional[str]]):
+        """Take notes about to be written out of the indexes, while the store still has their old contents"""
+        if self._table is None:
+            return
+        for name, content in changes.items():
+            number = self._table.number(name)
+            if number < 0:
+                continue
+            if self._index is not None:
+                self._index.remove(number, self.store[name])
+            if content is None and self._names is not None:
+                self._names.discard(number)
+
+    def _reindex(self, changes: Dict[str, Optional[str]]):
+        """Put written notes back into the indexes; a content of None means the note is gone"""
+        if self._table is None:
+            return
+        for name, content in changes.items():
+            if content is None:
+                if self._owns_table:
+                    self._table.remove(name)
+                continue
+            number = self._table.add(name)[0] if self._owns_table else self._table.number(name)
+            if self._index is not None and number not in self._index:
+                self._index.add(number, content)
+            if self._names is not None:
+                self._names.add(number)
+
+    def _write(self, changes: List[Tuple[str, Optional[str]]], batch: bool = True) -> None:
+        """Apply changes to the store, as one batch unless it is a single put, and keep the indexes in step"""
+        final = dict(changes)
+        self._unindex(final)
+        try:
+            if batch:
+                self.store.write_batch(changes)
+            else:
+                (name, content), = changes
+                self.store[name] = content
+        except BaseException:
+            # Index whatever the store holds now
+            self._reindex({name: self.store.get(name) for name in final})
+            raise
+        self._reindex(final)
+
+    def _wait_durable(self):
+        if self.durable_writes:
+            self.store.wait_durable()
+
+    def when_durable(self, callback) -> bool:
+        """See NoteStore.when_durable; takes no lock, so it can wait on writes still being made"""
+        return self.store.when_durable(callback)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.store)
+
+    def contains(self, name: str) -> bool:
+        with self._lock:
+            return name in self.store
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            return self.store.get(name, default)
+
+    def get_range(self, name: str, offset: int = 0, length: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """Return ``length`` characters of a note from ``offset`` and the note's full length, or None.
+
+        Only the slice leaves the service, so large notes are not copied whole to worker processes.
+        """
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("offset and length must not be negative")
+        with self._lock:
+            content = self.store.get(name)
+            if content is None:
+                return None
+            end = len(content) if length is None else offset + length
+            return content[offset:end], len(content)
+
+    def put(self, name: str, content: str) -> bool:
+        """Store a note and keep the indexes in step; returns whether the name already existed."""
+        with self._lock:
+            existed = name in self.store
+            self._write([(name, content)], batch=False)
+        self._wait_durable()
+        return existed
+
+    def put_many(self, notes: List[Tuple[str, str]]) -> List[bool]:
+        """Store several notes as one atomic store write; returns whether each name already existed"""
+        with self._lock:
+            existed = _existed(self.store, [name for name, _ in notes], deleting=False)
+            self._write(list(notes))
+        self._wait_durable()
+        return existed
+
+    def get_many(self, names: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            return [self.store.get(name) for name in names]
+
+    def delete_many(self, names: List[str]) -> List[bool]:
+        """Delete several notes as one atomic store write; returns whether each one existed"""
+        with self._lock:
+            existed = _existed(self.store, names, deleting=True)
+            self._write([(name, None) for name in names])
+        self._wait_durable()
+        return existed
+
+    def page(self, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[str], Optional[str]]:
+        """Return up to ``limit`` note names in name order after ``cursor``, and the next cursor.
+
+        The cursor encodes the last name returned, so pages stay stable while notes
+        are added and each page only costs ``limit`` steps of the ordered index.
+        """
+        with self._lock:
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+            start = decode_cursor(cursor) if cursor else ""
+            page = []
+            for name in self._sorted_names().iter_from(start, inclusive=not cursor):
+                if len(page) == limit:
+                    return page, encode_cursor(page[-1])
+                page.append(name)
+            return page, None
+
+    def search(self, query: str = "", prefix: str = "", limit: int = 10) -> List[str]:
+        """Return names of the best matches for ``query``, or of notes starting with ``prefix`` if there is no query"""
+        with self._lock:
+            if query.strip():
+                return [name for name, _ in self._search_index().search(query=query, prefix=prefix, limit=limit)]
+            return self._sorted_names().with_prefix(prefix, limit)
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Memory the stored notes and their indexes take up; see NoteStore.memory_report
+
+        ``bytes`` and ``bytes_per_note`` include the name and search indexes;
+        an index that was not built yet counts as 0. A name table the service
+        keeps itself, for a store without one, counts towards the name index.
+        ``store_bytes`` is the store alone.
+        """
+        with self._lock:
+            report = self.store.memory_report()
+            names = self._names.memory_bytes() if self._names is not None else 0
+            if self._owns_table and self._table is not None:
+                names += self._table.memory_bytes()
+            search = self._index.memory_bytes() if self._index is not None else 0
+            total = report["bytes"] + names + search
+            report.update(bytes=total, bytes_per_note=round(total / report["notes"], 1) if report["notes"] else None,
+                          store_bytes=report["bytes"], names_index_bytes=names, search_index_bytes=search)
+            return report
+
+    def clear(self) -> None:
+        with self._lock:
+            self.store.clear()
+            self._table = None
+            self._index = None
+            self._names = None
+
+    def flush(self) -> None:
+        with self._lock:
+            self.store.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self.store.close()
@@ -0,0 +1,157 @@
+"""Pipelines: a DAG of tool calls run inside the gateway in one request.
+
+A pipeline is a list of steps::
+
+    [{"id": "page", "tool": "web:fetch", "arguments": {"url": "https://example.com"}},
+     {"id": "links", "tool": "html:links", "arguments": {"html": {"$ref": "page"}}},
+     {"id": "save", "tool": "db:insert", "arguments": {"rows": {"$ref": "links", "path": "items"}},
+      "after": ["page"]}]
+
+An argument value ``{"$ref": "<step id>"}`` is replaced by the text output of
+that step; with ``"path"``, the output is parsed as JSON and the dotted path
+(keys or list indices) is selected from it. A step runs once every step it
+references or lists in ``"after"`` has finished, so independent branches run
+concurrently.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from .codec import is_error
+
+# Upper bound on the steps of one pipeline
+MAX_STEPS = 100
+
+ToolCaller = Callable[[str, Dict[str, Any]], Awaitable[List[Any]]]
+
+
+class PipelineError(ValueError):
+    """A pipeline is malformed, or one of its steps failed"""
+
+
+@dataclass
+class Step:
+    id: str
+    tool: str
+    arguments: Dict[str, Any]
+    depends_on: Set[str] = field(default_factory=set)
+
+
+def _references(value: Any) -> Set[str]:
+    if isinstance(value, dict):
+        if "$ref" in value:
+            return {value["$ref"]}
+        return set().union(*(_references(item) for item in value.values()))
+    if isinstance(value, list):
+        return set().union(*(_references(item) for item in value))
+    return set()
+
+
+def parse_pipeline(steps: List[Dict[str, Any]]) -> List[Step]:
+    """Validate a pipeline and return its steps in a runnable (topological) order"""
+    if not isinstance(steps, list) or not steps:
+        raise PipelineError("A pipeline needs a non-empty list of steps")
+    if len(steps) > MAX_STEPS:
+        raise PipelineError(f"A pipeline has at most {MAX_STEPS} steps")
+
+    parsed: Dict[str, Step] = {}
+    for index, spec in enumerate(steps):
+        if not isinstance(spec, dict) or "tool" not in spec:
+            raise PipelineError(f"Step {index} needs a tool")
+        step_id = str(spec.get("id", index))
+        if step_id in parsed:
+            raise PipelineError(f"Duplicate step id {step_id!r}")
+        arguments = spec.get("arguments") or {}
+        depends_on = _references(arguments) | set(spec.get("after", []))
+        parsed[step_id] = Step(step_id, spec["tool"], arguments, depends_on)
+
+    for step in parsed.values():
+        unknown = step.depends_on - parsed.keys()
+        if unknown:
+            raise PipelineError(f"Step {step.id!r} depends on unknown steps: {', '.join(sorted(unknown))}")
+
+    ordered = []
+    done: Set[str] = set()
+    remaining = dict(parsed)
+    while remaining:
+        ready = [step for step in remaining.values() if step.depends_on <= done]
+        if not ready:
+            raise PipelineError(f"Steps form a cycle: {', '.join(sorted(remaining))}")
+        for step in ready:
+            ordered.append(step)
+            done.add(step.id)
+            del remaining[step.id]
+    return ordered
+
+
+def content_text(content: List[Any]) -> str:
+    """The text of a tool result, as a later step sees it"""
+    return "\n".join(item.text if getattr(item, "type", None) == "text" else item.model_dump_json()
+                     for item in content)
+
+
+def _select(text: str, path: str, step_id: str) -> Any:
+    try:
+        value = json.loads(text)
+    except ValueError:
+        raise PipelineError(f"Output of step {step_id!r} is not JSON, so it has no path {path!r}")
+    for part in path.split("."):
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise PipelineError(f"Output of step {step_id!r} has no path {path!r}")
+    return value
+
+
+def resolve(value: Any, outputs: Dict[str, str]) -> Any:
+    """Replace the references in a step's arguments with earlier outputs"""
+    if isinstance(value, dict):
+        if "$ref" in value:
+            step_id = value["$ref"]
+            path = value.get("path")
+            return outputs[step_id] if not path else _select(outputs[step_id], path, step_id)
+        return {key: resolve(item, outputs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve(item, outputs) for item in value]
+    return value
+
+
+async def run_pipeline(steps: List[Step], call_tool: ToolCaller) -> Dict[str, str]:
+    """Run parsed steps, each as soon as its dependencies are done; returns every step's output.
+
+    The first failing step, whether its call raised or its result is flagged
+    ``isError``, cancels the steps still running and raises PipelineError.
+    """
+    outputs: Dict[str, str] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_step(step: Step) -> None:
+        if step.depends_on:
+            await asyncio.gather(*(tasks[step_id] for step_id in step.depends_on))
+        arguments = resolve(step.arguments, outputs)
+        try:
+            content = await call_tool(step.tool, arguments)
+        except Exception as e:
+            raise PipelineError(f"Step {step.id!r} ({step.tool}) failed: {e}") from e
+        if is_error(content):
+            raise PipelineError(f"Step {step.id!r} ({step.tool}) failed: {content_text(content)}")
+        outputs[step.id] = content_text(content)
+
+    # Steps are in topological order, so every dependency's task exists before its dependents start
+    for step in steps:
+        tasks[step.id] = asyncio.create_task(run_step(step), name=f"pipeline-step:{step.id}")
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return outputs
+
+
+def sinks(steps: List[Step]) -> List[str]:
+    """Ids of the steps no other step depends on, i.e. the pipeline's results"""
+    needed: Set[str] = set().union(*(step.depends_on for step in steps))
+    return [step.id for step in steps if step.id not in needed]
@@ -0,0 +1,229 @@
+"""Per-session rate limits and weighted fair queuing of downstream calls.
+
+Every session is a flow, identified by the client name it sent in
+``initialize``. Before a downstream call is dispatched, the session's token
+buckets must hold a token: one for the session as a whole and one for the
+tool, if rate limits are set for them. A call without a token fails at once
+with ``RateLimitedError`` rather than adding to the queue.
+
+With ``max_concurrent`` set, at most that many calls are dispatched at once
+and the rest wait in start-time fair queuing order: each call is tagged with
+a virtual start time, ``cost / weight`` after the previous call of its
+session, and the waiting call with the smallest tag goes next. A session
+flooding the gateway therefore only delays its own calls, while a session
+with a handful of interactive calls is served about as soon as a slot frees
+up. Weights are set per client name and costs per tool.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .metrics import metrics
+
+# Client name of sessions that did not send one, and the wildcard of the settings below
+ANONYMOUS = "anonymous"
+ANY_CLIENT = "*"
+
+
+class RateLimitedError(RuntimeError):
+    """A session called faster than its rate limit allows"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate: float
+    burst: float
+
+
+class TokenBucket:
+    """Holds up to ``burst`` tokens, refilled at ``rate`` tokens per second"""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available; 0 if one is"""
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.limit.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.limit.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+def parse_rate_limits(spec: str) -> Dict[str, RateLimit]:
+    """Parse ``"*=20/40,batch-bot=5,*:search=2"`` (calls per second, optional burst) into rate limits
+
+    Keys are a client name or ``client:tool``, either with ``*`` for any
+    client. The burst defaults to the rate, and is at least one call.
+    """
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.rpartition("=")
+        rate, _, burst = value.partition("/")
+        if not name or float(rate) <= 0:
+            raise ValueError(f"Invalid rate limit {item!r}; expected client=rate[/burst] or client:tool=rate[/burst]")
+        limits[name.strip()] = RateLimit(float(rate), max(1.0, float(burst) if burst else float(rate)))
+    return limits
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse ``"interactive=4,batch-bot=0.5"`` into a map of positive weights"""
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.rpartition("=")
+        if not name or float(weight) <= 0:
+            raise ValueError(f"Invalid weight {item!r}; expected name=positive number")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def client_name(session: Any) -> str:
+    """The name a session's client gave in initialize"""
+    params = getattr(session, "client_params", None)
+    return params.clientInfo.name if params is not None else ANONYMOUS
+
+
+class _Flow:
+    """Scheduling state of one session"""
+
+    def __init__(self, client: str, weight: float):
+        self.client = client
+        self.weight = weight
+        # Virtual time at which the session's last call finishes its share
+        self.finish = 0.0
+        self.queued = 0
+        # rate limit key -> bucket
+        self.buckets: Dict[str, TokenBucket] = {}
+
+
+class _Caller:
+    """Stands in for the session of calls made outside any request"""
+
+
+class FairScheduler:
+    """Admits downstream calls of many sessions within rate limits, in weighted fair order"""
+
+    def __init__(self,
+                 max_concurrent: Optional[int] = None,
+                 weights: Optional[Dict[str, float]] = None,
+                 tool_costs: Optional[Dict[str, float]] = None,
+                 rate_limits: Optional[Dict[str, RateLimit]] = None):
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.weights = dict(weights or {})
+        self.tool_costs = dict(tool_costs or {})
+        self.rate_limits = dict(rate_limits or {})
+        # Flows are dropped with the connection their session belongs to
+        self._flows: "weakref.WeakKeyDictionary[object, _Flow]" = weakref.WeakKeyDictionary()
+        self._local = _Caller()
+        self._virtual_time = 0.0
+        # (start tag, arrival order, flow, future resolved when the call may go)
+        self._queue: List[Tuple[float, int, _Flow, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self.active = 0
+        self.throttled = 0
+
+    def flow(self, session: Any = None) -> _Flow:
+        key = session if session is not None else self._local
+        flow = self._flows.get(key)
+        if flow is None:
+            client = client_name(session)
+            flow = self._flows[key] = _Flow(client, self.weights.get(client, self.weights.get(ANY_CLIENT, 1.0)))
+        return flow
+
+    def _limit(self, flow: _Flow, key: str) -> Optional[Tuple[str, TokenBucket]]:
+        limit = self.rate_limits.get(f"{flow.client}{key}", self.rate_limits.get(f"{ANY_CLIENT}{key}"))
+        if limit is None:
+            return None
+        bucket = flow.buckets.get(key)
+        if bucket is None or bucket.limit != limit:
+            bucket = flow.buckets[key] = TokenBucket(limit)
+        return key, bucket
+
+    def check_rate(self, flow: _Flow, tool: str, label: Optional[str] = None) -> None:
+        """Take a token for a call of ``tool``, or raise RateLimitedError
+
+        ``label`` stands for the tool in metrics, where it defaults to the name.
+        """
+        buckets = [entry for entry in (self._limit(flow, ""), self._limit(flow, f":{tool}")) if entry is not None]
+        now = time.monotonic()
+        for key, bucket in buckets:
+            wait = bucket.wait_time(now)
+            if wait > 0:
+                self.throttled += 1
+                metrics.inc("mcp_throttled_calls_total", client=flow.client, tool=label or tool)
+                scope = f"tool {tool}" if key else "this session"
+                raise RateLimitedError(f"Rate limit of {bucket.limit.rate:g} calls/s for {scope} exceeded; "
+                                       f"retry in {wait:.2f} seconds")
+        # Tokens are only taken once every bucket had one
+        for _, bucket in buckets:
+            bucket.take()
+
+    @asynccontextmanager
+    async def admit(self, tool: str, session: Any = None, label: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold a dispatch slot for one call of ``tool`` by ``session``, within its rate limits"""
+        flow = self.flow(session)
+        self.check_rate(flow, tool, label)
+        if self.max_concurrent is None:
+            yield
+            return
+        start = max(self._virtual_time, flow.finish)
+        flow.finish = start + self.tool_costs.get(tool, 1.0) / flow.weight
+        if self.active < self.max_concurrent and not self._queue:
+            self._virtual_time = start
+            self.active += 1
+        else:
+            await self._wait(start, flow)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait(self, start: float, flow: _Flow) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (start, next(self._arrivals), flow, future))
+        flow.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller gave up
+                self._release()
+            raise
+        finally:
+            flow.queued -= 1
+            metrics.observe("mcp_scheduler_wait_seconds", time.perf_counter() - queued_at, client=flow.client)
+
+    def _release(self) -> None:
+        self.active -= 1
+        while self._queue and self.active < self.max_concurrent:
+            start, _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._virtual_time = start
+            self.active += 1
+            future.set_result(None)
+
+    def collect_metrics(self) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Gauges of the scheduler for a metrics snapshot"""
+        queued: Dict[str, int] = {}
+        for flow in list(self._flows.values()):
+            queued[flow.client] = queued.get(flow.client, 0) + flow.queued
+        gauges = [("mcp_scheduler_active", {}, self.active)]
+        gauges.extend(("mcp_scheduler_queued", {"client": client}, count) for client, count in queued.items())
+        return gauges
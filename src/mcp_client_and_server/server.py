@@ -1,23 +1,341 @@
+import argparse
 import asyncio
+import contextvars
+import json
 import logging
-from typing import Dict, Optional, List, Any
+import os
+import signal
+import time
+from typing import TYPE_CHECKING, Dict, Optional, List, Any, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
 import mcp.types as types
 import mcp.server as server
 from mcp.server import request_ctx
-from mcp.server.stdio import stdio_server
+
+from .codec import PassthroughResult, ResultContent, is_error, result_meta, stdio_server
+from .metrics import export_metrics, metrics, tracer
+from .subscriptions import SubscriptionHub
+
+# Hosts spawn a process per session and wait for it to answer initialize, so
+# modules only some requests need (the notes store, pipelines, the chaining
+# client, the sse transport) are imported on first use.
+if TYPE_CHECKING:
+    from .notes import NoteService
 
 logger = logging.getLogger(__name__)
 
-# Initialize an empty dictionary to store notes
-notes = {}
+# Notes, opened on first use. In multi-worker mode this is a proxy to the one
+# service shared by every worker.
+_note_service: Optional["NoteService"] = None
+# Whether _note_service is a proxy to the manager process of worker mode
+_shared_notes = False
+
+# Tools the gateway serves itself, as opposed to forwarding them downstream
+GATEWAY_TOOLS = frozenset({
+    "add-note", "get-note", "add-notes", "get-notes", "delete-notes", "memory-report", "list-notes",
+    "search-notes", "connect-server", "disconnect-server", "list-servers", "invalidate-cache", "cache-stats",
+    "get-metrics", "reload-config", "run-pipeline",
+})
+# Metrics label of tool names that are neither the gateway's nor in a downstream listing
+UNKNOWN_TOOL = "unknown"
+
+# Notes returned by one page of a listing, unless list-notes asks for another limit
+PAGE_SIZE = int(os.environ.get("MCP_NOTES_PAGE_SIZE", "100"))
+# Largest page a list-notes "limit" may ask for
+MAX_PAGE_SIZE = max(PAGE_SIZE, int(os.environ.get("MCP_NOTES_MAX_PAGE_SIZE", "1000")))
 
 # Create a server instance
 server_instance = server.Server("notes-server")
 
-@server_instance.list_resources()
-async def handle_list_resources() -> List[types.Resource]:
+# notes://list lists the notes, so no note may be called "list"
+NOTES_LIST_NAME = "list"
+NOTES_LIST_URI = f"notes://{NOTES_LIST_NAME}"
+# Sessions subscribed to note resources; changes are announced after a short debounce
+subscriptions = SubscriptionHub(NOTES_LIST_URI, debounce=float(os.environ.get("MCP_NOTES_NOTIFY_DEBOUNCE", "0.05")))
+
+# Downstream connection pool, shared by every tool call for the life of the process
+_chained_client = None
+
+# Servers the pool should be connected to, when shared with other worker processes
+_server_registry = None
+
+def _env_number(key: str, cast=int):
+    value = os.environ.get(key)
+    return cast(value) if value else None
+
+def get_chained_client():
+    """Return the process-wide chaining client, creating it on first use."""
+    global _chained_client
+    if _chained_client is None:
+        # Lazy import to avoid circular import
+        from .client import STARTUP_TIMEOUT, CallLimits, MCPChainedClient
+        from .cache import ResultCache, parse_tool_ttls
+        result_cache = None
+        tool_ttls = parse_tool_ttls(os.environ.get("MCP_GATEWAY_CACHE_TTLS", ""))
+        annotated_ttl = _env_number("MCP_GATEWAY_CACHE_ANNOTATED_TTL", float)
+        if tool_ttls or annotated_ttl:
+            result_cache = ResultCache(
+                max_bytes=_env_number("MCP_GATEWAY_CACHE_BYTES") or 64 << 20,
+                tool_ttls=tool_ttls,
+                annotated_ttl=annotated_ttl,
+            )
+        _chained_client = MCPChainedClient(
+            max_servers=_env_number("MCP_GATEWAY_MAX_SERVERS"),
+            idle_timeout=_env_number("MCP_GATEWAY_IDLE_TIMEOUT", float),
+            routing_policy=os.environ.get("MCP_GATEWAY_ROUTING", "first-wins"),
+            server_priority=[name for name in os.environ.get("MCP_GATEWAY_SERVER_PRIORITY", "").split(",") if name],
+            registry=_server_registry,
+            result_cache=result_cache,
+            coalesce_calls=os.environ.get("MCP_GATEWAY_COALESCE", "safe"),
+            call_limits=CallLimits(
+                max_in_flight=_env_number("MCP_GATEWAY_MAX_IN_FLIGHT"),
+                max_queued=_env_number("MCP_GATEWAY_MAX_QUEUED"),
+                timeout=_env_number("MCP_GATEWAY_CALL_TIMEOUT", float),
+            ),
+            send_cancellations=os.environ.get("MCP_GATEWAY_SEND_CANCELLATIONS", "0") not in ("", "0"),
+            health_interval=_env_number("MCP_GATEWAY_HEALTH_INTERVAL", float),
+            passthrough=os.environ.get("MCP_GATEWAY_PASSTHROUGH", "1") != "0",
+            start_timeout=_env_number("MCP_GATEWAY_START_TIMEOUT", float) or STARTUP_TIMEOUT,
+        )
+        metrics.add_collector(_chained_client.collect_metrics)
+    return _chained_client
+
+def start_warm_pool():
+    """Start warming the downstream servers declared in MCP_GATEWAY_WARM_SERVERS.
+
+    The variable holds a JSON list of objects with "command" and optional
+    "cwd", "env" and "size" (processes to keep ready, default 1).
+    """
+    declared = json.loads(os.environ.get("MCP_GATEWAY_WARM_SERVERS") or "[]")
+    chained_client = get_chained_client() if declared else None
+    for spec in declared:
+        chained_client.warm(spec["command"], cwd=spec.get("cwd"), env=spec.get("env"), size=int(spec.get("size", 1)))
+
+# Rate limits and fair queuing of downstream calls across sessions, when configured
+_scheduler = None
+
+def get_scheduler():
+    """Return the process-wide call scheduler, creating it on first use.
+
+    None unless MCP_GATEWAY_MAX_CONCURRENT or MCP_GATEWAY_RATE_LIMITS is set.
+    """
+    global _scheduler
+    if _scheduler is None:
+        max_concurrent = _env_number("MCP_GATEWAY_MAX_CONCURRENT")
+        rate_limits = os.environ.get("MCP_GATEWAY_RATE_LIMITS", "")
+        if max_concurrent is None and not rate_limits.strip():
+            return None
+        from .scheduler import FairScheduler, parse_rate_limits, parse_weights
+        _scheduler = FairScheduler(
+            max_concurrent=max_concurrent,
+            weights=parse_weights(os.environ.get("MCP_GATEWAY_CLIENT_WEIGHTS", "")),
+            tool_costs=parse_weights(os.environ.get("MCP_GATEWAY_TOOL_COSTS", "")),
+            rate_limits=parse_rate_limits(rate_limits),
+        )
+        metrics.add_collector(_scheduler.collect_metrics)
+    return _scheduler
+
+async def call_downstream(name: str, arguments: Dict, **options) -> List[Any]:
+    """Call a downstream tool on behalf of the current session, within its rate limits and fair share"""
+    chained_client = get_chained_client()
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return await chained_client.call_tool(name, arguments, **options)
+    context = request_ctx.get(None)
+    async with scheduler.admit(name, context.session if context is not None else None, label=tool_label(name)):
+        return await chained_client.call_tool(name, arguments, **options)
+
+# Gateway config file (--config or MCP_GATEWAY_CONFIG), the config last applied and its startup task
+_config_path: Optional[str] = None
+_gateway_config = None
+_config_lock = asyncio.Lock()
+_config_task: Optional[asyncio.Task] = None
+
+def start_config(path: Optional[str] = None):
+    """Load the gateway config and connect its servers in the background.
+
+    A malformed config fails right away; connecting does not hold up initialize.
+    SIGHUP reloads the config, as does the reload-config tool.
+    """
+    global _config_path, _config_task
+    from .config import load_config
+    _config_path = path or os.environ.get("MCP_GATEWAY_CONFIG")
+    if not _config_path:
+        return
+    config = load_config(_config_path)
+    _config_task = asyncio.create_task(apply_gateway_config(config), name="mcp-gateway-config")
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_on_signal)
+    except (NotImplementedError, AttributeError, RuntimeError, ValueError):
+        # No SIGHUP on this platform, or not the main thread; reload-config still works
+        pass
+
+async def stop_config():
+    if _config_task is not None:
+        _config_task.cancel()
+        await asyncio.gather(_config_task, return_exceptions=True)
+
+def _reload_on_signal():
+    global _config_task
+    # Chained onto the task before it, which stop_config could no longer reach once replaced
+    _config_task = asyncio.create_task(_reload_after(_config_task), name="mcp-gateway-config")
+
+async def _reload_after(previous: Optional[asyncio.Task]) -> Dict[str, List[str]]:
+    """Reload the config once ``previous`` is done; cancelling this cancels ``previous`` too"""
+    if previous is not None:
+        await asyncio.gather(previous, return_exceptions=True)
+    return await reload_config()
+
+async def apply_gateway_config(config) -> Dict[str, List[str]]:
+    """Connect and disconnect servers to go from the config applied last to ``config``"""
+    global _gateway_config
+    from .config import apply_config
+    async with _config_lock:
+        changes = await apply_config(get_chained_client(), config, _gateway_config)
+        _gateway_config = config
+    logger.info("Applied gateway config: " + ", ".join(f"{key} {len(names)}" for key, names in changes.items()))
+    return changes
+
+async def reload_config() -> Dict[str, List[str]]:
+    """Reload the config file, only touching the servers whose entries changed"""
+    from .config import load_config
+    if not _config_path:
+        raise ValueError("No gateway config to reload; start with --config or MCP_GATEWAY_CONFIG")
+    try:
+        return await apply_gateway_config(load_config(_config_path))
+    except Exception as e:
+        logger.error(f"Could not reload {_config_path}: {e}")
+        raise
+
+# Periodic Prometheus export, when MCP_GATEWAY_METRICS_FILE or _PORT is set
+_metrics_task: Optional[asyncio.Task] = None
+
+def start_metrics_export(worker: Optional[int] = None):
+    """Start exporting metrics to MCP_GATEWAY_METRICS_FILE and/or MCP_GATEWAY_METRICS_PORT.
+
+    Worker ``n`` writes to ``<file>.<n>`` and listens on ``<port> + n``.
+    """
+    global _metrics_task
+    path = os.environ.get("MCP_GATEWAY_METRICS_FILE")
+    port = _env_number("MCP_GATEWAY_METRICS_PORT")
+    if not path and port is None:
+        return
+    if worker is not None:
+        path = f"{path}.{worker}" if path else None
+        port = port + worker if port is not None else None
+    _metrics_task = asyncio.create_task(export_metrics(
+        path, port, interval=_env_number("MCP_GATEWAY_METRICS_INTERVAL", float) or 10.0))
+
+async def stop_metrics_export():
+    global _metrics_task
+    if _metrics_task is not None:
+        _metrics_task.cancel()
+        await asyncio.gather(_metrics_task, return_exceptions=True)
+        _metrics_task = None
+
+def get_note_service() -> "NoteService":
+    """Return the note service, opening the store on first use.
+
+    Notes live in memory unless MCP_NOTES_PATH names a directory to persist them in;
+    MCP_NOTES_COMPACT=1 packs in-memory notes into compact buffers.
+    """
+    global _note_service
+    if _note_service is None:
+        from .notes import NoteService
+        from .store import open_store
+        store = open_store(os.environ.get("MCP_NOTES_PATH"), fsync=os.environ.get("MCP_NOTES_FSYNC", "batch"),
+                           compact=os.environ.get("MCP_NOTES_COMPACT", "0") not in ("", "0"))
+        _note_service = NoteService(store)
+    return _note_service
+
+def use_shared_state(note_service, server_registry):
+    """Serve notes and downstream servers from state shared with other worker processes."""
+    global _note_service, _server_registry, _shared_notes
+    _note_service = note_service
+    _server_registry = server_registry
+    _shared_notes = True
+
+async def call_notes(method: str, *args) -> Any:
+    """Call a NoteService method; in worker mode the call is a round trip to the manager, made off the event loop."""
+    function = getattr(get_note_service(), method)
+    if _shared_notes:
+        return await asyncio.to_thread(function, *args)
+    return function(*args)
+
+async def notes_durable() -> None:
+    """Wait until the notes written so far are durable under the store's fsync policy.
+
+    Under group commit the wait is a future resolved by the store's flush
+    thread, so the event loop keeps serving writes that join the same fsync.
+    In worker mode the service waits before its write calls return.
+    """
+    if _shared_notes:
+        return
+    loop = asyncio.get_running_loop()
+    durable = loop.create_future()
+
+    def resolve():
+        if not durable.done():
+            durable.set_result(None)
+
+    if get_note_service().when_durable(lambda: loop.call_soon_threadsafe(resolve)):
+        await durable
+
+async def note_page(cursor: Optional[str] = None, limit: int = PAGE_SIZE) -> Tuple[List[str], Optional[str]]:
+    """Return up to ``limit`` note names after ``cursor``, and the next cursor."""
+    return await call_notes("page", cursor, limit)
+
+def note_page_meta(next_cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The _meta of a result holding a page of note names; it carries the cursor of the next page, if any"""
+    return {"nextCursor": next_cursor} if next_cursor else None
+
+def format_health(health: Dict[str, Any]) -> str:
+    parts = [health.get("replicas") or ("up" if health["alive"] else "down"), f"circuit {health['circuit']}"]
+    if health["p50_ms"] is not None:
+        parts.append(f"p50 {health['p50_ms']} ms, p95 {health['p95_ms']} ms")
+    parts.append(f"errors {health['error_rate']:.1%}")
+    parts.append(f"restarts {health['restarts']}")
+    if health.get("hedged_calls"):
+        parts.append(f"hedged {health['hedged_calls']}")
+    if health["last_error"]:
+        parts.append(f"last error: {health['last_error']}")
+    if health.get("list_error"):
+        parts.append(f"tools not listed: {health['list_error']}")
+    return ", ".join(parts)
+
+def note_error(note: Any) -> Optional[str]:
+    """Why an item of add-notes cannot be stored, if it cannot"""
+    if not isinstance(note, dict) or not isinstance(note.get('name'), str) or not isinstance(note.get('content'), str):
+        return "expected an object with string name and content"
+    if "\0" in note['name']:
+        return "name contains a NUL character"
+    if note['name'] == NOTES_LIST_NAME:
+        return f"the name '{NOTES_LIST_NAME}' is reserved, since {NOTES_LIST_URI} lists the notes"
+    return None
+
+def note_uri(name: str) -> str:
+    return f"notes://{quote(name, safe='')}"
+
+async def handle_list_resources(cursor: Optional[str] = None) -> List[types.Resource]:
     """List available resources."""
-    return []
+    return (await list_resources_page(cursor)).resources
+
+async def list_resources_page(cursor: Optional[str] = None) -> types.ListResourcesResult:
+    """List one page of note resources, in name order."""
+    page, next_cursor = await note_page(cursor)
+    resources = [
+        types.Resource(uri=note_uri(name), name=name, mimeType="text/plain")
+        for name in page
+    ]
+    return types.ListResourcesResult(resources=resources, nextCursor=next_cursor)
+
+async def _list_resources_request(req: types.ListResourcesRequest) -> types.ServerResult:
+    # The cursor belongs in params, but some SDK versions only model it on the request
+    cursor = getattr(req.params, "cursor", None) or getattr(req, "cursor", None)
+    return types.ServerResult(await list_resources_page(cursor))
+
+# Registered directly because the list_resources decorator does not pass the cursor on
+server_instance.request_handlers[types.ListResourcesRequest] = _list_resources_request
 
 @server_instance.read_resource()
 async def handle_read_resource(uri: types.AnyUrl) -> str:
@@ -27,13 +345,59 @@ async def handle_read_resource(uri: types.AnyUrl) -> str:
         logger.error(f"Unsupported URI scheme: {uri.scheme}")
         raise ValueError(f"Unsupported URI scheme: {uri.scheme}")
 
-    path = str(uri).replace("notes://", "")
-    if path == "list":
-        return "\n".join(notes.keys())
+    parts = urlsplit(str(uri))
+    path = unquote(parts.netloc + parts.path)
+    query = parse_qs(parts.query)
+    if path == NOTES_LIST_NAME:
+        page, _ = await note_page(query.get("cursor", [None])[0])
+        return "\n".join(page)
+    if "offset" in query or "length" in query:
+        # notes://<name>?offset=N&length=M reads one chunk of a large note
+        length = query.get("length", [None])[0]
+        note = await call_notes("get_range", path, int(query.get("offset", ["0"])[0]),
+                                int(length) if length is not None else None)
+        if note is not None:
+            return note[0]
+    else:
+        content = await call_notes("get", path)
+        if content is not None:
+            return content
     
     logger.error(f"Unknown resource path: {path}")
     raise ValueError(f"Unknown resource path: {path}")
 
+_read_note_resource = server_instance.request_handlers[types.ReadResourceRequest]
+
+async def _read_resource_request(req: types.ReadResourceRequest) -> types.ServerResult:
+    parts = urlsplit(str(req.params.uri))
+    if parts.scheme != "notes" or unquote(parts.netloc + parts.path) != NOTES_LIST_NAME:
+        return await _read_note_resource(req)
+    page, next_cursor = await note_page(parse_qs(parts.query).get("cursor", [None])[0])
+    meta = note_page_meta(next_cursor)
+    return types.ServerResult(types.ReadResourceResult(
+        contents=[types.TextResourceContents(uri=req.params.uri, mimeType="text/plain", text="\n".join(page))],
+        **({"_meta": meta} if meta else {})))
+
+# Replaces the decorator's handler for the note listing, whose next cursor goes in the result's _meta
+server_instance.request_handlers[types.ReadResourceRequest] = _read_resource_request
+
+@server_instance.subscribe_resource()
+async def handle_subscribe_resource(uri: types.AnyUrl) -> None:
+    """Send resources/updated to this session when the note (or notes://list) changes.
+
+    Refused in worker mode, where the session would only hear about writes made
+    through its own worker.
+    """
+    if uri.scheme != "notes":
+        raise ValueError(f"Unsupported URI scheme: {uri.scheme}")
+    if _shared_notes:
+        raise ValueError("Resource subscriptions are not supported when serving from several workers")
+    subscriptions.subscribe(server_instance.request_context.session, str(uri))
+
+@server_instance.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri: types.AnyUrl) -> None:
+    subscriptions.unsubscribe(server_instance.request_context.session, str(uri))
+
 @server_instance.list_prompts()
 async def handle_list_prompts() -> List[types.Prompt]:
     """Handle prompts/list request.
@@ -46,37 +410,136 @@ async def handle_list_prompts() -> List[types.Prompt]:
 @server_instance.list_tools()
 async def handle_list_tools() -> List[types.Tool]:
     """List available tools."""
+    return (await list_tools_result()).tools
+
+async def list_tools_result() -> types.ListToolsResult:
+    """List the downstream tools; servers that could not be listed are named in _meta.unavailableServers."""
     logger.debug("Listing tools")
-    return []
+    if _chained_client is not None:
+        await _chained_client.sync_registry()
+    if _chained_client is None or not _chained_client.connected_servers:
+        return types.ListToolsResult(tools=[])
+    catalog = await _chained_client.get_catalog()
+    if not catalog.errors:
+        return types.ListToolsResult(tools=catalog.tools)
+    logger.warning(f"Tool listing is missing the tools of {', '.join(sorted(catalog.errors))}")
+    return types.ListToolsResult(tools=catalog.tools, _meta={"unavailableServers": catalog.errors})
+
+async def _list_tools_request(req: types.ListToolsRequest) -> types.ServerResult:
+    return types.ServerResult(await list_tools_result())
+
+# Registered directly because the list_tools decorator only passes the tools on
+server_instance.request_handlers[types.ListToolsRequest] = _list_tools_request
 
 @server_instance.call_tool()
-async def handle_call_tool(name: str, arguments: Dict) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-    """Handle tool calls"""
+async def handle_call_tool(name: str, arguments: Dict, raw: bool = False) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    """Handle tool calls
+
+    With ``raw``, content forwarded from a downstream server may be the plain
+    JSON objects it sent rather than content models.
+    """
     logger.debug(f"Calling tool: {name} with arguments: {arguments}")
     
     try:
-        # Lazy import to avoid circular import
-        from mcp_client_and_server.client import MCPChainedClient
-        
-        # Instantiate client if not already set
-        chained_client = MCPChainedClient()
+        chained_client = get_chained_client()
+        await chained_client.sync_registry()
 
         if name == "add-note":
-            notes[arguments['name']] = arguments['content']
+            error = note_error(arguments)
+            if error:
+                raise ValueError(f"Cannot add note: {error}")
+            existed = await call_notes("put", arguments['name'], arguments['content'])
+            await notes_durable()
+            subscriptions.changed([note_uri(arguments['name'])], list_changed=not existed)
             return [types.TextContent(type="text", text=f"Note '{arguments['name']}' added successfully")]
         
         elif name == "get-note":
-            note = notes.get(arguments['name'], "Note not found")
+            if 'offset' in arguments or 'length' in arguments:
+                offset = int(arguments.get('offset', 0))
+                length = int(arguments['length']) if arguments.get('length') is not None else None
+                note = await call_notes("get_range", arguments['name'], offset, length)
+                if note is None:
+                    return [types.TextContent(type="text", text="Note not found")]
+                chunk, total = note
+                start = min(offset, total)
+                return [types.TextContent(type="text", text=chunk),
+                        types.TextContent(type="text", text=f"range: {start}-{start + len(chunk)}/{total}")]
+            note = await call_notes("get", arguments['name'], "Note not found")
             return [types.TextContent(type="text", text=note)]
         
+        elif name == "add-notes":
+            notes = arguments.get('notes') or []
+            errors = [note_error(note) for note in notes]
+            if any(errors):
+                # Nothing is written unless every note is valid
+                statuses = [{"name": note.get('name') if isinstance(note, dict) else None,
+                             "status": f"error: {error}" if error else "not added"}
+                            for note, error in zip(notes, errors)]
+            else:
+                existed = await call_notes("put_many", [(note['name'], note['content']) for note in notes])
+                await notes_durable()
+                subscriptions.changed((note_uri(note['name']) for note in notes), list_changed=not all(existed))
+                statuses = [{"name": note['name'], "status": "updated" if found else "added"}
+                            for note, found in zip(notes, existed)]
+            return [types.TextContent(type="text", text=json.dumps(statuses))]
+
+        elif name == "get-notes":
+            names = arguments.get('names') or []
+            contents = await call_notes("get_many", names)
+            return [types.TextContent(type="text", text=json.dumps([
+                {"name": note_name, "status": "found", "content": content} if content is not None
+                else {"name": note_name, "status": "not found"}
+                for note_name, content in zip(names, contents)
+            ]))]
+
+        elif name == "delete-notes":
+            names = arguments.get('names') or []
+            existed = await call_notes("delete_many", names)
+            await notes_durable()
+            subscriptions.changed((note_uri(note_name) for note_name, found in zip(names, existed) if found),
+                                  list_changed=any(existed))
+            return [types.TextContent(type="text", text=json.dumps([
+                {"name": note_name, "status": "deleted" if found else "not found"}
+                for note_name, found in zip(names, existed)
+            ]))]
+
+        elif name == "memory-report":
+            return [types.TextContent(type="text", text=json.dumps(await call_notes("memory_report")))]
+
         elif name == "list-notes":
-            return [types.TextContent(type="text", text="\n".join(notes.keys()))]
+            limit = min(int(arguments.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+            page, next_cursor = await note_page(arguments.get('cursor'), limit)
+            return ResultContent([types.TextContent(type="text", text="\n".join(page))],
+                                 meta=note_page_meta(next_cursor))
         
+        elif name == "search-notes":
+            query = arguments.get('query', '')
+            prefix = arguments.get('prefix', '')
+            limit = int(arguments.get('limit', 10))
+            results = await call_notes("search", query, prefix, limit)
+            if not results:
+                return [types.TextContent(type="text", text="No matching notes")]
+            return [types.TextContent(type="text", text="\n".join(results))]
+
         elif name == "connect-server":
-            server = await chained_client.connect_server(
+            limits = None
+            if any(key in arguments for key in ('max_in_flight', 'max_queued', 'timeout')):
+                from .client import CallLimits
+                defaults = chained_client.call_limits
+                limits = CallLimits(
+                    max_in_flight=arguments.get('max_in_flight', defaults.max_in_flight),
+                    max_queued=arguments.get('max_queued', defaults.max_queued),
+                    timeout=arguments.get('timeout', defaults.timeout),
+                )
+            await chained_client.connect_server(
                 name=arguments['name'], 
                 command=arguments['command'], 
-                cwd=arguments.get('cwd')
+                cwd=arguments.get('cwd'),
+                env=arguments.get('env'),
+                limits=limits,
+                replicas=int(arguments.get('replicas', 1)),
+                balance=arguments.get('balance', 'least-outstanding'),
+                hedge=arguments.get('hedge', 'off'),
             )
             return [types.TextContent(type="text", text=f"Server '{arguments['name']}' connected successfully")]
         
@@ -96,19 +559,104 @@ async def handle_call_tool(name: str, arguments: Dict) -> list[types.TextContent
                 if not servers:
                     return [types.TextContent(type="text", text="No servers connected")]
                 
-                # Return list of servers
-                return [types.TextContent(type="text", text="\n".join(servers))]
+                # Return list of servers with their health
+                health = chained_client.server_health()
+                return [types.TextContent(type="text", text="\n".join(
+                    f"{server_name}: {format_health(health[server_name])}" if server_name in health else server_name
+                    for server_name in servers
+                ))]
                 
             except Exception as e:
                 logger.error(f"Error listing servers: {e}")
                 return [types.TextContent(type="text", text=f"Error listing servers: {e}")]
         
+        elif name == "invalidate-cache":
+            if chained_client.result_cache is None:
+                return [types.TextContent(type="text", text="Result cache is not enabled")]
+            dropped = chained_client.result_cache.invalidate(arguments.get('server'), arguments.get('tool'))
+            return [types.TextContent(type="text", text=f"Dropped {dropped} cached results")]
+
+        elif name == "cache-stats":
+            stats = {"collapsed_calls": chained_client.collapsed_calls}
+            if chained_client.result_cache is not None:
+                stats.update(chained_client.result_cache.stats())
+            return [types.TextContent(type="text", text="\n".join(f"{key}: {value}" for key, value in stats.items()))]
+
+        elif name == "get-metrics":
+            if arguments.get('format') == "prometheus":
+                return [types.TextContent(type="text", text=metrics.prometheus_text())]
+            snapshot = metrics.snapshot()
+            if arguments.get('spans'):
+                snapshot["spans"] = tracer.recent(int(arguments['spans']))
+            return [types.TextContent(type="text", text=json.dumps(snapshot))]
+
+        elif name == "reload-config":
+            changes = await reload_config()
+            return [types.TextContent(type="text", text=json.dumps(changes))]
+
+        elif name == "run-pipeline":
+            from .pipeline import parse_pipeline, run_pipeline, sinks
+            steps = parse_pipeline(arguments.get('steps'))
+            outputs = await run_pipeline(steps, call_downstream)
+            wanted = arguments.get('outputs') or sinks(steps)
+            return [types.TextContent(type="text", text=json.dumps({step_id: outputs[step_id] for step_id in wanted}))]
+
+        elif chained_client.connected_servers:
+            return await call_downstream(name, arguments, progress=progress_forwarder(), raw=raw)
+
         else:
             raise ValueError(f"Unknown tool: {name}")
 
     except Exception as e:
         logger.exception(f"Error in call_tool: {e}")
-        return [types.TextContent(type="text", text=str(e))]
+        metrics.inc("mcp_tool_errors_total", tool=tool_label(name))
+        return ResultContent([types.TextContent(type="text", text=str(e))], isError=True)
+
+# Progress token the client sent with the tool call being handled
+_progress_token: contextvars.ContextVar = contextvars.ContextVar("progress_token", default=None)
+
+def request_progress_token(params: Any) -> Optional[Any]:
+    """The progressToken of a request's _meta.
+
+    Some SDK versions keep _meta as a private attribute that validation never
+    fills in, so the raw field is read from the extra fields as well.
+    """
+    meta = getattr(params, "meta", None) or getattr(params, "_meta", None)
+    if meta is None:
+        meta = (getattr(params, "model_extra", None) or {}).get("_meta")
+    if isinstance(meta, dict):
+        return meta.get("progressToken")
+    return getattr(meta, "progressToken", None)
+
+def progress_forwarder():
+    """A callback passing downstream progress on to the client, if it asked for progress"""
+    token = _progress_token.get()
+    if token is None:
+        return None
+    session = server_instance.request_context.session
+
+    async def forward(progress: float, total: Optional[float]):
+        await session.send_progress_notification(token, progress, total)
+    return forward
+
+async def _call_tool_request(req: types.CallToolRequest) -> types.ServerResult:
+    reset = _progress_token.set(request_progress_token(req.params))
+    try:
+        content = await handle_call_tool(req.params.name, req.params.arguments or {}, raw=True)
+    except Exception as e:
+        return types.ServerResult(types.CallToolResult(content=[types.TextContent(type="text", text=str(e))],
+                                                       isError=True))
+    finally:
+        _progress_token.reset(reset)
+    if any(isinstance(item, dict) for item in content):
+        # Forwarded as the downstream server sent it; the session only serializes the result
+        return PassthroughResult.model_construct(content=list(content), isError=is_error(content))
+    return types.ServerResult(types.CallToolResult(content=list(content), isError=is_error(content),
+                                                   **result_meta(content)))
+
+# Replaces the decorator's handler, so handle_call_tool can see the progress token and
+# forward downstream results without validating them into content models
+server_instance.request_handlers[types.CallToolRequest] = _call_tool_request
 
 async def handle_initialize(options: Optional[Dict] = None) -> dict:
     """Handle initialize request from client.
@@ -172,34 +720,150 @@ async def handle_ping(params: Any = None) -> dict:
     """
     return {}
 
-async def main():
-    """Main server entry point"""
+def tool_label(name: str) -> str:
+    """The metrics label of a called tool name.
+
+    Names come from the client, so only those of known tools become labels;
+    any other name would add a series of its own.
+    """
+    if name in GATEWAY_TOOLS or (_chained_client is not None and _chained_client.knows_tool(name)):
+        return name
+    return UNKNOWN_TOOL
+
+def _instrumented(handler):
+    """Time a request handler and count its errors, under a span for the request"""
+    async def handle(req):
+        method = req.method
+        tool = req.params.name if isinstance(req, types.CallToolRequest) else None
+        metrics.add_gauge("mcp_requests_in_flight", 1, method=method)
+        started = time.perf_counter()
+        try:
+            with tracer.span(method, **({"tool": tool} if tool else {})):
+                return await handler(req)
+        except Exception:
+            metrics.inc("mcp_request_errors_total", method=method)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.add_gauge("mcp_requests_in_flight", -1, method=method)
+            metrics.observe("mcp_request_seconds", elapsed, method=method)
+            if tool is not None:
+                metrics.observe("mcp_tool_call_seconds", elapsed, tool=tool_label(tool))
+    return handle
+
+def _session_tracked(handler):
+    """Make the session a request comes from known to ``subscriptions``, so it hears of list changes"""
+    async def handle(req):
+        context = request_ctx.get(None)
+        if context is not None and not _shared_notes:
+            subscriptions.connect(context.session)
+        return await handler(req)
+    return handle
+
+# Every handler is registered by now
+for _request_type, _handler in list(server_instance.request_handlers.items()):
+    server_instance.request_handlers[_request_type] = _instrumented(_session_tracked(_handler))
+
+def create_initialization_options() -> server.InitializationOptions:
+    capabilities = server_instance.get_capabilities(
+        notification_options=server.NotificationOptions(resources_changed=True),
+        experimental_capabilities={}
+    )
+    # The SDK always reports subscribe=False, even with a subscribe handler registered.
+    # Change notifications only reach sessions of the worker that made the change,
+    # so workers offer neither.
+    capabilities.resources.subscribe = not _shared_notes
+    capabilities.resources.listChanged = not _shared_notes
+    return server.InitializationOptions(
+        server_name="notes-server",
+        server_version="0.1.0",
+        capabilities=capabilities
+    )
+
+async def main(transport: str = "stdio",
+               host: str = "127.0.0.1",
+               port: int = 8000,
+               max_sessions: Optional[int] = None,
+               max_message_bytes: Optional[int] = None,
+               keepalive: float = 15.0,
+               config: Optional[str] = None):
+    """Main server entry point
+    
+    Args:
+        transport: "stdio" serves a single client over stdin/stdout; "sse"
+                   serves any number of clients over HTTP from this process
+        host, port: Address the sse transport listens on
+        max_sessions: Maximum number of concurrent sse sessions
+        max_message_bytes: Maximum size of a message posted to the sse transport
+        keepalive: Seconds between pings on idle sse streams
+        config: Gateway config file of downstream servers to connect
+                (default MCP_GATEWAY_CONFIG), connected in the background
+    """
     logger.info("Starting NotesServer")
     try:
-        initialization_options = server.InitializationOptions(
-            server_name="notes-server",
-            server_version="0.1.0",
-            capabilities=server_instance.get_capabilities(
-                notification_options=server.NotificationOptions(),
-                experimental_capabilities={}
-            )
-        )
+        initialization_options = create_initialization_options()
+        start_warm_pool()
+        start_config(config)
+        start_metrics_export()
 
-        async with stdio_server() as (read_stream, write_stream):
-            logger.info("Server running with stdio transport")
-            await server_instance.run(
-                read_stream=read_stream, 
-                write_stream=write_stream,
-                initialization_options=initialization_options,
-                ping_handler=handle_ping
+        if transport == "sse":
+            from .transport import serve_sse
+            await serve_sse(
+                server_instance,
+                initialization_options,
+                host=host,
+                port=port,
+                max_sessions=max_sessions,
+                max_message_bytes=max_message_bytes,
+                keepalive=keepalive
             )
+        else:
+            async with stdio_server() as (read_stream, write_stream):
+                logger.info("Server running with stdio transport")
+                await server_instance.run(
+                    read_stream=read_stream, 
+                    write_stream=write_stream,
+                    initialization_options=initialization_options
+                )
     except Exception as e:
         logger.exception(f"Error in main: {e}")
         raise
+    finally:
+        await stop_config()
+        await stop_metrics_export()
+        await subscriptions.close()
+        if _chained_client is not None:
+            await _chained_client.close()
+        if _note_service is not None:
+            _note_service.close()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="mcp-client-and-server", description="MCP notes server and chaining gateway")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-sessions", type=int, default=None, help="maximum concurrent sse sessions")
+    parser.add_argument("--max-message-bytes", type=int, default=1 << 20, help="maximum size of a posted sse message")
+    parser.add_argument("--keepalive", type=float, default=15.0, help="seconds between pings on idle sse streams")
+    parser.add_argument("--workers", type=int, default=1, help="processes serving the sse transport")
+    parser.add_argument("--config", default=None, help="JSON file of downstream servers to connect at startup")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.transport != "sse":
+        parser.error("--workers needs --transport sse")
+    return args
 
-def run_server():
+def run_server(argv: Optional[List[str]] = None):
     """Entry point for the package"""
-    asyncio.run(main())
+    options = vars(parse_args(argv))
+    workers = options.pop("workers")
+    if workers > 1:
+        from .workers import serve_workers
+        options.pop("transport")
+        serve_workers(workers, **options)
+    else:
+        asyncio.run(main(**options))
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    run_server()
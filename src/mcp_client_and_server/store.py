@@ -0,0 +1,781 @@
+"""Storage backends for notes.
+
+Every backend is a ``MutableMapping[str, str]`` from note name to content, so
+the server can use any of them like the plain dict it started out with, and
+reports how much memory its notes take up with ``memory_report``.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .index import NameTable
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "batch", "os")
+
+SNAPSHOT_FILE = "notes.snap"
+LOG_FILE = "notes.wal"
+# The log a compaction is folding into the next snapshot
+PREVIOUS_LOG_FILE = "notes.wal.prev"
+
+# magic, format version, generation
+_LOG_HEADER = struct.Struct("<4sBQ")
+_LOG_MAGIC = b"NWAL"
+# crc32, op, name length, content length
+_RECORD_HEADER = struct.Struct("<IBII")
+_OP_PUT = 1
+_OP_DELETE = 2
+# A group of put/delete records, applied entirely or not at all on recovery
+_OP_BATCH = 3
+
+# magic, format version, generation, note count, names length, contents length
+_SNAPSHOT_HEADER = struct.Struct("<4sBQQQQ")
+_SNAPSHOT_MAGIC = b"NSNP"
+_FORMAT_VERSION = 1
+
+# Flags of a note in the compact store
+_COMPRESSED = 1
+
+
+def _report(backend: str, notes: int, total: int, **details) -> Dict[str, Any]:
+    return {"backend": backend, "notes": notes, "bytes": total,
+            "bytes_per_note": round(total / notes, 1) if notes else None, **details}
+
+
+class NoteStore(MutableMapping):
+    """Base class for note storage backends."""
+
+    def write_batch(self, changes: List[Tuple[str, Optional[str]]]) -> None:
+        """Apply (name, content) changes together; a content of None deletes the note.
+
+        Names that are missing are not deleted, and no change is made unless every change is valid.
+        """
+        for name, _ in changes:
+            if "\0" in name:
+                raise ValueError("Note names must not contain NUL characters")
+        for name, content in changes:
+            if content is not None:
+                self[name] = content
+            elif name in self:
+                del self[name]
+
+    def name_table(self) -> Optional[NameTable]:
+        """The table numbering this store's notes, if the store keeps one for the indexes to share"""
+        return None
+
+    def when_durable(self, callback: Callable[[], None]) -> bool:
+        """Arrange for ``callback`` to run once every write so far is as durable as the fsync policy makes it.
+
+        Returns False, arranging nothing, if the writes already are; otherwise
+        the callback runs later from another thread and must not block.
+        """
+        return False
+
+    def wait_durable(self) -> None:
+        """Block until every write so far is as durable as the fsync policy makes it"""
+        durable = threading.Event()
+        if self.when_durable(durable.set):
+            durable.wait()
+
+    def flush(self) -> None:
+        """Make every write so far durable"""
+
+    def close(self) -> None:
+        """Flush and release any resources held by the store"""
+        self.flush()
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Bytes of process memory the notes take up, in total and per note"""
+        total = sys.getsizeof(self) + sum(sys.getsizeof(name) + sys.getsizeof(content)
+                                          for name, content in self.items())
+        return _report("memory", len(self), total)
+
+
+class MemoryNoteStore(dict, NoteStore):
+    """Notes kept only in process memory; lost on restart."""
+
+
+class CompactNoteStore(NoteStore):
+    """Notes kept in process memory in a few flat buffers instead of two objects each.
+
+    Names are numbered by a ``NameTable``, which keeps them as UTF-8 in one
+    byte arena, and contents are appended to a second arena with their
+    offsets and lengths in typed arrays indexed by note number. Per note that
+    costs about 50 bytes besides the text, where a dict of strings spends
+    about 120. The name and search indexes share the name table, so they hold
+    note numbers instead of name strings.
+
+    Contents of ``compress_min`` bytes or more are stored zlib-compressed when
+    that makes them smaller; the most recently read of them are kept
+    decompressed in an LRU of up to ``hot_chars`` characters. Space left
+    behind by updates and deletes is reclaimed by repacking the buffers once
+    it outgrows the live notes.
+    """
+
+    def __init__(self, compress_min: int = 512, hot_chars: int = 8 << 20, compress_level: int = 6):
+        self.compress_min = compress_min
+        self.hot_chars = hot_chars
+        self.compress_level = compress_level
+        self._names = NameTable()
+        self._names.listen(self._renumber)
+        self._reset()
+
+    def _reset(self):
+        self._contents = bytearray()
+        self._content_offsets = array("Q")
+        self._content_lengths = array("I")
+        self._flags = array("B")
+        self._compressed = 0
+        # Arena bytes of replaced contents and deleted notes
+        self._garbage = 0
+        # note number -> decompressed content
+        self._hot: "OrderedDict[int, str]" = OrderedDict()
+        self._hot_size = 0
+
+    def name_table(self) -> NameTable:
+        return self._names
+
+    def _pack(self, content: str) -> Tuple[bytes, int]:
+        data = content.encode("utf-8", "surrogatepass")
+        if len(data) >= self.compress_min:
+            packed = zlib.compress(data, self.compress_level)
+            if len(packed) < len(data):
+                return packed, _COMPRESSED
+        return data, 0
+
+    def _content(self, number: int) -> str:
+        offset = self._content_offsets[number]
+        data = self._contents[offset:offset + self._content_lengths[number]]
+        if not self._flags[number] & _COMPRESSED:
+            return data.decode("utf-8", "surrogatepass")
+        content = self._hot.get(number)
+        if content is not None:
+            self._hot.move_to_end(number)
+            return content
+        content = zlib.decompress(data).decode("utf-8", "surrogatepass")
+        if len(content) <= self.hot_chars:
+            self._hot[number] = content
+            self._hot_size += len(content)
+            while self._hot_size > self.hot_chars:
+                self._hot_size -= len(self._hot.popitem(last=False)[1])
+        return content
+
+    def _forget(self, number: int):
+        """Drop the content of a note: from the hot set, and as garbage in the arena"""
+        content = self._hot.pop(number, None)
+        if content is not None:
+            self._hot_size -= len(content)
+        if self._flags[number] & _COMPRESSED:
+            self._compressed -= 1
+        self._garbage += self._content_lengths[number]
+
+    def _store_content(self, number: int, content: str):
+        data, flags = self._pack(content)
+        self._content_offsets[number] = len(self._contents)
+        self._content_lengths[number] = len(data)
+        self._flags[number] = flags
+        self._contents += data
+        if flags & _COMPRESSED:
+            self._compressed += 1
+
+    def _maybe_repack(self):
+        if self._garbage > max(1 << 20, len(self._contents) - self._garbage):
+            self._repack()
+
+    def _repack(self):
+        """Copy the live contents into a fresh arena; note numbers stay the same"""
+        contents, offsets, lengths = self._contents, self._content_offsets, self._content_lengths
+        packed = bytearray()
+        for number in self._names.numbers():
+            offset = offsets[number]
+            offsets[number] = len(packed)
+            packed += contents[offset:offset + lengths[number]]
+        self._contents = packed
+        self._garbage = 0
+
+    def _renumber(self, mapping: array):
+        """Move the content entries of live notes to their new numbers"""
+        entries = (self._content_offsets, self._content_lengths, self._flags)
+        moved = [array(values.typecode) for values in entries]
+        for old in range(len(mapping)):
+            if mapping[old] >= 0:
+                for values, new in zip(entries, moved):
+                    new.append(values[old])
+        self._content_offsets, self._content_lengths, self._flags = moved
+        self._hot = OrderedDict((mapping[number], content) for number, content in self._hot.items())
+
+    def __getitem__(self, name: str) -> str:
+        number = self._names.number(name)
+        if number < 0:
+            raise KeyError(name)
+        return self._content(number)
+
+    def __setitem__(self, name: str, content: str) -> None:
+        number, added = self._names.add(name)
+        if not added:
+            self._forget(number)
+        elif number == len(self._flags):
+            self._content_offsets.append(0)
+            self._content_lengths.append(0)
+            self._flags.append(0)
+        self._store_content(number, content)
+        self._maybe_repack()
+
+    def __delitem__(self, name: str) -> None:
+        number = self._names.number(name)
+        if number < 0:
+            raise KeyError(name)
+        self._forget(number)
+        self._names.remove(name)
+        self._maybe_repack()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._reset()
+
+    def memory_report(self) -> Dict[str, Any]:
+        buffers = {
+            "name_bytes": self._names.memory_bytes(),
+            "content_bytes": sys.getsizeof(self._contents),
+            "index_bytes": sum(sys.getsizeof(values) for values in (
+                self._content_offsets, self._content_lengths, self._flags)),
+            "hot_bytes": sys.getsizeof(self._hot) + sum(sys.getsizeof(content) for content in self._hot.values()),
+        }
+        return _report("compact", len(self), sum(buffers.values()), **buffers,
+                       garbage_bytes=self._garbage, compressed_notes=self._compressed,
+                       hot_notes=len(self._hot))
+
+
+class LogNoteStore(NoteStore):
+    """Notes persisted as a compacted snapshot plus an append-only log.
+
+    Writes are appended to ``notes.wal``. Once the log holds ``compact_after``
+    records it is folded into a new ``notes.snap`` by a background thread:
+    the write that crosses the threshold only moves the log aside to
+    ``notes.wal.prev`` and starts a new one, and a later write swaps in the
+    finished snapshot. Recovery only replays the records written since the
+    last snapshot. The snapshot is memory-mapped: opening it only builds the
+    name index, and note contents are decoded from the mapping when read.
+
+    ``fsync`` selects the durability policy:
+
+    - ``"always"``: fsync after every write.
+    - ``"batch"``: group commit; writes are fsynced together once
+      ``batch_size`` of them are pending or ``batch_interval`` seconds after
+      the first pending write, whichever comes first. By default the flush
+      thread fsyncs as soon as it can, and writes made during one fsync share
+      the next. A write returns before its fsync, so callers acknowledging
+      writes wait for it with ``when_durable`` or ``wait_durable``, as the
+      notes service and server do.
+    - ``"os"``: never fsync and let the OS write pages back.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 fsync: str = "batch",
+                 batch_size: int = 256,
+                 batch_interval: float = 0.0,
+                 compact_after: int = 100_000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.compact_after = compact_after
+
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._log_path = os.path.join(directory, LOG_FILE)
+        self._previous_log_path = os.path.join(directory, PREVIOUS_LOG_FILE)
+        self._generation = 0
+        self._snapshot_map: Optional[mmap.mmap] = None
+        self._snapshot_index: Dict[str, int] = {}
+        self._snapshot_offsets = array("Q")
+        self._snapshot_base = 0
+        # Changes since the snapshot; None marks a deleted note
+        self._overlay: Dict[str, Optional[str]] = {}
+        # The overlay a background compaction is folding into the next snapshot, under _overlay
+        self._frozen: Optional[Dict[str, Optional[str]]] = None
+        self._compactor: Optional[threading.Thread] = None
+        self._compacted: Optional[tuple] = None
+        self._count = 0
+        self._log_fd = -1
+        self._log_records = 0
+
+        self._sync_lock = threading.Lock()
+        self._pending = 0
+        # Records appended and records covered by an fsync, over the life of the store
+        self._written = 0
+        self._synced = 0
+        # (records appended when asked, callback) waiting for an fsync
+        self._durable_callbacks: List[Tuple[int, Callable[[], None]]] = []
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+
+        self._use_snapshot(self._open_snapshot())
+        self._recover_log()
+        if fsync == "batch":
+            self._flusher = threading.Thread(target=self._flush_loop, name="notes-group-commit", daemon=True)
+            self._flusher.start()
+
+    # Loading and recovery
+
+    def _open_snapshot(self) -> Optional[tuple]:
+        """Map the snapshot file; returns its mapping, name index, offsets, contents base, generation and count"""
+        if not os.path.exists(self._snapshot_path):
+            return None
+        with open(self._snapshot_path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation, count, names_length, _ = _SNAPSHOT_HEADER.unpack_from(mapping)
+        if magic != _SNAPSHOT_MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"{self._snapshot_path} is not a notes snapshot")
+
+        position = _SNAPSHOT_HEADER.size
+        names = mapping[position:position + names_length].decode() if count else ""
+        position += names_length
+        offsets = array("Q")
+        offsets.frombytes(mapping[position:position + 8 * (count + 1)])
+        position += 8 * (count + 1)
+        index = dict(zip(names.split("\0"), range(count))) if count else {}
+        return mapping, index, offsets, position, generation, count
+
+    def _use_snapshot(self, snapshot: Optional[tuple]):
+        if snapshot is None:
+            return
+        if self._snapshot_map is not None:
+            self._snapshot_map.close()
+        (self._snapshot_map, self._snapshot_index, self._snapshot_offsets, self._snapshot_base,
+         self._generation, _) = snapshot
+
+    def _read_log(self, path: str) -> Tuple[int, int]:
+        """Replay a log written after the snapshot; returns the end of its last whole record and the records replayed.
+
+        The end is -1 if the log is missing, empty or already folded into the snapshot.
+        """
+        if not os.path.exists(path):
+            return -1, 0
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _LOG_HEADER.size:
+            return -1, 0
+        magic, version, generation = _LOG_HEADER.unpack_from(data)
+        if magic != _LOG_MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"{path} is not a notes log")
+        if generation < self._generation:
+            # Already folded into the snapshot; the process died before restarting the log
+            return -1, 0
+        self._generation = generation
+
+        position = _LOG_HEADER.size
+        end = len(data)
+        replayed = 0
+        while position + _RECORD_HEADER.size <= end:
+            crc, op, name_length, content_length = _RECORD_HEADER.unpack_from(data, position)
+            body_start = position + _RECORD_HEADER.size
+            body_end = body_start + name_length + content_length
+            if body_end > end or zlib.crc32(data[position + 4:body_end]) != crc:
+                break
+            if op == _OP_BATCH:
+                replayed += self._replay_batch(data, body_start + name_length, body_end)
+            else:
+                self._replay_record(op, data, body_start, name_length, body_end)
+                replayed += 1
+            position = body_end
+
+        if position != end:
+            logger.warning(f"Discarding {end - position} bytes of incomplete log records")
+        return position, replayed
+
+    def _recover_log(self):
+        """Replay the log written after the snapshot and drop any torn record.
+
+        A log moved aside by a compaction that did not finish is replayed
+        first, then folded into a new snapshot.
+        """
+        self._count = len(self._snapshot_index)
+        previous, replayed = self._read_log(self._previous_log_path)
+        position, records = self._read_log(self._log_path)
+        if position < 0:
+            self._start_log()
+        else:
+            self._log_fd = os.open(self._log_path, os.O_WRONLY)
+            os.ftruncate(self._log_fd, position)
+            os.lseek(self._log_fd, position, os.SEEK_SET)
+            self._log_records = records
+        logger.info(f"Recovered {self._count} notes, replayed {replayed + records} log records")
+        if previous >= 0:
+            self.compact()
+        elif os.path.exists(self._previous_log_path):
+            os.unlink(self._previous_log_path)
+
+    def _replay_record(self, op: int, data: bytes, body_start: int, name_length: int, body_end: int):
+        name = data[body_start:body_start + name_length].decode()
+        if op == _OP_PUT:
+            self._apply_put(name, data[body_start + name_length:body_end].decode())
+        else:
+            self._apply_delete(name)
+
+    def _replay_batch(self, data: bytes, position: int, end: int) -> int:
+        """Apply the records inside a batch, whose checksum was already verified as a whole"""
+        records = 0
+        while position < end:
+            _, op, name_length, content_length = _RECORD_HEADER.unpack_from(data, position)
+            body_start = position + _RECORD_HEADER.size
+            body_end = body_start + name_length + content_length
+            self._replay_record(op, data, body_start, name_length, body_end)
+            records += 1
+            position = body_end
+        return records
+
+    def _start_log(self):
+        """Atomically replace the log with an empty one for the current generation"""
+        if self._log_fd >= 0:
+            os.close(self._log_fd)
+        temporary = self._log_path + ".tmp"
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.write(fd, _LOG_HEADER.pack(_LOG_MAGIC, _FORMAT_VERSION, self._generation))
+        os.fsync(fd)
+        os.replace(temporary, self._log_path)
+        self._sync_directory()
+        self._log_fd = fd
+        self._log_records = 0
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # In-memory state
+
+    def _snapshot_value(self, position: int) -> str:
+        start = self._snapshot_base + self._snapshot_offsets[position]
+        end = self._snapshot_base + self._snapshot_offsets[position + 1]
+        return self._snapshot_map[start:end].decode()
+
+    def _below_overlay(self, name: str) -> bool:
+        """Whether the note exists in the frozen overlay or the snapshot, ignoring the overlay"""
+        if self._frozen is not None and name in self._frozen:
+            return self._frozen[name] is not None
+        return name in self._snapshot_index
+
+    def _exists(self, name: str) -> bool:
+        if name in self._overlay:
+            return self._overlay[name] is not None
+        return self._below_overlay(name)
+
+    def _apply_put(self, name: str, content: str):
+        if not self._exists(name):
+            self._count += 1
+        self._overlay[name] = content
+
+    def _apply_delete(self, name: str):
+        if self._exists(name):
+            self._count -= 1
+        if self._below_overlay(name):
+            self._overlay[name] = None
+        else:
+            self._overlay.pop(name, None)
+
+    # Durability
+
+    def _append(self, record: bytes, records: int = 1):
+        os.write(self._log_fd, record)
+        self._log_records += records
+        # Only counted once written, so an fsync that reads the count covers them
+        self._written += records
+        if self.fsync == "always":
+            os.fsync(self._log_fd)
+        elif self.fsync == "batch":
+            with self._sync_lock:
+                self._pending += records
+                if self._pending >= self.batch_size:
+                    self._sync()
+                else:
+                    self._wake.set()
+
+    def _sync(self):
+        """fsync the log and run the callbacks it satisfies; caller holds _sync_lock"""
+        if self._pending:
+            written = self._written
+            os.fsync(self._log_fd)
+            self._pending = 0
+            self._synced = written
+        if self._durable_callbacks:
+            ready = [callback for mark, callback in self._durable_callbacks if mark <= self._synced]
+            self._durable_callbacks = [(mark, callback) for mark, callback in self._durable_callbacks
+                                       if mark > self._synced]
+            for callback in ready:
+                callback()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                break
+            # Let a group of writes gather before paying for one fsync
+            if self.batch_interval:
+                time.sleep(self.batch_interval)
+            with self._sync_lock:
+                if self._log_fd >= 0:
+                    self._sync()
+
+    def when_durable(self, callback: Callable[[], None]) -> bool:
+        if self.fsync != "batch":
+            return False
+        with self._sync_lock:
+            if self._synced >= self._written:
+                return False
+            self._durable_callbacks.append((self._written, callback))
+            self._wake.set()
+            return True
+
+    def flush(self) -> None:
+        if self._log_fd < 0:
+            return
+        with self._sync_lock:
+            self._pending = max(self._pending, 1)
+            self._sync()
+
+    @staticmethod
+    def _encode(op: int, name: str, content: Union[str, bytes] = "") -> bytes:
+        name_bytes = name.encode()
+        content_bytes = content if isinstance(content, bytes) else content.encode()
+        body = struct.pack("<BII", op, len(name_bytes), len(content_bytes)) + name_bytes + content_bytes
+        return struct.pack("<I", zlib.crc32(body)) + body
+
+    # Compaction
+
+    def _write_snapshot(self, notes: Iterable[Tuple[str, str]], generation: int):
+        """Write ``notes`` to a new snapshot file and durably replace the current one"""
+        names = []
+        offsets = array("Q", [0])
+        temporary = self._snapshot_path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(b"\0" * _SNAPSHOT_HEADER.size)
+            # Contents go to a side file first so names and offsets can precede them
+            with open(temporary + ".contents", "w+b") as contents:
+                for name, content in notes:
+                    if "\0" in name:
+                        raise ValueError(f"Note name {name!r} contains a NUL character")
+                    names.append(name)
+                    data = content.encode()
+                    contents.write(data)
+                    offsets.append(offsets[-1] + len(data))
+                names_blob = "\0".join(names).encode()
+                f.write(names_blob)
+                f.write(offsets.tobytes())
+                contents.seek(0)
+                while chunk := contents.read(1 << 20):
+                    f.write(chunk)
+            os.unlink(temporary + ".contents")
+            f.seek(0)
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _FORMAT_VERSION, generation,
+                                          len(names), len(names_blob), offsets[-1]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._snapshot_path)
+        self._sync_directory()
+
+    @staticmethod
+    def _folded(snapshot: tuple, frozen: Dict[str, Optional[str]]) -> Iterator[Tuple[str, str]]:
+        """The notes of a snapshot with an overlay applied on top"""
+        mapping, index, offsets, base = snapshot
+        for name, position in index.items():
+            if name in frozen:
+                content = frozen[name]
+                if content is not None:
+                    yield name, content
+            else:
+                yield name, mapping[base + offsets[position]:base + offsets[position + 1]].decode()
+        for name, content in frozen.items():
+            if content is not None and name not in index:
+                yield name, content
+
+    def _compact_in_background(self, snapshot: tuple, frozen: Dict[str, Optional[str]], generation: int):
+        try:
+            self._write_snapshot(self._folded(snapshot, frozen), generation)
+            self._compacted = self._open_snapshot()
+        except Exception:
+            logger.exception("Background compaction failed; the next one runs in the foreground")
+
+    def _maybe_compact(self):
+        self._finish_compaction()
+        if self._log_records < self.compact_after or self._compactor is not None:
+            return
+        if os.path.exists(self._previous_log_path):
+            # Left behind by a failed background compaction, so fold everything in at once
+            self.compact()
+            return
+        with self._sync_lock:
+            self._pending = max(self._pending, 1)
+            self._sync()
+            os.close(self._log_fd)
+            self._log_fd = -1
+            os.replace(self._log_path, self._previous_log_path)
+            self._generation += 1
+            self._start_log()
+            self._pending = 0
+        snapshot = (self._snapshot_map, self._snapshot_index, self._snapshot_offsets, self._snapshot_base)
+        self._frozen, self._overlay = self._overlay, {}
+        self._compactor = threading.Thread(target=self._compact_in_background,
+                                           args=(snapshot, self._frozen, self._generation),
+                                           name="notes-compaction", daemon=True)
+        self._compactor.start()
+
+    def _finish_compaction(self, wait: bool = False):
+        """Swap in the snapshot of a background compaction once it is written"""
+        if self._compactor is None or (self._compactor.is_alive() and not wait):
+            return
+        self._compactor.join()
+        self._compactor = None
+        snapshot, self._compacted = self._compacted, None
+        frozen, self._frozen = self._frozen, None
+        if snapshot is None:
+            # The moved-aside log still holds the frozen changes; keep them under the overlay
+            for name, content in frozen.items():
+                self._overlay.setdefault(name, content)
+            return
+        self._use_snapshot(snapshot)
+        os.unlink(self._previous_log_path)
+        logger.info(f"Compacted {len(self._snapshot_index)} notes into snapshot generation {self._generation}")
+
+    def compact(self) -> None:
+        """Write every live note to a new snapshot and restart the log, in the calling thread"""
+        self._finish_compaction(wait=True)
+        with self._sync_lock:
+            self._pending = max(self._pending, 1)
+            self._sync()
+        generation = self._generation + 1
+        self._write_snapshot(self.items(), generation)
+        self._use_snapshot(self._open_snapshot())
+        self._overlay = {}
+        with self._sync_lock:
+            self._pending = 0
+            self._start_log()
+        if os.path.exists(self._previous_log_path):
+            os.unlink(self._previous_log_path)
+        logger.info(f"Compacted {self._count} notes into snapshot generation {generation}")
+
+    # MutableMapping interface
+
+    def __getitem__(self, name: str) -> str:
+        if name in self._overlay:
+            content = self._overlay[name]
+            if content is None:
+                raise KeyError(name)
+            return content
+        if self._frozen is not None and name in self._frozen:
+            content = self._frozen[name]
+            if content is None:
+                raise KeyError(name)
+            return content
+        return self._snapshot_value(self._snapshot_index[name])
+
+    def __setitem__(self, name: str, content: str) -> None:
+        if "\0" in name:
+            raise ValueError("Note names must not contain NUL characters")
+        self._append(self._encode(_OP_PUT, name, content))
+        self._apply_put(name, content)
+        self._maybe_compact()
+
+    def __delitem__(self, name: str) -> None:
+        if not self._exists(name):
+            raise KeyError(name)
+        self._append(self._encode(_OP_DELETE, name))
+        self._apply_delete(name)
+        self._maybe_compact()
+
+    def write_batch(self, changes: List[Tuple[str, Optional[str]]]) -> None:
+        """Log the changes as one checksummed record, so one write and at most one fsync cover them all"""
+        records = []
+        for name, content in changes:
+            if "\0" in name:
+                raise ValueError("Note names must not contain NUL characters")
+            # Replaying a delete of a missing note does nothing, so every delete can be logged
+            records.append(self._encode(_OP_PUT if content is not None else _OP_DELETE, name, content or ""))
+        if not records:
+            return
+        self._append(self._encode(_OP_BATCH, "", b"".join(records)), records=len(records))
+        for name, content in changes:
+            if content is not None:
+                self._apply_put(name, content)
+            else:
+                self._apply_delete(name)
+        self._maybe_compact()
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._exists(name)
+
+    def __iter__(self) -> Iterator[str]:
+        # Each name comes from the lowest layer that has it, if it still exists on top
+        frozen = self._frozen or {}
+        for name in self._snapshot_index:
+            if self._exists(name):
+                yield name
+        for name in list(frozen):
+            if name not in self._snapshot_index and self._exists(name):
+                yield name
+        for name, content in list(self._overlay.items()):
+            if content is not None and name not in self._snapshot_index and name not in frozen:
+                yield name
+
+    def __len__(self) -> int:
+        return self._count
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Heap bytes of the overlay and name index; snapshot contents are mapped from the file"""
+        overlay = sum(sys.getsizeof(layer) + sum(sys.getsizeof(name) + sys.getsizeof(content)
+                                                 for name, content in layer.items())
+                      for layer in (self._overlay, self._frozen or {}))
+        index = (sys.getsizeof(self._snapshot_index) + sys.getsizeof(self._snapshot_offsets)
+                 + sum(sys.getsizeof(name) + sys.getsizeof(position)
+                       for name, position in self._snapshot_index.items()))
+        return _report("log", self._count, overlay + index, overlay_bytes=overlay, index_bytes=index,
+                       mapped_bytes=len(self._snapshot_map) if self._snapshot_map is not None else 0)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._finish_compaction(wait=True)
+        self.flush()
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        os.close(self._log_fd)
+        self._log_fd = -1
+        if self._snapshot_map is not None:
+            self._snapshot_map.close()
+            self._snapshot_map = None
+
+
+def open_store(path: Optional[str] = None, fsync: str = "batch", compact: bool = False) -> NoteStore:
+    """Open the log-backed store in directory ``path``, or an in-memory one, compact if asked for"""
+    if not path:
+        return CompactNoteStore() if compact else MemoryNoteStore()
+    return LogNoteStore(path, fsync=fsync)
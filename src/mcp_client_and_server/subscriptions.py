@@ -0,0 +1,89 @@
+"""Resource subscriptions and debounced change notifications.
+
+Writes report the notes they changed to a ``SubscriptionHub``, which gathers
+changes for ``debounce`` seconds and then tells each session once:
+``notifications/resources/updated`` for every URI it subscribed to that
+changed, and a single ``notifications/resources/list_changed`` if notes were
+added or removed. list_changed goes to every live session, subscribed or
+not, as the server advertises it to all of them. A bulk import therefore
+costs each session a handful of notifications instead of one per note.
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import Iterable, Optional, Set
+
+from pydantic import AnyUrl
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionHub:
+    """URIs each session is subscribed to, and the changes not yet announced to them"""
+
+    def __init__(self, list_uri: str, debounce: float = 0.05):
+        self.list_uri = list_uri
+        self.debounce = debounce
+        # Sessions are dropped with the connection they belong to
+        self._sessions: "weakref.WeakSet[object]" = weakref.WeakSet()
+        self._subscriptions: "weakref.WeakKeyDictionary[object, Set[str]]" = weakref.WeakKeyDictionary()
+        self._changed: Set[str] = set()
+        self._list_changed = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self.notifications_sent = 0
+
+    def connect(self, session) -> None:
+        """Track a live session, so it hears of list changes"""
+        self._sessions.add(session)
+
+    def subscribe(self, session, uri: str) -> None:
+        self._sessions.add(session)
+        self._subscriptions.setdefault(session, set()).add(uri)
+
+    def unsubscribe(self, session, uri: str) -> None:
+        uris = self._subscriptions.get(session)
+        if uris is not None:
+            uris.discard(uri)
+
+    def subscriptions(self, session) -> Set[str]:
+        return set(self._subscriptions.get(session, ()))
+
+    def changed(self, uris: Iterable[str], list_changed: bool = False) -> None:
+        """Record changed resources; sessions hear about them after the debounce delay"""
+        if not self._sessions:
+            return
+        self._changed.update(uris)
+        if list_changed:
+            self._list_changed = True
+            self._changed.add(self.list_uri)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(), name="mcp-resource-notifications")
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Announce every change recorded so far"""
+        changed, self._changed = self._changed, set()
+        list_changed, self._list_changed = self._list_changed, False
+        for session in list(self._sessions):
+            uris = self._subscriptions.get(session, set())
+            try:
+                for uri in sorted(changed & uris):
+                    await session.send_resource_updated(AnyUrl(uri))
+                    self.notifications_sent += 1
+                if list_changed:
+                    await session.send_resource_list_changed()
+                    self.notifications_sent += 1
+            except Exception as e:
+                # The client went away; its subscriptions go with it
+                logger.debug(f"Dropping a closed session: {e}")
+                self._sessions.discard(session)
+                self._subscriptions.pop(session, None)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
@@ -0,0 +1,156 @@
+"""HTTP (Server-Sent Events) transport for serving many client sessions from one process.
+
+Every session runs the same ``mcp.server.Server`` instance, so all of them
+share the notes store and the downstream connection pool.
+"""
+
+import logging
+import socket
+from contextlib import asynccontextmanager
+from typing import Optional, Sequence
+
+import anyio
+import mcp.server as server
+from mcp.server.sse import SseServerTransport
+from sse_starlette import EventSourceResponse
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+SSE_PATH = "/sse"
+MESSAGES_PATH = "/messages/"
+
+
+class GatewaySseTransport(SseServerTransport):
+    """SSE transport that forgets a session once its stream is closed.
+
+    The base class never removes finished sessions from its registry, which
+    would grow without bound in a long-lived multi-session process.
+    """
+
+    @asynccontextmanager
+    async def connect_sse(self, scope, receive, send):
+        async with super().connect_sse(scope, receive, send) as (read_stream, write_stream):
+            try:
+                yield read_stream, write_stream
+            finally:
+                for session_id, writer in list(self._read_stream_writers.items()):
+                    if writer._state is read_stream._state:
+                        del self._read_stream_writers[session_id]
+                        await writer.aclose()
+
+
+class _AsgiEndpoint:
+    """Serve a Route with a raw ASGI callable.
+
+    Starlette wraps plain functions as request/response handlers, but the SSE
+    handlers write their responses themselves.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self.handler(scope, receive, send)
+
+
+def create_sse_app(app: server.Server,
+                   initialization_options: server.InitializationOptions,
+                   max_sessions: Optional[int] = None,
+                   max_message_bytes: Optional[int] = None,
+                   messages_path: str = MESSAGES_PATH,
+                   routes: Sequence[Route] = ()) -> Starlette:
+    """Build a Starlette app serving ``app`` over SSE.
+
+    ``max_sessions`` caps concurrently open sessions (further connections get
+    HTTP 503) and ``max_message_bytes`` caps the size of a posted message
+    (HTTP 413). Clients post their messages to ``messages_path``; ``routes``
+    are served after the SSE routes.
+    """
+    sse = GatewaySseTransport(messages_path)
+    active_sessions = 0
+
+    async def handle_sse(scope: Scope, receive: Receive, send: Send):
+        nonlocal active_sessions
+        if max_sessions is not None and active_sessions >= max_sessions:
+            logger.warning(f"Refusing SSE session: {active_sessions} sessions open")
+            return await Response("Too many sessions", status_code=503)(scope, receive, send)
+
+        disconnected = anyio.Event()
+
+        async def receive_until_disconnect():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            return message
+
+        active_sessions += 1
+        logger.info(f"SSE session opened ({active_sessions} active)")
+        try:
+            async with sse.connect_sse(scope, receive_until_disconnect, send) as (read_stream, write_stream):
+                async with anyio.create_task_group() as tg:
+                    async def close_on_disconnect():
+                        await disconnected.wait()
+                        tg.cancel_scope.cancel()
+
+                    tg.start_soon(close_on_disconnect)
+                    await app.run(read_stream, write_stream, initialization_options)
+                    tg.cancel_scope.cancel()
+        finally:
+            active_sessions -= 1
+            logger.info(f"SSE session closed ({active_sessions} active)")
+
+    async def handle_messages(scope: Scope, receive: Receive, send: Send):
+        if max_message_bytes is not None:
+            length = Headers(scope=scope).get("content-length")
+            if length is not None and int(length) > max_message_bytes:
+                return await Response("Message too large", status_code=413)(scope, receive, send)
+        await sse.handle_post_message(scope, receive, send)
+
+    return Starlette(routes=[
+        Route(SSE_PATH, endpoint=_AsgiEndpoint(handle_sse), methods=["GET"]),
+        Route(messages_path, endpoint=_AsgiEndpoint(handle_messages), methods=["POST"]),
+        *routes,
+    ])
+
+
+async def serve_sse(app: server.Server,
+                    initialization_options: server.InitializationOptions,
+                    host: str = "127.0.0.1",
+                    port: int = 8000,
+                    max_sessions: Optional[int] = None,
+                    max_message_bytes: Optional[int] = None,
+                    keepalive: float = 15.0,
+                    sockets: Optional[Sequence[socket.socket]] = None,
+                    messages_path: str = MESSAGES_PATH,
+                    routes: Sequence[Route] = ()):
+    """Serve ``app`` over SSE until cancelled.
+
+    ``keepalive`` is the interval, in seconds, of pings on idle SSE streams
+    and how long idle HTTP connections are kept open for the next POST.
+    Connections are accepted on ``sockets`` if given, instead of on a new
+    socket bound to ``host`` and ``port``.
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        raise RuntimeError("The sse transport needs uvicorn: pip install 'mcp-client-and-server[http]'")
+
+    # The SDK builds the SSE response itself, so the ping interval is set on the class
+    EventSourceResponse.DEFAULT_PING_INTERVAL = keepalive
+    starlette_app = create_sse_app(app, initialization_options, max_sessions, max_message_bytes,
+                                   messages_path=messages_path, routes=routes)
+    config = uvicorn.Config(
+        starlette_app,
+        host=host,
+        port=port,
+        timeout_keep_alive=int(keepalive),
+        log_level="warning",
+    )
+    if sockets is None:
+        logger.info(f"Server running with SSE transport on http://{host}:{port}{SSE_PATH}")
+    await uvicorn.Server(config).serve(sockets=sockets)
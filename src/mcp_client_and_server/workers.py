@@ -0,0 +1,185 @@
+"""Multi-process worker mode for the sse transport.
+
+The parent process binds the listening socket, starts a manager process that
+owns the notes store and the registry of downstream servers, and spawns
+worker processes that all accept connections on the shared socket. Each
+worker decodes, validates and encodes messages on its own core and reaches
+the shared state through manager proxies. Downstream servers are started by
+every worker from the shared registry, so any worker can route any tool call.
+
+An SSE session lives in the worker that accepted its stream, but the POSTs
+carrying its messages may be accepted by any worker. Each worker therefore
+hands out a messages path naming itself, ``/workers/<n>/messages/``, and
+forwards POSTs meant for another worker over that worker's UNIX socket.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+from multiprocessing.managers import BaseManager
+from typing import Optional
+
+from .client import ServerRegistry
+from .notes import NoteService
+from .store import open_store
+
+logger = logging.getLogger(__name__)
+
+WORKER_MESSAGES_PATH = "/workers/{}/messages/"
+
+# Shared state, only set inside the manager process
+_note_service: Optional[NoteService] = None
+_server_registry: Optional[ServerRegistry] = None
+
+
+def _init_shared_state(path: Optional[str], fsync: str, compact: bool = False):
+    global _note_service, _server_registry
+    # Ctrl-C reaches the whole process group; the parent closes the store and stops the manager
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Each worker call is served on its own manager thread, which can wait for the group commit
+    _note_service = NoteService(open_store(path, fsync=fsync, compact=compact), durable_writes=True)
+    _server_registry = ServerRegistry()
+
+
+def _get_note_service() -> NoteService:
+    return _note_service
+
+
+def _get_server_registry() -> ServerRegistry:
+    return _server_registry
+
+
+class SharedStateManager(BaseManager):
+    """Serves the notes and server registry shared by all workers"""
+
+
+SharedStateManager.register("note_service", callable=_get_note_service)
+SharedStateManager.register("server_registry", callable=_get_server_registry)
+
+
+def _worker_socket(socket_dir: str, index: int) -> str:
+    return os.path.join(socket_dir, f"worker-{index}.sock")
+
+
+def _run_worker(index: int, listener: socket.socket, socket_dir: str, workers: int, address, options: dict):
+    manager = SharedStateManager(address=address)
+    manager.connect()
+    from . import server
+    server.use_shared_state(manager.note_service(), manager.server_registry())
+    asyncio.run(_serve_worker(index, listener, socket_dir, workers, options))
+
+
+async def _serve_worker(index: int, listener: socket.socket, socket_dir: str, workers: int, options: dict):
+    import httpx
+    from starlette.requests import Request
+    from starlette.responses import Response
+    from starlette.routing import Route
+
+    from . import server
+    from .transport import serve_sse
+
+    peers = {}
+    options = dict(options)
+    config = options.pop("config", None)
+    max_message_bytes = options.get("max_message_bytes")
+
+    async def forward(request: Request) -> Response:
+        """Pass a message on to the worker that holds its session"""
+        worker = request.path_params["worker"]
+        if not 0 <= worker < workers:
+            return Response("Unknown worker", status_code=404)
+        length = request.headers.get("content-length")
+        if max_message_bytes is not None and length is not None and int(length) > max_message_bytes:
+            return Response("Message too large", status_code=413)
+
+        client = peers.get(worker)
+        if client is None:
+            transport = httpx.AsyncHTTPTransport(uds=_worker_socket(socket_dir, worker))
+            client = peers[worker] = httpx.AsyncClient(transport=transport)
+        response = await client.post(
+            f"http://worker{request.url.path}",
+            params=request.query_params,
+            content=await request.body(),
+            headers={"content-type": request.headers.get("content-type", "application/json")},
+        )
+        return Response(response.content, status_code=response.status_code,
+                        media_type=response.headers.get("content-type"))
+
+    local = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    local.bind(_worker_socket(socket_dir, index))
+    local.listen(128)
+    server.start_warm_pool()
+    server.start_config(config)
+    server.start_metrics_export(worker=index)
+    try:
+        await serve_sse(
+            server.server_instance,
+            server.create_initialization_options(),
+            sockets=[listener, local],
+            messages_path=WORKER_MESSAGES_PATH.format(index),
+            routes=[Route(WORKER_MESSAGES_PATH.format("{worker:int}"), forward, methods=["POST"])],
+            **options,
+        )
+    finally:
+        await server.stop_config()
+        await server.stop_metrics_export()
+        for client in peers.values():
+            await client.aclose()
+        if server._chained_client is not None:
+            await server._chained_client.close()
+        local.close()
+
+
+def serve_workers(workers: int,
+                  host: str = "127.0.0.1",
+                  port: int = 8000,
+                  max_sessions: Optional[int] = None,
+                  max_message_bytes: Optional[int] = None,
+                  keepalive: float = 15.0,
+                  config: Optional[str] = None):
+    """Serve the sse transport from ``workers`` processes until interrupted.
+
+    ``max_sessions`` applies to each worker. Every worker applies the gateway
+    ``config``; the shared registry keeps their servers the same.
+    """
+    context = multiprocessing.get_context("spawn")
+    manager = SharedStateManager(ctx=context)
+    manager.start(_init_shared_state, (os.environ.get("MCP_NOTES_PATH"), os.environ.get("MCP_NOTES_FSYNC", "batch"),
+                                       os.environ.get("MCP_NOTES_COMPACT", "0") not in ("", "0")))
+    listener = socket.create_server((host, port), backlog=2048)
+    socket_dir = tempfile.mkdtemp(prefix="mcp-workers-")
+    options = dict(max_sessions=max_sessions, max_message_bytes=max_message_bytes, keepalive=keepalive,
+                   config=config)
+    processes = [
+        context.Process(target=_run_worker, name=f"mcp-worker-{index}",
+                        args=(index, listener, socket_dir, workers, manager.address, options))
+        for index in range(workers)
+    ]
+
+    # Let a plain kill shut the workers down too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.start()
+        logger.info(f"Server running with SSE transport on http://{host}:{port}/sse in {workers} workers")
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process.pid is not None:
+                process.join()
+        manager.note_service().close()
+        manager.shutdown()
+        listener.close()
+        shutil.rmtree(socket_dir, ignore_errors=True)
@@ -0,0 +1,110 @@
+"""Minimal downstream MCP server used by the chaining client tests.
+
+Run as ``python tests/fake_server.py [--list-delay SECONDS] [--read-only] [--accept-cancellations] [tool-name ...]``;
+every listed tool echoes its arguments back as JSON text, along with a count
+of calls so far. Defaults to a single ``echo`` tool; ``--read-only`` annotates
+the tools with ``readOnlyHint``. With ``--accept-cancellations``,
+``notifications/cancelled`` messages are recorded rather than passed to the
+SDK, which does not know them and drops the connection without the flag;
+calling a tool with ``{"report_cancelled": true}`` adds the cancelled request
+ids to its output, and ``{"exit": true}`` makes the process exit. Calling a tool with ``{"add_tool": name}`` registers another
+tool and sends ``notifications/tools/list_changed``. ``{"progress": n}`` sends
+n progress notifications first, if the call carried a progress token.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, List
+
+import anyio
+
+import mcp.types as types
+import mcp.server as server
+from mcp.server.stdio import stdio_server
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--list-delay", type=float, default=0.0)
+parser.add_argument("--read-only", action="store_true")
+parser.add_argument("--accept-cancellations", action="store_true")
+parser.add_argument("tools", nargs="*")
+options = parser.parse_args()
+tool_names = options.tools or ["echo"]
+calls = 0
+cancelled: List[int] = []
+# request id -> progress token, read from the raw request since the SDK drops _meta
+progress_tokens: Dict[int, object] = {}
+
+server_instance = server.Server("fake-server")
+
+
+@server_instance.list_tools()
+async def handle_list_tools() -> List[types.Tool]:
+    if options.list_delay:
+        await asyncio.sleep(options.list_delay)
+    return [
+        types.Tool(
+            name=name,
+            description=f"Echo arguments back ({name})",
+            inputSchema={"type": "object"},
+            **({"annotations": {"readOnlyHint": True}} if options.read_only else {}),
+        )
+        for name in tool_names
+    ]
+
+
+@server_instance.call_tool()
+async def handle_call_tool(name: str, arguments: Dict) -> List[types.TextContent]:
+    global calls
+    calls += 1
+    if name not in tool_names:
+        raise ValueError(f"Unknown tool: {name}")
+    if arguments.get("exit"):
+        os._exit(1)
+    if arguments.get("fail"):
+        raise ValueError(f"{name} failed")
+    if arguments.get("sleep"):
+        await asyncio.sleep(float(arguments["sleep"]))
+    token = progress_tokens.pop(server_instance.request_context.request_id, None)
+    if arguments.get("progress") and token is not None:
+        for step in range(1, arguments["progress"] + 1):
+            await server_instance.request_context.session.send_progress_notification(
+                token, step, arguments["progress"])
+    if arguments.get("add_tool"):
+        tool_names.append(arguments["add_tool"])
+        await server_instance.request_context.session.send_tool_list_changed()
+    output = {"tool": name, "arguments": arguments, "calls": calls}
+    if arguments.get("report_cancelled"):
+        output["cancelled"] = cancelled
+    return [types.TextContent(type="text", text=json.dumps(output))]
+
+
+async def record_cancellations(read_stream, writer):
+    async with writer:
+        async for message in read_stream:
+            root = getattr(message, "root", None)
+            if getattr(root, "method", None) == "notifications/cancelled" and options.accept_cancellations:
+                cancelled.append(root.params["requestId"])
+            else:
+                meta = (getattr(root, "params", None) or {}).get("_meta") or {}
+                if "progressToken" in meta:
+                    progress_tokens[root.id] = meta["progressToken"]
+                await writer.send(message)
+
+
+async def main():
+    async with stdio_server() as (read_stream, write_stream):
+        writer, reader = anyio.create_memory_object_stream(0)
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(record_cancellations, read_stream, writer)
+            await server_instance.run(
+                reader,
+                write_stream,
+                server_instance.create_initialization_options(),
+            )
+            tg.cancel_scope.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,36 @@
+"""Downstream MCP server running the SDK unmodified, for behaviour the fake server would hide.
+
+Run as ``python tests/plain_server.py``; its ``sleep`` tool waits
+``{"seconds": n}`` and then answers "slept". Every message goes straight to
+the SDK, so notifications it does not know end the connection as they would
+for any server built on it.
+"""
+
+import asyncio
+from typing import Dict, List
+
+import mcp.types as types
+import mcp.server as server
+from mcp.server.stdio import stdio_server
+
+server_instance = server.Server("plain-server")
+
+
+@server_instance.list_tools()
+async def handle_list_tools() -> List[types.Tool]:
+    return [types.Tool(name="sleep", description="Sleep, then answer", inputSchema={"type": "object"})]
+
+
+@server_instance.call_tool()
+async def handle_call_tool(name: str, arguments: Dict) -> List[types.TextContent]:
+    await asyncio.sleep(float(arguments.get("seconds", 0)))
+    return [types.TextContent(type="text", text="slept")]
+
+
+async def main():
+    async with stdio_server() as (read_stream, write_stream):
+        await server_instance.run(read_stream, write_stream, server_instance.create_initialization_options())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
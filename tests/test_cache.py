@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+import mcp.types as types
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.cache import ResultCache, cache_key, parse_tool_ttls
+
+
+def text(value: str):
+    return [types.TextContent(type="text", text=value)]
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    """Test that the cache stays under its byte bound by evicting the least recently used results."""
+    entry_size = len(text("x" * 100)[0].model_dump_json())
+    cache = ResultCache(max_bytes=3 * entry_size)
+    for name in "abc":
+        cache.put(cache_key("s", "t", {"name": name}), text("x" * 100), ttl=60)
+    assert cache.get(cache_key("s", "t", {"name": "a"})) is not None
+
+    cache.put(cache_key("s", "t", {"name": "d"}), text("x" * 100), ttl=60)
+    assert cache.get(cache_key("s", "t", {"name": "b"})) is None
+    assert cache.get(cache_key("s", "t", {"name": "a"})) is not None
+    assert cache.stats() == {"entries": 3, "bytes": 3 * entry_size, "hits": 2, "misses": 1, "evictions": 1}
+
+    # A result larger than the whole cache is not kept
+    cache.put(cache_key("s", "t", {"name": "e"}), text("x" * 1000), ttl=60)
+    assert len(cache) == 3
+
+
+def test_cache_entries_expire():
+    """Test that results are only served for their tool's TTL."""
+    cache = ResultCache(tool_ttls=parse_tool_ttls("s:fast=0.05, slow=60"))
+    assert cache.ttl_for("s", "fast") == 0.05
+    assert cache.ttl_for("other", "slow") == 60
+    assert cache.ttl_for("s", "unlisted") is None
+
+    key = cache_key("s", "fast", {})
+    cache.put(key, text("result"), cache.ttl_for("s", "fast"))
+    assert cache.get(key)[0].text == "result"
+    time.sleep(0.06)
+    assert cache.get(key) is None
+    assert len(cache) == 0
@@ -0,0 +1,657 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server import client as client_module
+from src.mcp_client_and_server.cache import ResultCache
+from src.mcp_client_and_server.client import (CallLimits, MCPChainedClient, ReplicaGroup, ServerOverloadedError,
+                                               ServerRegistry)
+from src.mcp_client_and_server.health import CircuitOpenError, ServerHealth
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_server.py")
+PLAIN_SERVER = os.path.join(os.path.dirname(__file__), "plain_server.py")
+
+
+def fake_server_command(*tools):
+    return [sys.executable, FAKE_SERVER, *tools]
+
+
+@pytest.mark.asyncio
+async def test_connection_is_reused_across_calls():
+    """Test that repeated connects to the same command reuse one live process."""
+    client = MCPChainedClient()
+    try:
+        first = await client.connect_server("fake", fake_server_command())
+        second = await client.connect_server("fake", fake_server_command())
+        assert first is second
+        assert await client.list_servers() == ["fake"]
+
+        content = await client.call_tool("fake:echo", {"value": 1})
+        assert json.loads(content[0].text) == {"tool": "echo", "arguments": {"value": 1}, "calls": 1}
+        content = await client.call_tool("fake:echo", {"value": 2})
+        assert json.loads(content[0].text)["arguments"] == {"value": 2}
+    finally:
+        await client.close()
+    assert await client.list_servers() == []
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_server_is_evicted():
+    """Test that connecting past max_servers closes the least recently used idle server."""
+    client = MCPChainedClient(max_servers=2)
+    try:
+        first = await client.connect_server("first", fake_server_command())
+        await client.connect_server("second", fake_server_command())
+        # Touch "first" so that "second" becomes the eviction candidate
+        await client.call_tool("first:echo", {})
+        await client.connect_server("third", fake_server_command())
+
+        assert await client.list_servers() == ["first", "third"]
+        assert first.alive
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_reaps_process():
+    """Test that disconnecting a server stops its connection."""
+    client = MCPChainedClient()
+    connection = await client.connect_server("fake", fake_server_command())
+    await client.disconnect_server("fake")
+
+    assert not connection.alive
+    assert await client.list_servers() == []
+    with pytest.raises(ValueError):
+        await client.call_tool("fake:echo", {})
+
+
+@pytest.mark.asyncio
+async def test_server_exiting_during_startup_fails_the_connect():
+    """Test that a process exiting before the handshake fails the connect instead of hanging it."""
+    client = MCPChainedClient()
+    try:
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(client.connect_server("gone", [sys.executable, "-c", "pass"]), 10)
+        assert await client.list_servers() == []
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_prefixed_and_cached_without_mutation():
+    """Test that repeated listings keep single prefixes and reuse the cached catalog."""
+    client = MCPChainedClient()
+    try:
+        await client.connect_server("a", fake_server_command("echo"))
+        await client.connect_server("b", fake_server_command("echo", "other"))
+
+        first = await client.list_tools()
+        second = await client.list_tools()
+        assert sorted(tool.name for tool in first) == ["a:echo", "b:echo", "b:other"]
+        assert [tool.name for tool in second] == [tool.name for tool in first]
+        assert [tool.name for tool in await client.list_tools("b")] == ["echo", "other"]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_server_yields_partial_catalog():
+    """Test that a server missing the list timeout is reported instead of blocking the catalog."""
+    client = MCPChainedClient(list_timeout=0.5)
+    try:
+        await client.connect_server("fast", fake_server_command())
+        await client.connect_server("slow", fake_server_command("--list-delay", "2"))
+
+        catalog = await client.get_catalog()
+        assert [tool.name for tool in catalog.tools] == ["fast:echo"]
+        assert list(catalog.errors) == ["slow"]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_partial_catalog_is_kept_until_the_failed_server_is_retried(monkeypatch):
+    """Test that a server that failed to list is not waited on again by every call, only after its backoff."""
+    monkeypatch.setattr(client_module, "LIST_RETRY_DELAY", 0.5)
+    client = MCPChainedClient(list_timeout=0.3)
+    try:
+        await client.connect_server("fast", fake_server_command())
+        await client.connect_server("slow", fake_server_command("--list-delay", "2"))
+        catalog = await client.get_catalog()
+
+        started = time.monotonic()
+        assert await client.get_catalog() is catalog
+        content = await client.call_tool("echo", {"value": 1})
+        assert json.loads(content[0].text)["arguments"] == {"value": 1}
+        assert time.monotonic() - started < 0.2
+
+        await asyncio.sleep(0.5)
+        retried = await client.get_catalog()
+        assert retried is not catalog and list(retried.errors) == ["slow"]
+        # Failing again doubles the wait before the next attempt
+        assert client._list_failures["slow"][2] == 2
+        assert await client.get_catalog() is retried
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_gateway_reports_servers_missing_from_the_tool_listing():
+    """Test that tools/list and list-servers through the gateway name a server whose tools could not be listed."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    import src.mcp_client_and_server.server as server_module
+
+    server_module._chained_client = MCPChainedClient(list_timeout=0.5)
+    try:
+        async with create_connected_server_and_client_session(server_module.server_instance) as session:
+            await session.call_tool("connect-server", {"name": "fast", "command": fake_server_command()})
+            await session.call_tool("connect-server", {"name": "slow",
+                                                       "command": fake_server_command("--list-delay", "2")})
+            result = await session.list_tools()
+            assert [tool.name for tool in result.tools] == ["fast:echo"]
+            assert result.model_dump(by_alias=True)["_meta"] == {"unavailableServers": {"slow": "timed out"}}
+
+            servers = (await session.call_tool("list-servers", {})).content[0].text.split("\n")
+            assert "tools not listed" not in servers[0]
+            assert servers[1].startswith("slow: ") and servers[1].endswith("tools not listed: timed out")
+    finally:
+        await server_module._chained_client.close()
+        server_module._chained_client = None
+
+
+@pytest.mark.asyncio
+async def test_list_changed_notification_invalidates_catalog():
+    """Test that tools/list_changed from a downstream server refreshes the catalog."""
+    client = MCPChainedClient(catalog_ttl=None)
+    try:
+        await client.connect_server("fake", fake_server_command())
+        assert [tool.name for tool in await client.list_tools()] == ["fake:echo"]
+
+        await client.call_tool("fake:echo", {"add_tool": "added"})
+        for _ in range(50):
+            if client._catalog is None:
+                break
+            await asyncio.sleep(0.01)
+        assert [tool.name for tool in await client.list_tools()] == ["fake:echo", "fake:added"]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_unprefixed_calls_follow_routing_policy():
+    """Test that unprefixed tool names are routed by the configured conflict policy."""
+    client = MCPChainedClient(routing_policy="priority", server_priority=["b"])
+    try:
+        await client.connect_server("a", fake_server_command("shared", "only-a"))
+        await client.connect_server("b", fake_server_command("shared"))
+
+        assert await client.resolve_tool("shared") == ("b", "shared")
+        assert await client.resolve_tool("only-a") == ("a", "only-a")
+        assert await client.resolve_tool("a:shared") == ("a", "shared")
+        with pytest.raises(ValueError, match="not found"):
+            await client.resolve_tool("missing")
+
+        client.routing_policy = "reject"
+        client.invalidate_tools()
+        with pytest.raises(ValueError, match="several servers"):
+            await client.call_tool("shared", {})
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_unprefixed_tool_error_is_not_retried_elsewhere():
+    """Test that a failing tool reports its own error instead of falling through to other servers."""
+    client = MCPChainedClient()
+    try:
+        await client.connect_server("a", fake_server_command("shared"))
+        await client.connect_server("b", fake_server_command("shared"))
+
+        content = await client.call_tool("shared", {"fail": True})
+        assert content[0].text == "shared failed"
+        assert content.isError
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pools_sharing_a_registry_follow_each_other():
+    """Test that connects and disconnects through one pool are mirrored by another sharing its registry."""
+    registry = ServerRegistry()
+    first = MCPChainedClient(registry=registry)
+    second = MCPChainedClient(registry=registry)
+    try:
+        await first.connect_server("fake", fake_server_command())
+        await second.sync_registry()
+        content = await second.call_tool("fake:echo", {"value": 1})
+        assert json.loads(content[0].text)["arguments"] == {"value": 1}
+
+        await first.disconnect_server("fake")
+        await second.sync_registry()
+        assert await second.list_servers() == []
+    finally:
+        await first.close()
+        await second.close()
+
+
+class SlowRegistryProxy:
+    """Stands in for a manager proxy: every call blocks like a round trip to another process"""
+
+    def __init__(self):
+        self.registry = ServerRegistry()
+        self.version_calls = 0
+        self.threads = set()
+
+    def _round_trip(self):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.05)
+
+    def version(self):
+        self._round_trip()
+        self.version_calls += 1
+        return self.registry.version()
+
+    def snapshot(self):
+        self._round_trip()
+        return self.registry.snapshot()
+
+    def register(self, name, options):
+        self._round_trip()
+        self.registry.register(name, options)
+
+    def unregister(self, name):
+        self._round_trip()
+        self.registry.unregister(name)
+
+
+@pytest.mark.asyncio
+async def test_proxied_registry_is_called_off_the_event_loop():
+    """Test that a registry in another process is reached from threads, with concurrent checks sharing one call."""
+    proxy = SlowRegistryProxy()
+    client = MCPChainedClient(registry=proxy)
+    try:
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.gather(*(client.sync_registry() for _ in range(10)))
+        ticker.cancel()
+        # The loop kept running while the calls were waiting
+        assert ticks >= 3
+        assert proxy.version_calls == 1
+        assert threading.get_ident() not in proxy.threads
+
+        await client.connect_server("fake", fake_server_command())
+        assert "fake" in proxy.registry.snapshot()[1]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_annotated_tools_are_served_from_the_result_cache():
+    """Test that read-only tools are cached per argument set and configured TTLs override annotations."""
+    cache = ResultCache(tool_ttls={"plain:echo": 60, "annotated:uncached": 0}, annotated_ttl=60)
+    client = MCPChainedClient(result_cache=cache)
+    try:
+        await client.connect_server("annotated", fake_server_command("--read-only", "echo", "uncached"))
+        await client.connect_server("plain", fake_server_command())
+        # Annotations come from the listing, which calls do not wait for
+        await client.get_catalog()
+
+        first = await client.call_tool("annotated:echo", {"a": 1, "b": 2})
+        again = await client.call_tool("annotated:echo", {"b": 2, "a": 1})
+        assert again[0].text == first[0].text
+        other = await client.call_tool("annotated:echo", {"a": 2})
+        assert json.loads(other[0].text)["calls"] == 2
+
+        await client.call_tool("annotated:uncached", {})
+        assert json.loads((await client.call_tool("annotated:uncached", {}))[0].text)["calls"] == 4
+
+        await client.call_tool("plain:echo", {})
+        assert json.loads((await client.call_tool("plain:echo", {}))[0].text)["calls"] == 1
+        assert cache.hits == 2
+
+        await client.call_tool("plain:echo", {"fail": True})
+        assert len(cache) == 3
+        assert cache.invalidate(server_name="annotated") == 2
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_downstream_call():
+    """Test that concurrent identical calls to a read-only tool are collapsed, errors included."""
+    client = MCPChainedClient()
+    try:
+        await client.connect_server("fake", fake_server_command("--read-only"))
+        await client.get_catalog()
+        results = await asyncio.gather(*(client.call_tool("fake:echo", {"sleep": 0.3}) for _ in range(5)))
+        assert {json.loads(content[0].text)["calls"] for content in results} == {1}
+        assert client.collapsed_calls == 4
+
+        results = await asyncio.gather(*(client.call_tool("fake:echo", {"sleep": 0.3, "fail": True}) for _ in range(3)))
+        assert [content[0].text for content in results] == ["echo failed"] * 3
+        assert all(content.isError for content in results)
+        assert client.collapsed_calls == 6
+
+        # Calls with other arguments, or after the first finished, go downstream again
+        await client.call_tool("fake:echo", {"sleep": 0.3})
+        await asyncio.gather(client.call_tool("fake:echo", {"value": 1}), client.call_tool("fake:echo", {"value": 2}))
+        assert client.collapsed_calls == 6
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_do_not_wait_for_a_slow_tool_listing():
+    """Test that looking up a tool's annotations never puts a tools/list round trip in front of the call."""
+    client = MCPChainedClient(list_timeout=0.5)
+    try:
+        await client.connect_server("slow", fake_server_command("--read-only", "--list-delay", "2"))
+        for value in range(3):
+            started = time.monotonic()
+            content = await client.call_tool("slow:echo", {"value": value})
+            assert json.loads(content[0].text)["arguments"] == {"value": value}
+            assert time.monotonic() - started < 0.3
+        # Unlisted, the read-only tool is not known to be side-effect free, so calls are not coalesced
+        results = await asyncio.gather(*(client.call_tool("slow:echo", {"sleep": 0.1}) for _ in range(2)))
+        assert client.collapsed_calls == 0 and results[0][0].text != results[1][0].text
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_call_past_deadline_is_cancelled_downstream():
+    """Test that a call missing its deadline fails and, when enabled, is cancelled on the server."""
+    client = MCPChainedClient(call_limits=CallLimits(timeout=0.3), send_cancellations=True)
+    try:
+        await client.connect_server("fake", fake_server_command("--accept-cancellations"))
+        with pytest.raises(TimeoutError, match="timed out"):
+            await client.call_tool("fake:echo", {"sleep": 1})
+
+        # The fake server handles one request at a time, so this one waits for the abandoned call
+        content = await client.call_tool("fake:echo", {"report_cancelled": True}, timeout=5)
+        assert len(json.loads(content[0].text)["cancelled"]) == 1
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_leaves_plain_sdk_server_running():
+    """Test that by default a late call does not send a server on the pinned SDK a notification it dies on."""
+    client = MCPChainedClient(call_limits=CallLimits(timeout=0.3))
+    try:
+        connection = await client.connect_server("plain", [sys.executable, PLAIN_SERVER])
+        with pytest.raises(TimeoutError, match="timed out"):
+            await client.call_tool("plain:sleep", {"seconds": 1})
+        content = await client.call_tool("plain:sleep", {"seconds": 0}, timeout=5)
+        assert content[0].text == "slept"
+        assert connection.alive
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_full_wait_queue_rejects_calls():
+    """Test that calls beyond max_in_flight wait in a bounded queue and overflow is refused."""
+    client = MCPChainedClient()
+    try:
+        await client.connect_server("fake", fake_server_command(), limits=CallLimits(max_in_flight=1, max_queued=1))
+        first = asyncio.create_task(client.call_tool("fake:echo", {"sleep": 0.3, "n": 1}))
+        second = asyncio.create_task(client.call_tool("fake:echo", {"sleep": 0.3, "n": 2}))
+        await asyncio.sleep(0.1)
+        assert client.connected_servers["fake"].queued == 1
+        with pytest.raises(ServerOverloadedError, match="overloaded"):
+            await client.call_tool("fake:echo", {"n": 3})
+
+        assert [json.loads((await task)[0].text)["calls"] for task in (first, second)] == [1, 2]
+        await client.call_tool("fake:echo", {"n": 4})
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_crashed_server_is_restarted_by_health_monitor():
+    """Test that the health monitor restarts a server whose process died and tracks its health."""
+    client = MCPChainedClient(health_interval=0.1)
+    try:
+        await client.connect_server("fake", fake_server_command())
+        with pytest.raises(ConnectionError):
+            await client.call_tool("fake:echo", {"exit": True})
+
+        for _ in range(100):
+            health = client.server_health()["fake"]
+            if health["restarts"] == 1 and health["alive"]:
+                break
+            await asyncio.sleep(0.05)
+        assert health["restarts"] == 1 and health["alive"]
+
+        content = await client.call_tool("fake:echo", {})
+        assert json.loads(content[0].text)["calls"] == 1
+        await asyncio.sleep(0.3)
+        assert client.server_health()["fake"]["p50_ms"] is not None
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_stuck_restart_times_out_without_blocking_the_pool():
+    """Test that a restart whose process never completes the handshake neither holds the pool nor hangs."""
+    client = MCPChainedClient(start_timeout=3, health_interval=60)
+    try:
+        connection = await client.connect_server("fake", fake_server_command())
+        await connection.close()
+        # Reads its stdin until it is closed, without ever answering initialize
+        connection.command = [sys.executable, "-c", "import sys; sys.stdin.read()"]
+        restart = asyncio.create_task(client._restart("fake", connection))
+        await asyncio.sleep(0.1)
+
+        await asyncio.wait_for(client.connect_server("other", fake_server_command()), 2.5)
+        assert not restart.done()
+        await asyncio.wait_for(restart, 8)
+        assert "handshake" in connection.health.last_error
+        assert client.connected_servers["fake"] is connection
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_repeated_failures():
+    """Test that repeated timeouts open the circuit so calls fail fast until it half-opens."""
+    client = MCPChainedClient(call_limits=CallLimits(timeout=0.1), failure_threshold=2, reset_timeout=1.0)
+    try:
+        await client.connect_server("fake", fake_server_command())
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await client.call_tool("fake:echo", {"sleep": 0.3})
+        with pytest.raises(CircuitOpenError):
+            await client.call_tool("fake:echo", {})
+        assert client.server_health()["fake"]["circuit"] == "open"
+
+        await asyncio.sleep(1.0)
+        await client.call_tool("fake:echo", {})
+        assert client.server_health()["fake"]["circuit"] == "closed"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_replica_group_spreads_calls_across_replicas():
+    """Test that concurrent calls to a replicated server go to different replicas."""
+    client = MCPChainedClient()
+    try:
+        group = await client.connect_server("fake", fake_server_command(), replicas=3)
+        assert isinstance(group, ReplicaGroup)
+        results = await asyncio.gather(*(client.call_tool("fake:echo", {"sleep": 0.3, "n": n}) for n in range(3)))
+        assert [json.loads(content[0].text)["calls"] for content in results] == [1, 1, 1]
+        assert client.server_health()["fake"]["replicas"] == "3/3 up"
+
+        # Asking for the same group again keeps it
+        assert await client.connect_server("fake", fake_server_command(), replicas=3) is group
+    finally:
+        await client.close()
+
+
+class StubReplica:
+    """Stands in for a ServerConnection that answers after a fixed delay"""
+
+    def __init__(self, name: str, delay: float, in_flight: int = 0):
+        self.name = name
+        self.delay = delay
+        self.in_flight = in_flight
+        self.alive = True
+        self.health = ServerHealth()
+        self.cancelled = False
+
+    async def call_tool(self, tool_name, arguments, timeout=None, hedge=False, progress=None, cancel_downstream=True):
+        self.cancel_downstream = cancel_downstream
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.name
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_to_another_replica():
+    """Test that a call slower than the tool's p95 is sent again and the first answer wins."""
+    # The slow replica has fewer calls outstanding, so it is picked first
+    slow, fast = StubReplica("slow", delay=5.0), StubReplica("fast", delay=0.01, in_flight=1)
+    group = ReplicaGroup("fake", [slow, fast], hedge="all")
+    for _ in range(20):
+        group._record_latency("echo", 0.05)
+
+    assert await asyncio.wait_for(group.call_tool("echo", {}, hedge=True), 1.0) == "fast"
+    await asyncio.sleep(0)
+    assert slow.cancelled
+    assert (group.hedged_calls, group.hedge_wins) == (1, 1)
+    assert not slow.cancel_downstream and not fast.cancel_downstream
+
+
+@pytest.mark.asyncio
+async def test_hedge_loser_keeps_its_replica_connected():
+    """Test that abandoning the losing copy of a hedged call leaves that replica serving, even with cancellations on."""
+    client = MCPChainedClient(send_cancellations=True)
+    try:
+        group = await client.connect_server("plain", [sys.executable, PLAIN_SERVER], replicas=2, hedge="all")
+        for _ in range(20):
+            group._record_latency("sleep", 0.05)
+        content = await client.call_tool("plain:sleep", {"seconds": 0.5})
+        assert content[0].text == "slept"
+        assert group.hedged_calls == 1
+        await asyncio.sleep(0.6)
+        assert all(replica.alive for replica in group.replicas)
+        for replica in group.replicas:
+            assert (await replica.call_tool("sleep", {}, timeout=5)).content[0]["text"] == "slept"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_connect_takes_a_warm_process_and_refills_the_pool():
+    """Test that connecting to a warmed command reuses a started process and the pool refills."""
+    client = MCPChainedClient()
+    try:
+        await client.warm(fake_server_command(), size=1)
+        warm = client._warm[next(iter(client._warm))][0]
+
+        connection = await client.connect_server("fake", fake_server_command())
+        assert connection is warm and connection.name == "fake"
+        content = await client.call_tool("fake:echo", {})
+        assert json.loads(content[0].text)["calls"] == 1
+
+        # Joins the refill started by the connect
+        await client.warm(fake_server_command(), size=1)
+        assert client.warm_stats() == {"warm_idle": 1, "warm_hits": 1, "warm_misses": 0}
+
+        # Other commands still start cold
+        await client.connect_server("other", fake_server_command("--read-only"))
+        assert client.warm_stats()["warm_hits"] == 1
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_downstream_progress_is_passed_to_the_caller():
+    """Test that a call made with a progress callback receives the server's progress notifications."""
+    client = MCPChainedClient()
+    try:
+        await client.connect_server("fake", fake_server_command())
+        received = []
+
+        async def on_progress(progress, total):
+            received.append((progress, total))
+
+        content = await client.call_tool("fake:echo", {"progress": 3}, progress=on_progress)
+        assert json.loads(content[0].text)["arguments"] == {"progress": 3}
+        assert received == [(1, 3), (2, 3), (3, 3)]
+
+        # Without a callback no token is sent, so the server reports nothing
+        await client.call_tool("fake:echo", {"progress": 3})
+        assert len(received) == 3
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_passthrough_content_is_raw_only_for_callers_that_forward_it():
+    """Test that raw calls get the content as the server sent it, cached or not, and others get models."""
+    client = MCPChainedClient(result_cache=ResultCache(tool_ttls={"echo": 60}))
+    try:
+        await client.connect_server("fake", fake_server_command())
+        raw = await client.call_tool("fake:echo", {"value": 1}, raw=True)
+        assert raw[0]["type"] == "text"
+        assert json.loads(raw[0]["text"])["arguments"] == {"value": 1}
+
+        content = await client.call_tool("fake:echo", {"value": 1})
+        assert content[0].text == raw[0]["text"]
+        assert client.result_cache.hits == 1
+    finally:
+        await client.close()
+
+    client = MCPChainedClient(passthrough=False)
+    try:
+        await client.connect_server("fake", fake_server_command())
+        content = await client.call_tool("fake:echo", {}, raw=True)
+        assert json.loads(content[0].text)["tool"] == "echo"
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_gateway_forwards_the_error_flag_of_downstream_results():
+    """Test that a tool result the server flagged as an error reaches the gateway's client flagged too."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    import src.mcp_client_and_server.server as server_module
+
+    try:
+        async with create_connected_server_and_client_session(server_module.server_instance) as session:
+            await session.call_tool("connect-server", {"name": "fake", "command": fake_server_command()})
+            failed = await session.call_tool("fake:echo", {"fail": True})
+            assert failed.isError and failed.content[0].text == "echo failed"
+            succeeded = await session.call_tool("fake:echo", {"value": 1})
+            assert not succeeded.isError
+            assert (await session.call_tool("no-such-tool", {})).isError
+
+            # Downstream tools are metric labels once listed; other names never are
+            await session.list_tools()
+            assert [server_module.tool_label(name) for name in ("fake:echo", "echo", "fake:nope", "add-note")] == [
+                "fake:echo", "echo", "unknown", "add-note"]
+    finally:
+        if server_module._chained_client is not None:
+            await server_module._chained_client.close()
+        server_module._chained_client = None
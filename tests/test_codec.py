@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+import mcp.types as types
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.codec import PassthroughResult, content_models, decode_message
+
+
+def test_decoded_messages_match_validated_ones():
+    """Test that every kind of message decodes to what full validation would produce."""
+    lines = [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+         "params": {"name": "echo", "arguments": {"n": 1}, "_meta": {"progressToken": 1}}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "result": {"content": [{"type": "text", "text": "hi"}]}},
+        {"jsonrpc": "2.0", "id": 3, "error": {"code": -32601, "message": "Method not found"}},
+    ]
+    for line in lines:
+        text = json.dumps(line)
+        decoded = decode_message(text)
+        validated = types.JSONRPCMessage.model_validate_json(text)
+        assert type(decoded.root) is type(validated.root)
+        assert decoded.model_dump_json(by_alias=True, exclude_none=True) == \
+            validated.model_dump_json(by_alias=True, exclude_none=True)
+
+    with pytest.raises(Exception):
+        decode_message('{"jsonrpc": "2.0", "id": 4}')
+    with pytest.raises(ValueError):
+        decode_message("not json")
+
+
+def test_passthrough_results_serialize_like_validated_ones():
+    """Test that passthrough keeps content as sent, serializes like validated content, and converts on demand."""
+    sent = {"content": [{"type": "text", "text": "x" * 100},
+                        {"type": "image", "data": "aGk=", "mimeType": "image/png"},
+                        {"type": "resource", "resource": {"uri": "notes://a", "text": "A"}}],
+            "isError": False}
+    result = PassthroughResult.model_validate(sent)
+    assert result.content == sent["content"]
+    validated = types.CallToolResult.model_validate(sent)
+    assert result.model_dump(by_alias=True, mode="json", exclude_none=True) == \
+        validated.model_dump(by_alias=True, mode="json", exclude_none=True)
+
+    models = content_models(result.content)
+    assert [type(item) for item in models] == [types.TextContent, types.ImageContent, types.EmbeddedResource]
+    assert content_models(models) is models
+
+    with pytest.raises(Exception):
+        PassthroughResult.model_validate({"content": ["not an object"]})
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.client import CallLimits, MCPChainedClient
+from src.mcp_client_and_server.config import ConfigError, apply_config, parse_config
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_server.py")
+
+
+def test_config_parses_servers_and_rejects_mistakes():
+    """Test that commands, args, env and limits are read, and malformed entries are refused."""
+    config = parse_config({"max_parallel_connects": 2, "servers": {
+        "web": {"command": "uvx mcp-server-fetch", "args": ["--verbose"], "env": {"A": 1}},
+        "db": {"command": ["python", "db.py"], "replicas": 2, "limits": {"timeout": 5}},
+    }})
+    assert config.max_parallel_connects == 2
+    assert config.servers["web"].connect_options()["command"] == ["uvx", "mcp-server-fetch", "--verbose"]
+    assert config.servers["web"].connect_options()["env"] == {"A": "1"}
+    assert config.servers["db"].connect_options()["limits"] == {"timeout": 5}
+
+    for bad in ({"servers": {"x": {}}},
+                {"servers": {"x": {"command": "a", "port": 1}}},
+                {"servers": {"x": {"command": "a", "limits": {"rate": 1}}}},
+                {"servers": [], "max_parallel_connects": 1}):
+        with pytest.raises(ConfigError):
+            parse_config(bad)
+
+
+@pytest.mark.asyncio
+async def test_apply_connects_concurrently_and_reload_only_touches_changes():
+    """Test that servers start side by side and a reload keeps unchanged servers running."""
+    def servers(**specs):
+        return {"servers": {name: {"command": [sys.executable, FAKE_SERVER, *tools]} for name, tools in specs.items()}}
+
+    client = MCPChainedClient()
+    starting = []
+
+    async def watch():
+        while True:
+            starting.append(client._starting)
+            await asyncio.sleep(0.01)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        first = parse_config(servers(a=[], b=[], c=[]))
+        changes = await apply_config(client, first)
+        assert sorted(changes["connect"]) == ["a", "b", "c"] and not changes["failed"]
+        assert max(starting) == 3
+        a, b = client.connected_servers["a"], client.connected_servers["b"]
+
+        second = parse_config(servers(a=[], b=["other"], d=[]))
+        second.servers["a"] = first.servers["a"]
+        changes = await apply_config(client, second, first)
+        assert changes == {"connect": ["b", "d"], "disconnect": ["c"], "unchanged": ["a"], "failed": []}
+        assert client.connected_servers["a"] is a
+        assert client.connected_servers["b"] is not b and not b.alive
+        assert sorted(client.connected_servers) == ["a", "b", "d"]
+
+        broken = parse_config({"servers": {"bad": {"command": [sys.executable, "-c", "pass"]},
+                                           "a": {"command": [sys.executable, FAKE_SERVER],
+                                                 "limits": {"max_in_flight": 2}}}})
+        changes = await apply_config(client, broken, second)
+        assert changes["failed"] == ["bad"]
+        assert client.connected_servers["a"].limits == CallLimits(max_in_flight=2)
+        assert sorted(client.connected_servers) == ["a"]
+    finally:
+        watcher.cancel()
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_server_connects_config_in_background_and_reloads(tmp_path):
+    """Test that the server applies its config file at startup and on reload-config."""
+    import src.mcp_client_and_server.server as server_module
+
+    path = tmp_path / "gateway.json"
+    path.write_text(json.dumps({"servers": {"fake": {"command": [sys.executable, FAKE_SERVER]}}}))
+    try:
+        server_module.start_config(str(path))
+        await server_module._config_task
+        result = await server_module.handle_call_tool("fake:echo", {"value": 1})
+        assert json.loads(result[0].text)["arguments"] == {"value": 1}
+
+        path.write_text(json.dumps({"servers": {"other": {"command": [sys.executable, FAKE_SERVER, "ping"]}}}))
+        result = await server_module.handle_call_tool("reload-config", {})
+        assert json.loads(result[0].text) == {"connect": ["other"], "disconnect": ["fake"], "unchanged": [],
+                                              "failed": []}
+        assert await server_module.get_chained_client().list_servers() == ["other"]
+    finally:
+        await server_module.stop_config()
+        if server_module._chained_client is not None:
+            await server_module._chained_client.close()
+        server_module._chained_client = None
+        server_module._gateway_config = None
+        server_module._config_path = None
+
+
+@pytest.mark.asyncio
+async def test_sighup_reload_waits_for_the_startup_connect(tmp_path):
+    """Test that a reload signalled while the startup config connects runs after it, and stop_config stops both."""
+    import src.mcp_client_and_server.server as server_module
+
+    path = tmp_path / "gateway.json"
+    path.write_text(json.dumps({"servers": {"fake": {"command": [sys.executable, FAKE_SERVER]}}}))
+    try:
+        server_module.start_config(str(path))
+        startup = server_module._config_task
+        path.write_text(json.dumps({"servers": {"other": {"command": [sys.executable, FAKE_SERVER, "ping"]}}}))
+        server_module._reload_on_signal()
+        assert not startup.done()
+        assert await server_module._config_task == {"connect": ["other"], "disconnect": ["fake"], "unchanged": [],
+                                                    "failed": []}
+        assert startup.done() and not startup.cancelled()
+        assert await server_module.get_chained_client().list_servers() == ["other"]
+
+        server_module._reload_on_signal()
+        first = server_module._config_task
+        server_module._reload_on_signal()
+        await asyncio.sleep(0)
+        await server_module.stop_config()
+        assert first.done() and server_module._config_task.done()
+    finally:
+        await server_module.stop_config()
+        if server_module._chained_client is not None:
+            await server_module._chained_client.close()
+        server_module._chained_client = None
+        server_module._gateway_config = None
+        server_module._config_path = None
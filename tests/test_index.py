@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.index import NameTable, NoteSearchIndex, SortedNames
+
+
+def test_name_table_renumbers_in_order_and_tells_listeners():
+    """Test that removals keep numbers until renumbering, which keeps the order and reports the mapping."""
+    table = NameTable(f"note-{i}" for i in range(3000))
+    mappings = []
+    table.listen(mappings.append)
+    for i in range(1000):
+        table.remove(f"note-{i}")
+    assert table.number("note-1000") == 1000 and not mappings
+    assert table.add("note-1000") == (1000, False)
+
+    for i in range(1000, 1501):
+        table.remove(f"note-{i}")
+    assert len(mappings) == 1
+    mapping = mappings[0]
+    assert mapping[0] == -1 and mapping[1501] == 0 and mapping[2999] == 1498
+    assert list(table) == [f"note-{i}" for i in range(1501, 3000)]
+    assert table.number("note-1501") == 0 and table.name(1498) == "note-2999"
+    assert table.add("new") == (1499, True)
+
+
+def test_sorted_names_prefix_and_order():
+    """Test that sorted names stay ordered across block splits and removals."""
+    table = NameTable()
+    names = SortedNames(table, block_size=2)
+    for name in ["delta", "alpha", "charlie", "alpine", "bravo", "alpha", "été", "zulu"]:
+        names.add(table.add(name)[0])
+    names.discard(table.number("charlie"))
+
+    assert len(names) == 6
+    assert list(names.iter_from()) == ["alpha", "alpine", "bravo", "delta", "zulu", "été"]
+    assert names.with_prefix("alp") == ["alpha", "alpine"]
+    assert names.with_prefix("alp", limit=1) == ["alpha"]
+    assert list(names.iter_from("alpine", inclusive=False)) == ["bravo", "delta", "zulu", "été"]
+    assert table.number("bravo") in names and table.number("charlie") not in names
+
+
+def test_search_ranks_and_updates_incrementally():
+    """Test that search ranks by term relevance and reflects re-indexed notes."""
+    notes = {
+        "groceries": "milk eggs milk bread",
+        "todo": "buy milk",
+        "ideas": "write a search index",
+    }
+    table = NameTable(notes)
+    index = NoteSearchIndex.build(table, [(table.number(name), content) for name, content in notes.items()])
+
+    assert [name for name, _ in index.search("milk")] == ["groceries", "todo"]
+    assert index.search("milk", limit=1)[0][0] == "groceries"
+    assert [name for name, _ in index.search("milk", prefix="to")] == ["todo"]
+    assert index.search("missing") == []
+
+    index.remove(table.number("groceries"), notes["groceries"])
+    index.add(table.number("groceries"), "apples")
+    assert [name for name, _ in index.search("milk")] == ["todo"]
+    assert [name for name, _ in index.search("apples")] == ["groceries"]
+    assert index.search("") == []
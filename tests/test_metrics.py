@@ -0,0 +1,41 @@
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.metrics import Metrics, Tracer
+
+
+def test_histograms_counters_and_collectors_render_as_prometheus_text():
+    """Test that metrics are summarized in snapshots and rendered in the Prometheus text format."""
+    metrics = Metrics()
+    for seconds in (0.002, 0.002, 0.2, 3.0):
+        metrics.observe("call_seconds", seconds, server="a")
+    metrics.inc("errors_total", server="a")
+    metrics.add_collector(lambda: [("in_flight", {"server": "a"}, 2)])
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == [{"server": "a", "name": "errors_total", "value": 1}]
+    assert snapshot["gauges"] == [{"server": "a", "name": "in_flight", "value": 2}]
+    histogram = snapshot["histograms"][0]
+    assert (histogram["count"], histogram["p50_ms"], histogram["p95_ms"]) == (4, 2.5, 5000.0)
+
+    text = metrics.prometheus_text()
+    assert "# TYPE call_seconds histogram" in text
+    assert 'call_seconds_bucket{server="a",le="0.0025"} 2' in text
+    assert 'call_seconds_bucket{server="a",le="+Inf"} 4' in text
+    assert 'errors_total{server="a"} 1' in text
+    assert 'in_flight{server="a"} 2' in text
+
+
+def test_child_spans_share_the_trace_of_their_parent():
+    """Test that nested spans link to their parent and export their context as traceparent."""
+    tracer = Tracer(enabled=True)
+    with tracer.span("tools/call", tool="a:echo") as upstream:
+        with tracer.span("downstream tools/call") as downstream:
+            assert tracer.traceparent() == f"00-{upstream.trace_id}-{downstream.span_id}-01"
+    assert downstream.parent_id == upstream.span_id and upstream.parent_id is None
+    assert [span["name"] for span in tracer.recent()] == ["downstream tools/call", "tools/call"]
+
+    assert Tracer().traceparent() is None
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import mcp.types as types
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.codec import ResultContent
+from src.mcp_client_and_server.pipeline import PipelineError, parse_pipeline, run_pipeline, sinks
+
+
+async def fake_call(tool_name, arguments):
+    """Sleeps for the "sleep" argument, then echoes the call as JSON"""
+    await asyncio.sleep(arguments.get("sleep", 0))
+    if arguments.get("fail"):
+        raise RuntimeError("tool failed")
+    if arguments.get("error"):
+        return ResultContent([types.TextContent(type="text", text="bad input")], isError=True)
+    return [types.TextContent(type="text", text=json.dumps({"tool": tool_name, "arguments": arguments}))]
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently_and_feed_later_steps():
+    """Test that branches run side by side and references pass outputs, or fields of them, along."""
+    steps = parse_pipeline([
+        {"id": "join", "tool": "s:join", "arguments": {"left": {"$ref": "a", "path": "arguments.n"},
+                                                       "right": [{"$ref": "b"}]}},
+        {"id": "a", "tool": "s:a", "arguments": {"sleep": 0.3, "n": 1}},
+        {"id": "b", "tool": "s:b", "arguments": {"sleep": 0.3}},
+    ])
+    assert [step.id for step in steps][-1] == "join"
+    assert sinks(steps) == ["join"]
+
+    started = time.monotonic()
+    outputs = await run_pipeline(steps, fake_call)
+    assert time.monotonic() - started < 0.55
+    arguments = json.loads(outputs["join"])["arguments"]
+    assert arguments["left"] == 1
+    assert json.loads(arguments["right"][0])["tool"] == "s:b"
+
+
+@pytest.mark.asyncio
+async def test_malformed_or_failing_pipelines_are_reported():
+    """Test that cycles and unknown references are refused and a failing step stops the pipeline."""
+    with pytest.raises(PipelineError, match="cycle"):
+        parse_pipeline([{"id": "a", "tool": "t", "after": ["b"]}, {"id": "b", "tool": "t", "after": ["a"]}])
+    with pytest.raises(PipelineError, match="unknown steps: missing"):
+        parse_pipeline([{"id": "a", "tool": "t", "arguments": {"x": {"$ref": "missing"}}}])
+
+    steps = parse_pipeline([
+        {"id": "bad", "tool": "s:bad", "arguments": {"fail": True}},
+        {"id": "slow", "tool": "s:slow", "arguments": {"sleep": 5}},
+        {"id": "after", "tool": "s:after", "after": ["bad"]},
+    ])
+    started = time.monotonic()
+    with pytest.raises(PipelineError, match="Step 'bad' \\(s:bad\\) failed: tool failed"):
+        await run_pipeline(steps, fake_call)
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_step_with_an_error_result_fails_the_pipeline():
+    """Test that a result flagged isError fails its step instead of feeding its text to later steps."""
+    steps = parse_pipeline([
+        {"id": "lookup", "tool": "s:lookup", "arguments": {"error": True}},
+        {"id": "use", "tool": "s:use", "arguments": {"input": {"$ref": "lookup"}}},
+    ])
+    with pytest.raises(PipelineError, match="Step 'lookup' \\(s:lookup\\) failed: bad input"):
+        await run_pipeline(steps, fake_call)
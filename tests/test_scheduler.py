@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sys
+
+import mcp.types as types
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server import scheduler as scheduler_module
+from src.mcp_client_and_server.scheduler import (FairScheduler, RateLimit, RateLimitedError, parse_rate_limits,
+                                                 parse_weights)
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_server.py")
+
+
+class Session:
+    """Just enough of a server session to tell its client apart"""
+
+    def __init__(self, client: str):
+        self.client_params = types.InitializeRequestParams(
+            protocolVersion="2024-11-05", capabilities=types.ClientCapabilities(),
+            clientInfo=types.Implementation(name=client, version="1"))
+
+
+def test_rate_limits_are_parsed_and_enforced_per_session_and_tool(monkeypatch):
+    """Test that session and tool buckets throttle independently and refill over time."""
+    assert parse_rate_limits("*=20/40, batch=5,*:search=0.5") == {
+        "*": RateLimit(20, 40), "batch": RateLimit(5, 5), "*:search": RateLimit(0.5, 1)}
+    assert parse_weights("interactive=4") == {"interactive": 4}
+    for bad in ("=5", "batch=0", "batch"):
+        with pytest.raises(ValueError):
+            parse_rate_limits(bad)
+
+    now = [100.0]
+    monkeypatch.setattr(scheduler_module.time, "monotonic", lambda: now[0])
+    scheduler = FairScheduler(rate_limits=parse_rate_limits("*=2/3,batch=1,*:search=1"))
+    interactive, batch = scheduler.flow(Session("interactive")), scheduler.flow(Session("batch"))
+
+    scheduler.check_rate(interactive, "search")
+    with pytest.raises(RateLimitedError, match="tool search"):
+        scheduler.check_rate(interactive, "search")
+    # The refused search did not use up a session token
+    scheduler.check_rate(interactive, "fetch")
+    scheduler.check_rate(interactive, "fetch")
+    with pytest.raises(RateLimitedError, match="this session"):
+        scheduler.check_rate(interactive, "fetch")
+
+    scheduler.check_rate(batch, "fetch")
+    with pytest.raises(RateLimitedError, match="retry in 1.00 seconds"):
+        scheduler.check_rate(batch, "fetch")
+    now[0] += 1.0
+    scheduler.check_rate(batch, "fetch")
+    assert scheduler.throttled == 3
+
+
+@pytest.mark.asyncio
+async def test_waiting_calls_are_dispatched_in_weighted_fair_order():
+    """Test that a flood from one session does not hold back the calls of others."""
+    scheduler = FairScheduler(max_concurrent=1, weights={"interactive": 2})
+    batch, interactive = Session("batch"), Session("interactive")
+    order = []
+    release = asyncio.Event()
+
+    async def call(session, label):
+        async with scheduler.admit("fetch", session):
+            order.append(label)
+            await release.wait()
+
+    tasks = [asyncio.create_task(call(batch, f"b{i}")) for i in range(6)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(call(interactive, f"i{i}")) for i in range(4)]
+    await asyncio.sleep(0)
+    assert order == ["b0"]
+    gauges = {(name, labels.get("client")): value for name, labels, value in scheduler.collect_metrics()}
+    assert gauges[("mcp_scheduler_queued", "batch")] == 5
+    assert gauges[("mcp_scheduler_queued", "interactive")] == 4
+
+    release.set()
+    await asyncio.gather(*tasks)
+    # Twice the weight: two interactive calls for every batch call, once both are waiting
+    assert order == ["b0", "i0", "i1", "b1", "i2", "i3", "b2", "b3", "b4", "b5"]
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    """Test that a call cancelled while queued neither runs nor leaks a slot."""
+    scheduler = FairScheduler(max_concurrent=1)
+    release = asyncio.Event()
+    ran = []
+
+    async def call(label):
+        async with scheduler.admit("fetch"):
+            ran.append(label)
+            await release.wait()
+
+    first = asyncio.create_task(call("first"))
+    await asyncio.sleep(0)
+    cancelled = asyncio.create_task(call("cancelled"))
+    last = asyncio.create_task(call("last"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    release.set()
+    await asyncio.gather(first, cancelled, last, return_exceptions=True)
+    assert ran == ["first", "last"]
+    assert scheduler.active == 0 and not scheduler._queue
+
+
+@pytest.mark.asyncio
+async def test_gateway_throttles_downstream_calls():
+    """Test that forwarded tool calls past the rate limit fail without reaching the server."""
+    import src.mcp_client_and_server.server as server_module
+
+    server_module._scheduler = FairScheduler(max_concurrent=4, rate_limits=parse_rate_limits("*:fake:echo=1"))
+    try:
+        await server_module.handle_call_tool("connect-server", {"name": "fake",
+                                                                "command": [sys.executable, FAKE_SERVER]})
+        first = await server_module.handle_call_tool("fake:echo", {"value": 1})
+        assert '"calls": 1' in first[0].text
+        second = await server_module.handle_call_tool("fake:echo", {"value": 2})
+        assert second[0].text.startswith("Rate limit of 1 calls/s for tool fake:echo exceeded")
+        assert server_module._scheduler.active == 0
+    finally:
+        server_module._scheduler = None
+        if server_module._chained_client is not None:
+            await server_module._chained_client.close()
+        server_module._chained_client = None
@@ -1,5 +1,6 @@
 import asyncio
 import json
+import anyio
 import pytest
 from unittest.mock import MagicMock, AsyncMock
 import sys
@@ -10,6 +11,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import from the package structure
 from src.mcp_client_and_server.server import (
+    PAGE_SIZE,
     handle_initialize, 
     handle_ping, 
     handle_list_resources,
@@ -277,5 +279,289 @@ async def test_unsupported_method():
     error_message = str(exc_info.value).lower()
     assert "unsupported" in error_message and "scheme" in error_message
 
+@pytest.fixture
+def empty_notes():
+    """Give a test an empty note store and indexes."""
+    import src.mcp_client_and_server.server as server_module
+    server_module.get_note_service().clear()
+    yield server_module.get_note_service()
+    server_module.get_note_service().clear()
+
+@pytest.mark.asyncio
+async def test_search_notes(empty_notes):
+    """Test that search-notes finds notes added before and after the index is built."""
+    await handle_call_tool("add-note", {"name": "groceries", "content": "milk and eggs"})
+    result = await handle_call_tool("search-notes", {"query": "milk"})
+    assert result[0].text == "groceries"
+
+    await handle_call_tool("add-note", {"name": "gym", "content": "no milk here, just weights"})
+    result = await handle_call_tool("search-notes", {"prefix": "g", "limit": 5})
+    assert result[0].text.split("\n") == ["groceries", "gym"]
+
+    result = await handle_call_tool("search-notes", {"query": "weights"})
+    assert result[0].text == "gym"
+
+    result = await handle_call_tool("search-notes", {"query": "nothing"})
+    assert result[0].text == "No matching notes"
+
+@pytest.mark.asyncio
+async def test_batch_note_tools_report_per_item_status(empty_notes):
+    """Test that add-notes, get-notes and delete-notes apply whole batches and report each item."""
+    result = await handle_call_tool("add-notes", {"notes": [{"name": "a", "content": "A"}, {"name": "b", "content": "B"},
+                                                            {"name": "a", "content": "A2"}]})
+    assert [item["status"] for item in json.loads(result[0].text)] == ["added", "added", "updated"]
+
+    result = await handle_call_tool("add-notes", {"notes": [{"name": "c", "content": "C"}, {"name": "d"}]})
+    assert [item["status"] for item in json.loads(result[0].text)] == [
+        "not added", "error: expected an object with string name and content"]
+    assert not empty_notes.contains("c")
+
+    result = await handle_call_tool("get-notes", {"names": ["a", "c"]})
+    assert json.loads(result[0].text) == [{"name": "a", "status": "found", "content": "A2"},
+                                          {"name": "c", "status": "not found"}]
+
+    result = await handle_call_tool("delete-notes", {"names": ["b", "c"]})
+    assert [item["status"] for item in json.loads(result[0].text)] == ["deleted", "not found"]
+    result = await handle_call_tool("search-notes", {"prefix": ""})
+    assert result[0].text == "a"
+
+@pytest.mark.asyncio
+async def test_add_note_waits_for_the_group_commit(tmp_path, monkeypatch):
+    """Test that concurrent add-note calls return only once durable, sharing fsyncs under group commit."""
+    import src.mcp_client_and_server.server as server_module
+    from src.mcp_client_and_server.notes import NoteService
+    from src.mcp_client_and_server.store import LogNoteStore
+    store = LogNoteStore(str(tmp_path), fsync="batch", batch_interval=0.05)
+    monkeypatch.setattr(server_module, "_note_service", NoteService(store))
+    fsyncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), fsync(fd)))
+
+    async def add(i):
+        await handle_call_tool("add-note", {"name": f"note-{i}", "content": "x"})
+        # Acknowledged only once an fsync covered the write
+        assert store._synced >= i + 1
+
+    # Each write lands before any call waits, so the written count of note i is i + 1
+    await asyncio.gather(*(add(i) for i in range(20)))
+    assert store._synced == store._written == 20
+    assert len(fsyncs) < 5
+    store.close()
+
+@pytest.mark.asyncio
+async def test_large_note_is_read_in_ranges(empty_notes):
+    """Test that get-note and note resources return the requested slice of a note."""
+    content = "".join(str(i % 10) for i in range(1000))
+    await handle_call_tool("add-note", {"name": "big", "content": content})
+
+    result = await handle_call_tool("get-note", {"name": "big", "offset": 990, "length": 100})
+    assert [item.text for item in result] == [content[990:], "range: 990-1000/1000"]
+    result = await handle_call_tool("get-note", {"name": "big", "length": 5})
+    assert [item.text for item in result] == ["01234", "range: 0-5/1000"]
+
+    chunk = await handle_read_resource(types.AnyUrl("notes://big?offset=10&length=3"))
+    assert chunk == "012"
+
+@pytest.mark.asyncio
+async def test_memory_report_counts_bytes_per_note(empty_notes):
+    """Test that memory-report describes the note store and its size per note."""
+    await handle_call_tool("add-notes", {"notes": [{"name": f"n{i}", "content": "x" * 10} for i in range(10)]})
+    report = json.loads((await handle_call_tool("memory-report", {}))[0].text)
+    assert report["notes"] == 10
+    assert report["bytes_per_note"] == round(report["bytes"] / 10, 1)
+
+    # Building the indexes shows up in the report
+    await handle_call_tool("list-notes", {})
+    await handle_call_tool("search-notes", {"query": "x"})
+    indexed = json.loads((await handle_call_tool("memory-report", {}))[0].text)
+    assert indexed["names_index_bytes"] > 0 and indexed["search_index_bytes"] > 0
+    assert indexed["bytes"] == indexed["store_bytes"] + indexed["names_index_bytes"] + indexed["search_index_bytes"]
+
+@pytest.mark.asyncio
+async def test_get_metrics_reports_request_and_tool_latency(empty_notes):
+    """Test that requests handled by the server show up in get-metrics and the Prometheus dump."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async with create_connected_server_and_client_session(server_instance) as session:
+        await session.call_tool("add-note", {"name": "a", "content": "A"})
+        for i in range(3):
+            await session.call_tool(f"no-such-tool-{i}", {})
+        result = await session.call_tool("get-metrics", {})
+        snapshot = json.loads(result.content[0].text)
+        result = await session.call_tool("get-metrics", {"format": "prometheus"})
+
+    histograms = {(item["name"], item.get("tool") or item.get("method")): item for item in snapshot["histograms"]}
+    assert histograms[("mcp_tool_call_seconds", "add-note")]["count"] >= 1
+    assert histograms[("mcp_request_seconds", "tools/call")]["count"] >= 4
+    # Names of unknown tools come from the client, so they share one label instead of adding series
+    assert histograms[("mcp_tool_call_seconds", "unknown")]["count"] >= 3
+    assert any(item["name"] == "mcp_tool_errors_total" and item["tool"] == "unknown" and item["value"] >= 3
+               for item in snapshot["counters"])
+    assert "no-such-tool" not in result.content[0].text
+    assert 'mcp_tool_call_seconds_count{tool="add-note"}' in result.content[0].text
+
+@pytest.mark.asyncio
+async def test_list_notes_pages_with_cursor(empty_notes):
+    """Test that list-notes returns bounded pages in name order linked by cursors."""
+    for name in ["c", "a", "e", "b", "d"]:
+        await handle_call_tool("add-note", {"name": name, "content": name.upper()})
+
+    result = await handle_call_tool("list-notes", {"limit": 2})
+    assert result[0].text.split("\n") == ["a", "b"]
+    cursor = result.meta["nextCursor"]
+
+    # Notes added behind the cursor do not shift later pages
+    await handle_call_tool("add-note", {"name": "aa", "content": "AA"})
+    result = await handle_call_tool("list-notes", {"limit": 2, "cursor": cursor})
+    assert result[0].text.split("\n") == ["c", "d"]
+    cursor = result.meta["nextCursor"]
+
+    result = await handle_call_tool("list-notes", {"limit": 2, "cursor": cursor})
+    assert result[0].text == "e"
+    assert result.meta is None
+
+@pytest.mark.asyncio
+async def test_list_notes_limit_is_capped(empty_notes, monkeypatch):
+    """Test that a list-notes limit above the maximum page size gets a full page and a cursor, not every note."""
+    import src.mcp_client_and_server.server as server_module
+    monkeypatch.setattr(server_module, "MAX_PAGE_SIZE", 3)
+    await handle_call_tool("add-notes", {"notes": [{"name": f"n{i}", "content": "x"} for i in range(5)]})
+
+    result = await handle_call_tool("list-notes", {"limit": 1000000})
+    assert result[0].text.split("\n") == ["n0", "n1", "n2"]
+    assert result.meta["nextCursor"]
+
+@pytest.mark.asyncio
+async def test_notes_list_cursor_is_in_result_meta(empty_notes):
+    """Test that notes://list and list-notes return the next cursor in _meta, leaving the text to note names."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    names = [f"n{i:03}" for i in range(PAGE_SIZE + 1)]
+
+    async with create_connected_server_and_client_session(server_instance) as session:
+        await session.call_tool("add-notes", {"notes": [{"name": name, "content": "x"} for name in names]})
+        page = await session.read_resource("notes://list")
+        assert page.contents[0].text.split("\n") == names[:PAGE_SIZE]
+        cursor = page.model_dump(by_alias=True)["_meta"]["nextCursor"]
+        page = await session.read_resource(f"notes://list?cursor={cursor}")
+        assert page.contents[0].text == names[-1]
+        assert page.model_dump(by_alias=True).get("_meta") is None
+
+        result = await session.call_tool("list-notes", {"limit": 1})
+        assert result.content[0].text == names[0]
+        assert result.model_dump(by_alias=True)["_meta"]["nextCursor"]
+
+@pytest.mark.asyncio
+async def test_note_named_list_is_refused(empty_notes):
+    """Test that no note can be called "list", since notes://list would not read it."""
+    result = await handle_call_tool("add-note", {"name": "list", "content": "x"})
+    assert result.isError and "reserved" in result[0].text
+    result = await handle_call_tool("add-notes", {"notes": [{"name": "list", "content": "x"}]})
+    assert "reserved" in result[0].text
+    assert (await handle_call_tool("list-notes", {}))[0].text == ""
+
+@pytest.mark.asyncio
+async def test_resources_list_pages_note_resources(empty_notes):
+    """Test that resources/list exposes notes as notes:// resources with nextCursor paging."""
+    from src.mcp_client_and_server.server import list_resources_page
+    for i in range(5):
+        await handle_call_tool("add-note", {"name": f"note {i}", "content": f"content {i}"})
+
+    seen = []
+    cursor = None
+    while True:
+        request = types.ListResourcesRequest(method="resources/list", cursor=cursor)
+        handler = server_instance.request_handlers[types.ListResourcesRequest]
+        page = (await handler(request)).root
+        assert len(page.resources) <= 100
+        seen.extend(page.resources)
+        cursor = page.nextCursor
+        if cursor is None:
+            break
+
+    assert [resource.name for resource in seen] == [f"note {i}" for i in range(5)]
+    assert await handle_read_resource(seen[2].uri) == "content 2"
+
+    page = await list_resources_page()
+    assert page.nextCursor is None
+
+@pytest.mark.asyncio
+async def test_subscribers_get_debounced_change_notifications(empty_notes):
+    """Test that a burst of writes reaches a subscriber as one update per subscribed URI and one list change."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from src.mcp_client_and_server.server import create_initialization_options
+
+    assert create_initialization_options().capabilities.resources.subscribe
+
+    async with create_connected_server_and_client_session(server_instance) as session:
+        await session.send_request(
+            types.ClientRequest(types.SubscribeRequest(method="resources/subscribe",
+                                                       params=types.SubscribeRequestParams(uri="notes://note-1"))),
+            types.EmptyResult,
+        )
+        await session.send_request(
+            types.ClientRequest(types.SubscribeRequest(method="resources/subscribe",
+                                                       params=types.SubscribeRequestParams(uri="notes://list"))),
+            types.EmptyResult,
+        )
+        for i in range(20):
+            await session.call_tool("add-note", {"name": f"note-{i}", "content": "first"})
+        await session.call_tool("add-notes", {"notes": [{"name": "note-1", "content": "second"}]})
+
+        received = []
+        async def collect():
+            async for message in session.incoming_messages:
+                received.append(message.root)
+
+        with anyio.move_on_after(0.5):
+            await collect()
+
+    assert sorted(notification.method for notification in received) == [
+        "notifications/resources/list_changed",
+        "notifications/resources/updated",
+        "notifications/resources/updated",
+    ]
+    assert {str(notification.params.uri) for notification in received if notification.params} == {
+        "notes://list", "notes://note-1"}
+
+@pytest.mark.asyncio
+async def test_list_changed_reaches_sessions_without_subscriptions(empty_notes):
+    """Test that every live session hears of list changes, while resource updates go to subscribers only."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async with create_connected_server_and_client_session(server_instance) as watcher:
+        await watcher.list_resources()
+        async with create_connected_server_and_client_session(server_instance) as writer:
+            await writer.call_tool("add-note", {"name": "a", "content": "A"})
+            await writer.call_tool("add-note", {"name": "a", "content": "B"})
+
+            received = []
+            async def collect():
+                async for message in watcher.incoming_messages:
+                    received.append(message.root)
+
+            with anyio.move_on_after(0.5):
+                await collect()
+
+    assert [notification.method for notification in received] == ["notifications/resources/list_changed"]
+
+@pytest.mark.asyncio
+async def test_worker_mode_refuses_subscriptions(empty_notes, monkeypatch):
+    """Test that workers, which cannot notify sessions of other workers, neither offer nor accept subscriptions."""
+    import src.mcp_client_and_server.server as server_module
+    from mcp.shared.exceptions import McpError
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    monkeypatch.setattr(server_module, "_shared_notes", True)
+    capabilities = server_module.create_initialization_options().capabilities
+    assert not capabilities.resources.subscribe and not capabilities.resources.listChanged
+
+    async with create_connected_server_and_client_session(server_instance) as session:
+        with pytest.raises(McpError, match="several workers"):
+            await session.send_request(
+                types.ClientRequest(types.SubscribeRequest(method="resources/subscribe",
+                                                           params=types.SubscribeRequestParams(uri="notes://list"))),
+                types.EmptyResult,
+            )
+
 if __name__ == '__main__':
     pytest.main([__file__])
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Seconds from spawning the server to its initialize response; hosts pay this for every session
+STARTUP_BUDGET = float(os.environ.get("MCP_STARTUP_BUDGET", "3.0"))
+
+
+def test_server_import_defers_optional_modules():
+    """Test that importing the server leaves the store, pipelines, chaining client and transports unloaded."""
+    completed = subprocess.run(
+        [sys.executable, "-c",
+         "import json, sys; import src.mcp_client_and_server; print(json.dumps(sorted(sys.modules)))"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    loaded = set(json.loads(completed.stdout))
+    for module in ("client", "cache", "config", "health", "notes", "store", "index", "pipeline", "scheduler",
+                   "transport", "workers"):
+        assert f"src.mcp_client_and_server.{module}" not in loaded
+
+
+@pytest.mark.asyncio
+async def test_initialize_response_within_startup_budget():
+    """Test that a freshly spawned stdio server answers initialize within the startup budget."""
+    parameters = StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "src.mcp_client_and_server"],
+        env={**os.environ, "PYTHONPATH": PROJECT_ROOT},
+    )
+    # Best of a few launches, so one slow spawn on a busy machine does not fail the test
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        async with stdio_client(parameters) as (read, write), ClientSession(read, write) as session:
+            result = await session.initialize()
+            timings.append(time.perf_counter() - started)
+        assert result.serverInfo.name == "notes-server"
+    assert min(timings) < STARTUP_BUDGET, f"initialize took {min(timings):.3f}s, budget {STARTUP_BUDGET}s"
@@ -0,0 +1,245 @@
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp_client_and_server.notes import NoteService
+from src.mcp_client_and_server.store import CompactNoteStore, LogNoteStore, MemoryNoteStore, open_store
+
+
+@pytest.mark.parametrize("fsync", ["always", "batch", "os"])
+def test_log_store_survives_reopen(tmp_path, fsync):
+    """Test that notes written to the log are recovered after reopening."""
+    store = LogNoteStore(str(tmp_path), fsync=fsync)
+    store["a"] = "first"
+    store["b"] = "second"
+    store["a"] = "updated"
+    del store["b"]
+    store.close()
+
+    store = LogNoteStore(str(tmp_path), fsync=fsync)
+    assert dict(store) == {"a": "updated"}
+    assert len(store) == 1
+    store.close()
+
+
+def test_compaction_snapshot_and_log_tail(tmp_path):
+    """Test that compaction folds the log into a snapshot and later writes replay on top of it."""
+    store = LogNoteStore(str(tmp_path), compact_after=10)
+    for i in range(25):
+        store[f"note-{i}"] = f"content {i}"
+    del store["note-3"]
+    store["note-4"] = "changed"
+    store.close()
+
+    assert os.path.exists(tmp_path / "notes.snap")
+    store = LogNoteStore(str(tmp_path))
+    assert len(store) == 24
+    assert "note-3" not in store
+    assert store["note-4"] == "changed"
+    assert store["note-24"] == "content 24"
+    assert sorted(store) == sorted(f"note-{i}" for i in range(25) if i != 3)
+    store.close()
+
+
+def test_torn_log_record_is_discarded(tmp_path):
+    """Test that a partially written final record is dropped on recovery."""
+    store = LogNoteStore(str(tmp_path), fsync="always")
+    store["kept"] = "yes"
+    store["torn"] = "x" * 100
+    store.close()
+
+    log_path = tmp_path / "notes.wal"
+    os.truncate(log_path, os.path.getsize(log_path) - 10)
+
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == {"kept": "yes"}
+    store["after"] = "recovery"
+    store.close()
+
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == {"kept": "yes", "after": "recovery"}
+    store.close()
+
+
+def test_batch_is_one_record_and_all_or_nothing(tmp_path):
+    """Test that a batch is logged as one record and a torn batch is dropped entirely on recovery."""
+    store = LogNoteStore(str(tmp_path), fsync="always")
+    store["old"] = "gone soon"
+    store.write_batch([("a", "1"), ("b", "2"), ("old", None), ("missing", None)])
+    assert dict(store) == {"a": "1", "b": "2"}
+    store.write_batch([("c", "3"), ("d", "4")])
+    store.close()
+
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == {"a": "1", "b": "2", "c": "3", "d": "4"}
+    store.close()
+
+    # Cutting into the last batch loses both of its notes, not just the second
+    log_path = tmp_path / "notes.wal"
+    os.truncate(log_path, os.path.getsize(log_path) - 3)
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == {"a": "1", "b": "2"}
+    with pytest.raises(ValueError):
+        store.write_batch([("fine", "x"), ("bad\0name", "y")])
+    assert "fine" not in store
+    store.close()
+
+
+def test_group_commit_reports_durability_after_the_fsync(tmp_path):
+    """Test that a batched write is only reported durable once the group commit has fsynced it."""
+    store = LogNoteStore(str(tmp_path), fsync="batch", batch_interval=0.2)
+    store["a"] = "1"
+    store["b"] = "2"
+    durable = threading.Event()
+    assert store.when_durable(durable.set)
+    assert not durable.is_set() and store._synced < store._written
+    assert durable.wait(5) and store._synced == store._written
+    assert not store.when_durable(durable.set)
+    store["c"] = "3"
+    store.wait_durable()
+    assert store._synced == store._written
+    store.close()
+
+
+def test_background_compaction_keeps_writes_made_meanwhile(tmp_path, monkeypatch):
+    """Test that compaction runs off the write path, and a failed one is recovered from its moved-aside log."""
+    store = LogNoteStore(str(tmp_path), fsync="os", compact_after=5)
+    release = threading.Event()
+    write_snapshot = store._write_snapshot
+
+    def slow_snapshot(notes, generation):
+        release.wait(5)
+        write_snapshot(notes, generation)
+
+    monkeypatch.setattr(store, "_write_snapshot", slow_snapshot)
+    for i in range(5):
+        store[f"note-{i}"] = f"content {i}"
+    assert store._compactor is not None and (tmp_path / "notes.wal.prev").exists()
+    store["note-1"] = "changed"
+    del store["note-2"]
+    store["late"] = "written during compaction"
+    expected = {f"note-{i}": f"content {i}" for i in (0, 3, 4)} | {"note-1": "changed",
+                                                                    "late": "written during compaction"}
+    assert dict(store) == expected and len(store) == 5
+    release.set()
+    store._compactor.join()
+    store["one-more"] = "swaps the snapshot in"
+    expected["one-more"] = "swaps the snapshot in"
+    assert store._compactor is None and not (tmp_path / "notes.wal.prev").exists()
+    assert dict(store) == expected
+
+    def failed_snapshot(notes, generation):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write_snapshot", failed_snapshot)
+    for i in range(5):
+        store[f"more-{i}"] = str(i)
+        expected[f"more-{i}"] = str(i)
+    store._compactor.join()
+    assert dict(store) == expected and (tmp_path / "notes.wal.prev").exists()
+    # Stop as if the process died here
+    os.close(store._log_fd)
+    store._closed = True
+
+    # Reopening replays the moved-aside log and the new one, then folds both into a snapshot
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == expected
+    assert not (tmp_path / "notes.wal.prev").exists()
+    store.close()
+    store = LogNoteStore(str(tmp_path))
+    assert dict(store) == expected
+    store.close()
+
+
+def test_open_store_defaults_to_memory():
+    """Test that no path selects the in-memory backend."""
+    store = open_store(None)
+    assert isinstance(store, MemoryNoteStore)
+    store["a"] = "b"
+    assert store == {"a": "b"}
+
+
+def test_compact_store_behaves_like_a_dict():
+    """Test that the compact store matches a dict through updates, deletes and repacking."""
+    rng = random.Random(7)
+    store = CompactNoteStore(compress_min=64, hot_chars=500)
+    model = {}
+    names = [f"note-{i}" for i in range(300)] + ["", "ünïcødé", "emoji \U0001f600", "lone \ud800"]
+    for step in range(5000):
+        name = rng.choice(names)
+        if rng.random() < 0.3 and name in model:
+            del store[name]
+            del model[name]
+        else:
+            content = rng.choice(["", "short", "word " * rng.randint(10, 200), "x\ud800" * 20])
+            store[name] = model[name] = content + str(step)
+        if step % 500 == 0:
+            assert list(store) == list(model)
+            assert all(store[key] == value for key, value in model.items())
+    assert list(store.items()) == list(model.items())
+    assert len(store) == len(model)
+    assert "missing" not in store and 1 not in store
+    with pytest.raises(KeyError):
+        del store["missing"]
+    store.clear()
+    assert len(store) == 0 and list(store) == []
+
+
+def test_compact_store_compresses_large_notes_and_reports_memory():
+    """Test that large notes are compressed, reads are served from a bounded hot set, and memory is reported."""
+    store = CompactNoteStore(compress_min=256, hot_chars=5000)
+    memory = MemoryNoteStore()
+    for i in range(1000):
+        content = f"note {i} " + "lorem ipsum dolor sit amet " * (40 if i % 10 == 0 else 1)
+        store[f"note-{i}"] = memory[f"note-{i}"] = content
+    for i in range(0, 1000, 10):
+        assert store[f"note-{i}"] == memory[f"note-{i}"]
+
+    report = store.memory_report()
+    assert report["backend"] == "compact" and report["notes"] == 1000
+    assert report["compressed_notes"] == 100
+    assert 0 < report["hot_notes"] < 100
+    assert store._hot_size <= 5000
+    assert report["bytes_per_note"] < memory.memory_report()["bytes_per_note"] / 2
+
+    store["note-0"] = "small now"
+    del store["note-10"]
+    assert store.memory_report()["compressed_notes"] == 98
+    assert open_store(None, compact=True).memory_report()["notes"] == 0
+
+
+@pytest.mark.parametrize("store_class", [MemoryNoteStore, CompactNoteStore])
+def test_note_service_indexes_follow_writes_and_renumbering(store_class):
+    """Test that the name and search indexes match the store through churn, renumbering and failed writes."""
+    rng = random.Random(3)
+    service = NoteService(store_class())
+    model = {}
+    service.put_many([(f"seed-{i}", "alpha") for i in range(50)])
+    model.update((f"seed-{i}", "alpha") for i in range(50))
+    assert service.search("alpha", limit=100) and service.page(limit=1)[0]
+    names = [f"note-{i}" for i in range(200)]
+    for step in range(3000):
+        batch = rng.sample(names, 3)
+        if rng.random() < 0.4:
+            service.delete_many(batch)
+            for name in batch:
+                model.pop(name, None)
+        else:
+            notes = [(name, rng.choice(["alpha beta", "beta", "gamma alpha alpha"])) for name in batch]
+            service.put_many(notes)
+            model.update(notes)
+    with pytest.raises(ValueError):
+        service.put_many([("seed-0", "gamma"), ("bad\0name", "gamma")])
+
+    page, cursor = service.page(limit=len(model) + 1)
+    assert page == sorted(model) and cursor is None
+    assert service.search(prefix="note-1", limit=1000) == sorted(name for name in model if name.startswith("note-1"))
+    for term in ("alpha", "beta", "gamma"):
+        expected = {name for name, content in model.items() if term in content.split()}
+        assert set(service.search(term, limit=1000)) == expected
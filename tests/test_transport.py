@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+uvicorn = pytest.importorskip("uvicorn")
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+import mcp.server as server
+
+from src.mcp_client_and_server import server as server_module
+from src.mcp_client_and_server.transport import create_sse_app
+
+
+async def start_app(**limits):
+    initialization_options = server.InitializationOptions(
+        server_name="notes-server",
+        server_version="0.1.0",
+        capabilities=server_module.server_instance.get_capabilities(
+            notification_options=server.NotificationOptions(),
+            experimental_capabilities={}
+        )
+    )
+    app = create_sse_app(server_module.server_instance, initialization_options, **limits)
+    http_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(http_server.serve())
+    while not http_server.started:
+        await asyncio.sleep(0.01)
+    port = http_server.servers[0].sockets[0].getsockname()[1]
+    return http_server, task, f"http://127.0.0.1:{port}/sse"
+
+
+@pytest.mark.asyncio
+async def test_sse_sessions_share_state_and_respect_limit():
+    """Test that concurrent SSE sessions share the notes store and extra sessions are refused."""
+    server_module.get_note_service().clear()
+    http_server, task, url = await start_app(max_sessions=2)
+    try:
+        async with sse_client(url) as (read_a, write_a), sse_client(url) as (read_b, write_b):
+            async with ClientSession(read_a, write_a) as a, ClientSession(read_b, write_b) as b:
+                await a.initialize()
+                await b.initialize()
+                await a.call_tool("add-note", {"name": "shared", "content": "from a"})
+                result = await b.call_tool("get-note", {"name": "shared"})
+                assert result.content[0].text == "from a"
+
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(url)
+                    assert response.status_code == 503
+
+        # Closed sessions free their slots
+        for _ in range(100):
+            async with httpx.AsyncClient() as client:
+                async with client.stream("GET", url) as response:
+                    if response.status_code == 200:
+                        break
+            await asyncio.sleep(0.05)
+        assert response.status_code == 200
+    finally:
+        http_server.should_exit = True
+        await task
+        server_module.get_note_service().clear()
@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip("uvicorn")
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_server.py")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_workers_share_notes_and_servers():
+    """Test that sessions served by different workers see the same notes and downstream servers."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.mcp_client_and_server", "--transport", "sse", "--workers", "2", "--port", str(port)],
+        cwd=PROJECT_ROOT,
+    )
+    url = f"http://127.0.0.1:{port}/sse"
+    try:
+        endpoints = set()
+        async with httpx.AsyncClient() as client:
+            for _ in range(200):
+                try:
+                    async with client.stream("GET", url) as response:
+                        async for line in response.aiter_lines():
+                            if line.startswith("data: "):
+                                endpoints.add(line.split("/")[2])
+                                break
+                    if len(endpoints) == 2:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+        # Streams are spread over both workers
+        assert endpoints == {"0", "1"}
+
+        async with sse_client(url) as (read, write), ClientSession(read, write) as first:
+            await first.initialize()
+            await first.call_tool("add-note", {"name": "shared", "content": "from the first session"})
+            await first.call_tool("connect-server", {"name": "fake", "command": [sys.executable, FAKE_SERVER]})
+
+            for i in range(4):
+                async with sse_client(url) as (read, write), ClientSession(read, write) as session:
+                    await session.initialize()
+                    result = await session.call_tool("get-note", {"name": "shared"})
+                    assert result.content[0].text == "from the first session"
+                    result = await session.call_tool("fake:echo", {"session": i})
+                    assert json.loads(result.content[0].text)["arguments"] == {"session": i}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)